@@ -1,12 +1,28 @@
 import os
 import jwt
+import atexit
 import datetime
-import mysql.connector
+import click
 from flask import Flask, request, jsonify, send_from_directory, g
 from flask_cors import CORS
 from dotenv import load_dotenv
 from functools import wraps
-from apscheduler.schedulers.background import BackgroundScheduler
+from jobs.scheduler import cluster_scheduler
+from db.connection import get_db_connection, init_app as init_db_pool
+from models import db as orm
+from auth.revocation import prune_revoked_tokens, drop_expired_revocations
+from courses.likes import flush_like_counts, reconcile_like_counts, LIKE_FLUSH_INTERVAL
+from courses.recommendations import refresh_recommendations, rebuild_recommendations
+from courses.recurrence import materialize_all_courses, extend_session_horizon
+from schedule import user_calendar
+from feedback.reminder_scheduler import schedule_feedback_reminders
+from feedback.delivery import deliver_reminders
+from notifications.course_messages import run_message_jobs
+from notifications.push import publish_session_starts, prune_push_events
+from payments.ledger import reconcile_ledger
+from db.idempotency import prune_idempotency_keys
+from stats.dashboard import refresh_dashboard_stats, STATS_REFRESH_MINUTES
+from schedule.live_sessions import refresh_live_sessions, LIVE_REFRESH_INTERVAL
 
 # Load environment variables early
 load_dotenv()
@@ -42,20 +58,19 @@ app.config['SQLALCHEMY_DATABASE_URI'] = (
     f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}/{MYSQL_DATABASE}"
 )
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_pre_ping': True, 'pool_recycle': 3600}
+
+# The payments routes use Flask-SQLAlchemy
+orm.init_app(app)
 
 
 
 # Enable CORS
 CORS(app)
 
-# Database connection helper
-def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv('MYSQL_HOST', 'localhost'),
-        user=os.getenv('MYSQL_USER', 'root'),
-        password=os.getenv('MYSQL_PASSWORD', ''),
-        database=os.getenv('MYSQL_DATABASE', 'time_to_weave')
-    )
+# Database connections come from the shared pool; each request borrows one
+# connection and the teardown hook returns it.
+init_db_pool(app)
 
 # JWT utilities
 def generate_token(user_id):
@@ -121,14 +136,60 @@ app.register_blueprint(payment_bp, url_prefix='/api/payments')
 app.register_blueprint(schedule_bp, url_prefix='/api/schedule')
 app.register_blueprint(user_bp, url_prefix='/api/user')
 
-# Background scheduler task example
-def schedule_feedback_reminders():
-    # Placeholder: implement reminder logic here
-    print("⏰ Running feedback reminder task")
-
-scheduler = BackgroundScheduler()
+# Background jobs: cluster jobs run only in the elected leader process,
+# local jobs maintain per-process in-memory state and run everywhere
+scheduler = cluster_scheduler
 scheduler.add_job(schedule_feedback_reminders, 'interval', minutes=10)
+scheduler.add_job(deliver_reminders, 'interval', minutes=1)
+scheduler.add_job(run_message_jobs, 'interval', minutes=1)
+scheduler.add_job(publish_session_starts, 'interval', minutes=1)
+scheduler.add_job(prune_push_events, 'interval', hours=1)
+scheduler.add_job(prune_idempotency_keys, 'interval', hours=1)
+scheduler.add_job(prune_revoked_tokens, 'interval', hours=1)
+scheduler.add_job(reconcile_like_counts, 'cron', hour=3)
+scheduler.add_job(refresh_recommendations, 'interval', minutes=1)
+scheduler.add_job(rebuild_recommendations, 'cron', hour=4)
+scheduler.add_job(extend_session_horizon, 'cron', hour=2)
+scheduler.add_job(user_calendar.trim_user_calendar, 'cron', hour=1)
+scheduler.add_job(reconcile_ledger, 'cron', hour=5)
+scheduler.add_job(refresh_dashboard_stats, 'interval', minutes=STATS_REFRESH_MINUTES)
+scheduler.add_local_job(flush_like_counts, 'interval', seconds=LIKE_FLUSH_INTERVAL)
+scheduler.add_local_job(refresh_live_sessions, 'interval', seconds=LIVE_REFRESH_INTERVAL)
+scheduler.add_local_job(drop_expired_revocations, 'interval', hours=1)
 scheduler.start()
+atexit.register(scheduler.shutdown)
+
+# CLI: flask backfill-sessions [--since YYYY-MM-DD]
+@app.cli.command('backfill-sessions')
+@click.option('--since', default=None, help='Also materialize one-off dates from this day (YYYY-MM-DD).')
+def backfill_sessions(since):
+    """Materialize every course's schedule into course_sessions."""
+    start = datetime.date.fromisoformat(since) if since else None
+    with app.app_context():
+        db = get_db_connection()
+        results = materialize_all_courses(db, start=start)
+    for course_id, (inserted, deleted) in sorted(results.items()):
+        print(f"Course {course_id}: +{inserted} / -{deleted} sessions")
+
+# CLI: flask rebuild-calendar
+@app.cli.command('rebuild-calendar')
+def rebuild_calendar():
+    """Rebuild the user_calendar read model and verify it against the source join."""
+    with app.app_context():
+        db = get_db_connection()
+        rows = user_calendar.rebuild(db)
+        report = user_calendar.check_consistency(db)
+    print(f"Rebuilt user_calendar: {rows} rows")
+    print(f"Consistent: {report['consistent']} (missing={report['missing']}, extra={report['extra']}, stale={report['stale']})")
+
+# CLI: flask deliver-reminders
+@app.cli.command('deliver-reminders')
+@click.option('--batches', default=10, help='Maximum number of batches to send.')
+def deliver_reminders_command(batches):
+    """Send pending feedback reminder emails now (SMTP_HOST / SMTP_PORT)."""
+    with app.app_context():
+        delivered = deliver_reminders(max_batches=batches)
+    print(f"Delivered {delivered} reminders")
 
 # Serve static frontend assets
 @app.route('/assets/<path:filename>')
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingBusy(Exception):
+    """
+    Raised when a hash request is rejected by admission control. Routes
+    translate it into a 429 so clients back off instead of queueing.
+    """
+
+
+class HashingService:
+    """
+    Runs PBKDF2 password hashing in a process pool so CPU-bound work does not
+    starve request threads.
+
+    Admission control:
+    - max_pending bounds the number of hashes queued or running at once.
+    - per_key_limit bounds concurrent hashes per client IP and per email,
+      so one client retrying in a loop cannot fill the queue.
+    """
+
+    def __init__(self, workers=2, max_pending=64, per_key_limit=2, timeout=10):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.per_key_limit = per_key_limit
+        self.timeout = timeout
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._per_key = {}
+
+        self._completed = 0
+        self._rejected = 0
+        self._max_depth = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _admit(self, keys):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HashingBusy('Too many sign-in attempts in progress, please retry shortly')
+            for key in keys:
+                if self._per_key.get(key, 0) >= self.per_key_limit:
+                    self._rejected += 1
+                    raise HashingBusy('Too many attempts for this account, please retry shortly')
+
+            self._pending += 1
+            self._max_depth = max(self._max_depth, self._pending)
+            for key in keys:
+                self._per_key[key] = self._per_key.get(key, 0) + 1
+
+    def _release(self, keys, latency):
+        with self._lock:
+            self._pending -= 1
+            for key in keys:
+                count = self._per_key.get(key, 0) - 1
+                if count > 0:
+                    self._per_key[key] = count
+                else:
+                    self._per_key.pop(key, None)
+            if latency is not None:
+                self._completed += 1
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+
+    def _run(self, fn, args, ip=None, email=None):
+        keys = []
+        if ip:
+            keys.append(('ip', ip))
+        if email:
+            keys.append(('email', email.lower()))
+
+        self._admit(keys)
+        started = time.monotonic()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._release(keys, None)
+            raise
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            if not future.cancel():
+                # Already running in a worker: keep its admission slot until
+                # it actually finishes, so the limits reflect the real load
+                future.add_done_callback(lambda _: self._release(keys, None))
+            else:
+                self._release(keys, None)
+            raise HashingBusy('Sign-in is taking longer than usual, please retry shortly')
+        except BaseException:
+            self._release(keys, None)
+            raise
+        self._release(keys, time.monotonic() - started)
+        return result
+
+    def hash_password(self, password, ip=None, email=None):
+        return self._run(generate_password_hash, (password,), ip=ip, email=email)
+
+    def check_password(self, pwhash, password, ip=None, email=None):
+        return self._run(check_password_hash, (pwhash, password), ip=ip, email=email)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'queue_depth': self._pending,
+                'max_queue_depth': self._max_depth,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'avg_latency_ms': round(self._latency_total / self._completed * 1000, 3) if self._completed else 0.0,
+                'max_latency_ms': round(self._latency_max * 1000, 3),
+            }
+
+
+hashing_service = HashingService(
+    workers=int(os.getenv('HASH_WORKERS', os.cpu_count() or 2)),
+    max_pending=int(os.getenv('HASH_MAX_PENDING', 64)),
+    per_key_limit=int(os.getenv('HASH_PER_KEY_LIMIT', 2)),
+    timeout=float(os.getenv('HASH_TIMEOUT', 10)),
+)
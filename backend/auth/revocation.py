@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+import datetime
+from db.connection import get_db_connection
+
+
+class RevocationStore:
+    """
+    Revoked JWT ids (jti), persisted in the revoked_tokens table and mirrored
+    in an in-memory dict so require_user_auth can check revocation in O(1).
+
+    Each process pulls rows revoked by other workers at most once every
+    `sync_interval` seconds, using revoked_at as a watermark. Entries are
+    dropped once the token itself has expired, since an expired token is
+    rejected anyway: from memory by every process (drop_expired), from the
+    table by one (prune_expired).
+    """
+
+    def __init__(self, sync_interval=30):
+        self.sync_interval = sync_interval
+        self._revoked = {}  # jti -> expires_at (naive UTC datetime)
+        self._lock = threading.Lock()
+        self._last_sync = None
+        self._watermark = None
+
+    def revoke(self, jti, user_id, expires_at):
+        """
+        Marks a token id as revoked until its own expiry.
+        """
+        db = get_db_connection()
+        cursor = db.cursor()
+        try:
+            cursor.execute("""
+                INSERT IGNORE INTO revoked_tokens (jti, user_id, expires_at, revoked_at)
+                VALUES (%s, %s, %s, UTC_TIMESTAMP())
+            """, (jti, user_id, expires_at))
+            db.commit()
+        finally:
+            cursor.close()
+            db.close()
+
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti):
+        if not jti:
+            return False
+        self._maybe_sync()
+        return jti in self._revoked
+
+    def _maybe_sync(self):
+        now = time.monotonic()
+        if self._last_sync is not None and now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        try:
+            self.sync()
+        except Exception as e:
+            # Keep serving from memory; the next interval retries
+            print(f"[WARN] Token revocation sync failed: {e}")
+
+    def sync(self):
+        """
+        Loads revocations recorded since the last sync (or all live ones on
+        the first call).
+        """
+        db = get_db_connection()
+        cursor = db.cursor()
+        try:
+            if self._watermark is None:
+                cursor.execute("""
+                    SELECT jti, expires_at, revoked_at
+                    FROM revoked_tokens
+                    WHERE expires_at > UTC_TIMESTAMP()
+                """)
+            else:
+                cursor.execute("""
+                    SELECT jti, expires_at, revoked_at
+                    FROM revoked_tokens
+                    WHERE revoked_at >= %s
+                """, (self._watermark,))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            db.close()
+
+        with self._lock:
+            for jti, expires_at, revoked_at in rows:
+                self._revoked[jti] = expires_at
+                if self._watermark is None or revoked_at > self._watermark:
+                    self._watermark = revoked_at
+            if self._watermark is None:
+                self._watermark = datetime.datetime.utcnow()
+
+    def drop_expired(self):
+        """
+        Drops expired revocations from this process's memory. Returns the
+        number of entries dropped.
+        """
+        now = datetime.datetime.utcnow()
+        with self._lock:
+            expired = [j for j, exp in self._revoked.items() if exp <= now]
+            for jti in expired:
+                del self._revoked[jti]
+        return len(expired)
+
+    def prune_expired(self, batch_size=1000):
+        """
+        Deletes expired revocations from the table in batches. Returns the
+        number of rows deleted.
+        """
+        deleted = 0
+        db = get_db_connection()
+        cursor = db.cursor()
+        try:
+            while True:
+                cursor.execute("""
+                    DELETE FROM revoked_tokens
+                    WHERE expires_at <= UTC_TIMESTAMP()
+                    LIMIT %s
+                """, (batch_size,))
+                db.commit()
+                deleted += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+        finally:
+            cursor.close()
+            db.close()
+        return deleted
+
+    def stats(self):
+        with self._lock:
+            return {
+                'revoked_in_memory': len(self._revoked),
+                'sync_interval_seconds': self.sync_interval,
+            }
+
+
+revocation_store = RevocationStore(
+    sync_interval=float(os.getenv('TOKEN_REVOCATION_SYNC_INTERVAL', 30)),
+)
+
+
+def prune_revoked_tokens():
+    deleted = revocation_store.prune_expired()
+    print(f"🧹 Pruned {deleted} expired token revocations")
+    return deleted
+
+
+def drop_expired_revocations():
+    return revocation_store.drop_expired()
@@ -1,10 +1,13 @@
 import os
 import jwt
+import uuid
 import datetime
 from flask import request, jsonify, g
 from functools import wraps
 from dotenv import load_dotenv
 from db.connection import get_db_connection
+from auth.user_cache import user_cache
+from auth.revocation import revocation_store
 
 load_dotenv()
 
@@ -14,10 +17,11 @@ JWT_ALGORITHM = 'HS256'
 
 def generate_token(user_id: int) -> str:
     """
-    Generates a JWT token with user_id and 7-day expiration.
+    Generates a JWT token with user_id, a unique jti and 7-day expiration.
     """
     payload = {
         'user_id': user_id,
+        'jti': uuid.uuid4().hex,
         'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
@@ -25,13 +29,31 @@ def generate_token(user_id: int) -> str:
 
 def decode_token(token: str):
     """
-    Decodes the token and returns the payload or None if invalid.
+    Decodes the token and returns the payload or None if invalid or revoked.
     """
     try:
-        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
         return None
 
+    if revocation_store.is_revoked(payload.get('jti')):
+        return None
+    return payload
+
+
+def revoke_token(token: str) -> bool:
+    """
+    Revokes a valid token until its expiry. Returns False if the token is
+    invalid, already revoked, or predates jti claims.
+    """
+    payload = decode_token(token)
+    if not payload or not payload.get('jti'):
+        return False
+
+    expires_at = datetime.datetime.utcfromtimestamp(payload['exp'])
+    revocation_store.revoke(payload['jti'], payload.get('user_id'), expires_at)
+    return True
+
 
 def get_user_id_from_token(req=None):
     """
@@ -52,13 +74,18 @@ def get_user_id_from_token(req=None):
 
 def verify_token(token: str):
     """
-    Verifies token and returns full user object from DB, or None if invalid.
+    Verifies token and returns full user object, or None if invalid.
+    The user row is served from the in-process user cache when possible.
     """
     decoded = decode_token(token)
     if not decoded or 'user_id' not in decoded:
         return None
 
     user_id = decoded['user_id']
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
     try:
         db = get_db_connection()
         cursor = db.cursor(dictionary=True)
@@ -66,6 +93,8 @@ def verify_token(token: str):
         user = cursor.fetchone()
         cursor.close()
         db.close()
+        if user:
+            user_cache.set(user_id, user)
         return user
     except Exception:
         return None
@@ -87,5 +116,6 @@ def require_user_auth(f):
             return jsonify({'error': 'Invalid or expired token'}), 401
 
         g.user = user
+        g.user_id = user['id']
         return f(*args, **kwargs)
     return decorated_function
@@ -0,0 +1,86 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+class UserCache:
+    """
+    Bounded LRU cache of user rows keyed by user id, with a per-entry TTL.
+
+    The cache is per process, so writes that change a user row must call
+    invalidate() (or the module-level invalidate_user()) in the process that
+    made the change; the TTL bounds how stale other workers can get.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, user = entry
+            if expires_at <= now:
+                del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(user)
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(user))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+user_cache = UserCache(
+    max_size=int(os.getenv('USER_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('USER_CACHE_TTL', 60)),
+)
+
+
+def invalidate_user(user_id):
+    """
+    Drops a user's cached row. Call after any write to that users row
+    (profile, balance, role, login state).
+    """
+    if user_id is not None:
+        user_cache.invalidate(int(user_id))
@@ -0,0 +1,112 @@
+def _ensure_seat_row(cursor, course_id) -> bool:
+    """
+    Creates the course_seats counter row for a course that predates seat
+    accounting, seeded from its current active enrollments. Returns False
+    if the course does not exist.
+    """
+    cursor.execute("""
+        INSERT IGNORE INTO course_seats (course_id, seats_taken)
+        SELECT c.id, (
+            SELECT COUNT(*) FROM courses_participants cp
+            WHERE cp.course_id = c.id AND cp.is_active = TRUE
+        )
+        FROM courses c
+        WHERE c.id = %s
+    """, (course_id,))
+    if cursor.rowcount == 1:
+        return True
+    cursor.execute("SELECT 1 FROM courses WHERE id = %s", (course_id,))
+    return cursor.fetchone() is not None
+
+
+def take_seat(cursor, course_id):
+    """
+    Claims one seat with a conditional update on the course's counter row.
+    The row lock serializes concurrent claims, so seats_taken can never pass
+    capacity. Returns True (seat taken), False (course full) or None
+    (course not found).
+    """
+    sql = """
+        UPDATE course_seats
+        SET seats_taken = seats_taken + 1
+        WHERE course_id = %s AND (capacity IS NULL OR seats_taken < capacity)
+    """
+    cursor.execute(sql, (course_id,))
+    if cursor.rowcount == 1:
+        return True
+
+    cursor.execute("SELECT 1 FROM course_seats WHERE course_id = %s", (course_id,))
+    if cursor.fetchone():
+        return False
+
+    if not _ensure_seat_row(cursor, course_id):
+        return None
+    cursor.execute(sql, (course_id,))
+    return cursor.rowcount == 1
+
+
+def give_back_seats(cursor, course_id, count=1):
+    cursor.execute("""
+        UPDATE course_seats
+        SET seats_taken = GREATEST(seats_taken - %s, 0)
+        WHERE course_id = %s
+    """, (count, course_id))
+
+
+def lock_seats(cursor, course_id):
+    """
+    Locks the course's counter row and returns (capacity, seats_taken), or
+    None if the course does not exist. capacity is None for unlimited.
+    """
+    cursor.execute(
+        "SELECT capacity, seats_taken FROM course_seats WHERE course_id = %s FOR UPDATE",
+        (course_id,)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        if not _ensure_seat_row(cursor, course_id):
+            return None
+        cursor.execute(
+            "SELECT capacity, seats_taken FROM course_seats WHERE course_id = %s FOR UPDATE",
+            (course_id,)
+        )
+        row = cursor.fetchone()
+    return row[0], row[1]
+
+
+def set_capacity(cursor, course_id, capacity):
+    """
+    Sets a course's capacity (None for unlimited). Returns False if the
+    course does not exist. Callers should then fill any newly opened seats
+    from the waitlist.
+    """
+    if lock_seats(cursor, course_id) is None:
+        return False
+    cursor.execute(
+        "UPDATE course_seats SET capacity = %s WHERE course_id = %s",
+        (capacity, course_id)
+    )
+    return True
+
+
+def get_availability(cursor, course_id):
+    """
+    Returns {'capacity', 'seats_taken', 'seats_left', 'waitlisted'} for a
+    course, or None if it has no counter row yet.
+    """
+    cursor.execute("""
+        SELECT s.capacity, s.seats_taken,
+               (SELECT COUNT(*) FROM course_waitlist w WHERE w.course_id = s.course_id) AS waitlisted
+        FROM course_seats s
+        WHERE s.course_id = %s
+    """, (course_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    capacity, taken, waitlisted = row
+    return {
+        'capacity': capacity,
+        'seats_taken': taken,
+        'seats_left': None if capacity is None else max(0, capacity - taken),
+        'waitlisted': waitlisted,
+    }
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from flask import Response, request
+from db.connection import get_db_connection
+from db.versions import bump_version, get_version
+
+CATALOG_VERSION = 'catalog'
+
+
+class CatalogSnapshot:
+    """
+    Serialized course catalog, rebuilt only when the 'catalog' cache version
+    changes.
+
+    The payload is UTF-8 JSON with each course's schedule already parsed, and
+    the ETag is a digest of those bytes. The version row is re-read at most
+    every `check_interval` seconds, so writes from other workers show up
+    within that window; writes in this process call invalidate() and show up
+    immediately.
+    """
+
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None  # (payload, etag, version, courses)
+        self._checked_at = None
+        self.builds = 0
+
+    def _is_fresh(self):
+        return self._snapshot is not None and self._checked_at is not None \
+            and time.monotonic() - self._checked_at < self.check_interval
+
+    def _current(self):
+        if not self._is_fresh():
+            with self._lock:
+                if not self._is_fresh():
+                    version = get_version(CATALOG_VERSION)
+                    if self._snapshot is None or version != self._snapshot[2]:
+                        self._snapshot = self._build(version)
+                        self.builds += 1
+                    self._checked_at = time.monotonic()
+        return self._snapshot
+
+    def get(self):
+        """
+        Returns (payload_bytes, etag, version) for the current catalog.
+        """
+        payload, etag, version, _ = self._current()
+        return payload, etag, version
+
+    def courses(self):
+        """
+        Returns the parsed course list backing the current snapshot.
+        Callers must treat it as read-only.
+        """
+        return self._current()[3]
+
+    def _build(self, version):
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
+        try:
+            # Like counts are served apart (courses.likes.like_counts) so
+            # their batched flushes don't churn the version and ETag
+            cursor.execute("""
+                SELECT c.*, cs.capacity
+                FROM courses c
+                LEFT JOIN course_seats cs ON cs.course_id = c.id
+                ORDER BY c.id
+            """)
+            courses = cursor.fetchall()
+        finally:
+            cursor.close()
+            db.close()
+
+        for course in courses:
+            if course.get('schedule'):
+                try:
+                    course['schedule'] = json.loads(course['schedule'])
+                except Exception:
+                    pass
+
+        payload = json.dumps(courses, ensure_ascii=False, default=str).encode('utf-8')
+        return payload, hashlib.sha1(payload).hexdigest(), version, courses
+
+    def invalidate(self):
+        """
+        Forces the next get() to re-check the version row.
+        """
+        self._checked_at = None
+
+
+catalog_snapshot = CatalogSnapshot(
+    check_interval=float(os.getenv('CATALOG_VERSION_CHECK_INTERVAL', 5)),
+)
+
+
+def bump_catalog_version(cursor):
+    """
+    Call inside any transaction that writes to courses, then call
+    catalog_snapshot.invalidate() after commit.
+    """
+    bump_version(cursor, CATALOG_VERSION)
+
+
+def catalog_response():
+    """
+    Serves the catalog snapshot with ETag / If-None-Match support.
+    """
+    payload, etag, version = catalog_snapshot.get()
+    headers = {
+        'ETag': f'"{etag}"',
+        'X-Catalog-Version': str(version),
+        'Cache-Control': 'no-cache',
+    }
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    return Response(payload, content_type='application/json; charset=utf-8', headers=headers)
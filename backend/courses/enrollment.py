@@ -0,0 +1,265 @@
+import mysql.connector
+from mysql.connector import errorcode
+from courses.recommendations import queue_user_refresh, queue_users_refresh
+from courses.capacity import take_seat, give_back_seats, lock_seats
+from schedule import user_calendar
+
+REGISTERED = 'registered'
+REACTIVATED = 'reactivated'
+ALREADY_REGISTERED = 'already_registered'
+WAITLISTED = 'waitlisted'
+ALREADY_WAITLISTED = 'already_waitlisted'
+COURSE_NOT_FOUND = 'course_not_found'
+USER_NOT_FOUND = 'user_not_found'
+
+CANCELLED = 'cancelled'
+LEFT_WAITLIST = 'left_waitlist'
+NOT_REGISTERED = 'not_registered'
+
+_UPSERT_SQL = """
+    INSERT INTO courses_participants (course_id, participant_id, is_active)
+    VALUES (%s, %s, TRUE)
+    ON DUPLICATE KEY UPDATE is_active = TRUE
+"""
+
+_WAITLIST_SQL = """
+    INSERT IGNORE INTO course_waitlist (course_id, user_id)
+    VALUES (%s, %s)
+"""
+
+
+def _upsert(cursor, course_id, user_id):
+    """
+    Runs the participant upsert on uq_course_participant and returns its
+    status from the affected row count (1 inserted, 2 re-activated,
+    0 unchanged). A missing course or user surfaces as a foreign key error.
+    """
+    try:
+        cursor.execute(_UPSERT_SQL, (course_id, user_id))
+    except mysql.connector.IntegrityError as err:
+        if err.errno == errorcode.ER_NO_REFERENCED_ROW_2:
+            return COURSE_NOT_FOUND if 'fk_course' in err.msg else USER_NOT_FOUND
+        raise
+
+    if cursor.rowcount == 0:
+        return ALREADY_REGISTERED
+    return REGISTERED if cursor.rowcount == 1 else REACTIVATED
+
+
+def waitlist_position(cursor, course_id, user_id):
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM course_waitlist w
+        JOIN course_waitlist mine ON mine.course_id = w.course_id AND mine.user_id = %s
+        WHERE w.course_id = %s AND w.id <= mine.id
+    """, (user_id, course_id))
+    row = cursor.fetchone()
+    return row[0] if row and row[0] else None
+
+
+def register_user(cursor, course_id, user_id) -> str:
+    """
+    Registers one user. A seat is claimed with a conditional update on the
+    course_seats counter row, then the participant row is upserted. When
+    the course is full the user joins the FIFO waitlist instead.
+    """
+    seat = take_seat(cursor, course_id)
+    if seat is None:
+        return COURSE_NOT_FOUND
+
+    if seat:
+        status = _upsert(cursor, course_id, user_id)
+        if status in (REGISTERED, REACTIVATED):
+            queue_user_refresh(cursor, user_id)
+            user_calendar.add_enrollment(cursor, user_id, course_id)
+        else:
+            give_back_seats(cursor, course_id)
+        return status
+
+    cursor.execute(
+        "SELECT is_active FROM courses_participants WHERE course_id = %s AND participant_id = %s",
+        (course_id, user_id)
+    )
+    row = cursor.fetchone()
+    if row and row[0]:
+        return ALREADY_REGISTERED
+
+    try:
+        cursor.execute(_WAITLIST_SQL, (course_id, user_id))
+    except mysql.connector.IntegrityError as err:
+        if err.errno == errorcode.ER_NO_REFERENCED_ROW_2:
+            return USER_NOT_FOUND
+        raise
+    return WAITLISTED if cursor.rowcount == 1 else ALREADY_WAITLISTED
+
+
+def fill_open_seats(cursor, course_id):
+    """
+    Promotes users from the head of the waitlist into any open seats.
+    Returns the promoted user ids in FIFO order.
+    """
+    seats = lock_seats(cursor, course_id)
+    if seats is None:
+        return []
+    capacity, taken = seats
+
+    if capacity is None:
+        cursor.execute(
+            "SELECT id, user_id FROM course_waitlist WHERE course_id = %s ORDER BY id FOR UPDATE",
+            (course_id,)
+        )
+    else:
+        open_seats = capacity - taken
+        if open_seats <= 0:
+            return []
+        cursor.execute(
+            "SELECT id, user_id FROM course_waitlist WHERE course_id = %s ORDER BY id LIMIT %s FOR UPDATE",
+            (course_id, open_seats)
+        )
+    waiting = cursor.fetchall()
+    if not waiting:
+        return []
+
+    promoted = []
+    for _, user_id in waiting:
+        if _upsert(cursor, course_id, user_id) in (REGISTERED, REACTIVATED):
+            promoted.append(user_id)
+
+    placeholders = ','.join(['%s'] * len(waiting))
+    cursor.execute(
+        f"DELETE FROM course_waitlist WHERE id IN ({placeholders})",
+        tuple(entry_id for entry_id, _ in waiting)
+    )
+    if promoted:
+        cursor.execute(
+            "UPDATE course_seats SET seats_taken = seats_taken + %s WHERE course_id = %s",
+            (len(promoted), course_id)
+        )
+        queue_users_refresh(cursor, promoted)
+        user_calendar.add_enrollments(cursor, [(course_id, user_id) for user_id in promoted])
+    return promoted
+
+
+def cancel_registration(cursor, course_id, user_id):
+    """
+    Cancels an active registration (freeing the seat for the next waitlisted
+    user) or removes the user from the waitlist.
+    Returns (status, promoted_user_ids).
+    """
+    # Counter row first: same lock order as register_user
+    if lock_seats(cursor, course_id) is None:
+        return COURSE_NOT_FOUND, []
+
+    cursor.execute("""
+        UPDATE courses_participants
+        SET is_active = FALSE
+        WHERE course_id = %s AND participant_id = %s AND is_active = TRUE
+    """, (course_id, user_id))
+    if cursor.rowcount == 1:
+        give_back_seats(cursor, course_id)
+        queue_user_refresh(cursor, user_id)
+        user_calendar.remove_enrollment(cursor, user_id, course_id)
+        return CANCELLED, fill_open_seats(cursor, course_id)
+
+    cursor.execute(
+        "DELETE FROM course_waitlist WHERE course_id = %s AND user_id = %s",
+        (course_id, user_id)
+    )
+    if cursor.rowcount == 1:
+        return LEFT_WAITLIST, []
+    return NOT_REGISTERED, []
+
+
+def _in_clause(values):
+    return ','.join(['%s'] * len(values))
+
+
+def bulk_enroll(db, course_ids, user_ids, chunk_size=1000):
+    """
+    Enrolls every user in every course. Existing rows, users and courses are
+    read with one IN (...) query per chunk, and the inserts/re-activations
+    go out through executemany, all in a single transaction. Seats are
+    granted in input order; users beyond a course's capacity are waitlisted.
+
+    Returns a list of {'course_id', 'user_id', 'status'} outcomes.
+    """
+    course_ids = list(dict.fromkeys(int(c) for c in course_ids))
+    user_ids = list(dict.fromkeys(int(u) for u in user_ids))
+    outcomes = []
+
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            f"SELECT id FROM courses WHERE id IN ({_in_clause(course_ids)})",
+            tuple(course_ids)
+        )
+        known_courses = {row[0] for row in cursor.fetchall()}
+
+        # Lock counter rows up front, in id order, before any participant rows
+        open_seats = {}
+        for course_id in sorted(known_courses):
+            capacity, taken = lock_seats(cursor, course_id)
+            open_seats[course_id] = None if capacity is None else max(0, capacity - taken)
+        granted = {course_id: 0 for course_id in known_courses}
+
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+
+            cursor.execute(
+                f"SELECT id FROM users WHERE id IN ({_in_clause(chunk)})",
+                tuple(chunk)
+            )
+            known_users = {row[0] for row in cursor.fetchall()}
+
+            cursor.execute(f"""
+                SELECT course_id, participant_id, is_active
+                FROM courses_participants
+                WHERE course_id IN ({_in_clause(course_ids)})
+                  AND participant_id IN ({_in_clause(chunk)})
+                FOR UPDATE
+            """, tuple(course_ids) + tuple(chunk))
+            existing = {(row[0], row[1]): bool(row[2]) for row in cursor.fetchall()}
+
+            rows = []
+            waitlist_rows = []
+            for course_id in course_ids:
+                for user_id in chunk:
+                    if course_id not in known_courses:
+                        status = COURSE_NOT_FOUND
+                    elif user_id not in known_users:
+                        status = USER_NOT_FOUND
+                    elif existing.get((course_id, user_id)):
+                        status = ALREADY_REGISTERED
+                    elif open_seats[course_id] is not None and open_seats[course_id] <= 0:
+                        status = WAITLISTED
+                        waitlist_rows.append((course_id, user_id))
+                    else:
+                        status = REACTIVATED if (course_id, user_id) in existing else REGISTERED
+                        rows.append((course_id, user_id))
+                        granted[course_id] += 1
+                        if open_seats[course_id] is not None:
+                            open_seats[course_id] -= 1
+                    outcomes.append({'course_id': course_id, 'user_id': user_id, 'status': status})
+
+            if rows:
+                cursor.executemany(_UPSERT_SQL, rows)
+                queue_users_refresh(cursor, sorted({user_id for _, user_id in rows}))
+                user_calendar.add_enrollments(cursor, rows)
+            if waitlist_rows:
+                cursor.executemany(_WAITLIST_SQL, waitlist_rows)
+
+        for course_id, count in granted.items():
+            if count:
+                cursor.execute(
+                    "UPDATE course_seats SET seats_taken = seats_taken + %s WHERE course_id = %s",
+                    (count, course_id)
+                )
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return outcomes
@@ -0,0 +1,176 @@
+import os
+import time
+import threading
+from db.connection import get_db_connection
+
+
+def toggle_like(cursor, user_id, course_id) -> bool:
+    """
+    Flips the user's like on a course in a single statement and returns the
+    new state. The first like inserts the row; later toggles flip `liked`
+    through the UNIQUE (user_id, course_id) key, and LAST_INSERT_ID(expr)
+    hands the new value back without a second query.
+    """
+    cursor.execute("""
+        INSERT INTO course_likes (user_id, course_id, liked)
+        VALUES (%s, %s, TRUE)
+        ON DUPLICATE KEY UPDATE liked = LAST_INSERT_ID(NOT liked)
+    """, (user_id, course_id))
+
+    if cursor.rowcount == 1:
+        return True
+    return bool(cursor.lastrowid)
+
+
+class LikeCounter:
+    """
+    Coalesces like/unlike deltas per course in memory and applies them to
+    course_like_counts in one batched upsert per flush, so a popular course
+    takes one counter-row write per interval instead of one per click.
+
+    Deltas still pending when a process dies are recovered by reconcile(),
+    which recomputes every counter from course_likes.
+
+    Counts change far more often than the catalog, so they are not part of
+    the versioned catalog snapshot; readers go through like_counts.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def record(self, course_id, delta):
+        course_id = int(course_id)
+        with self._lock:
+            self._pending[course_id] = self._pending.get(course_id, 0) + delta
+
+    def flush(self):
+        """
+        Applies pending deltas. Returns the number of courses updated.
+        """
+        with self._lock:
+            pending = {cid: d for cid, d in self._pending.items() if d}
+            self._pending.clear()
+        if not pending:
+            return 0
+
+        db = get_db_connection()
+        cursor = db.cursor()
+        try:
+            # executemany only rewrites this into one multi-row INSERT when
+            # every placeholder sits in the VALUES group, so the update side
+            # reads the delta back through VALUES()
+            course_ids = sorted(pending)
+            cursor.executemany("""
+                INSERT INTO course_like_counts (course_id, like_count)
+                VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE like_count = GREATEST(like_count + VALUES(like_count), 0)
+            """, [(cid, pending[cid]) for cid in course_ids])
+            # A course's first row may have been inserted with a net unlike
+            cursor.execute(f"""
+                UPDATE course_like_counts SET like_count = 0
+                WHERE course_id IN ({','.join(['%s'] * len(course_ids))}) AND like_count < 0
+            """, tuple(course_ids))
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the deltas back so the next flush retries them
+            with self._lock:
+                for cid, delta in pending.items():
+                    self._pending[cid] = self._pending.get(cid, 0) + delta
+            raise
+        finally:
+            cursor.close()
+            db.close()
+
+        like_counts.invalidate()
+        return len(pending)
+
+    def reconcile(self):
+        """
+        Rebuilds course_like_counts from course_likes. Run off-peak: deltas
+        still pending in other workers are applied on top of the rebuilt
+        counts and corrected by the next run.
+        """
+        self.flush()
+        db = get_db_connection()
+        cursor = db.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO course_like_counts (course_id, like_count)
+                SELECT c.id, COUNT(cl.id)
+                FROM courses c
+                LEFT JOIN course_likes cl ON cl.course_id = c.id AND cl.liked = TRUE
+                GROUP BY c.id
+                ON DUPLICATE KEY UPDATE like_count = VALUES(like_count)
+            """)
+            db.commit()
+        finally:
+            cursor.close()
+            db.close()
+        like_counts.invalidate()
+
+
+class LikeCounts:
+    """
+    Per-process read cache of course_like_counts as {course_id: count},
+    reloaded with one table scan at most every `refresh_interval` seconds.
+    Counts are at most one flush interval behind anyway, so this keeps
+    the like-counts endpoint, search and popularity reads off the table.
+    """
+
+    def __init__(self, refresh_interval=30):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._counts = None
+        self._loaded_at = None
+
+    def _is_fresh(self):
+        return self._counts is not None and self._loaded_at is not None \
+            and time.monotonic() - self._loaded_at < self.refresh_interval
+
+    def get(self):
+        """
+        Returns the current {course_id: like_count}. Callers must treat it
+        as read-only.
+        """
+        if not self._is_fresh():
+            with self._lock:
+                if not self._is_fresh():
+                    self._counts = self._load()
+                    self._loaded_at = time.monotonic()
+        return self._counts
+
+    def _load(self):
+        db = get_db_connection()
+        cursor = db.cursor()
+        try:
+            cursor.execute("SELECT course_id, like_count FROM course_like_counts WHERE like_count > 0")
+            return dict(cursor.fetchall())
+        finally:
+            cursor.close()
+            db.close()
+
+    def invalidate(self):
+        """
+        Forces the next get() to reload.
+        """
+        self._loaded_at = None
+
+
+like_counter = LikeCounter()
+
+LIKE_FLUSH_INTERVAL = int(os.getenv('LIKE_FLUSH_INTERVAL', 30))
+
+like_counts = LikeCounts(
+    refresh_interval=float(os.getenv('LIKE_COUNTS_REFRESH_INTERVAL', LIKE_FLUSH_INTERVAL)),
+)
+
+
+def flush_like_counts():
+    like_counter.flush()
+
+
+def reconcile_like_counts():
+    like_counter.reconcile()
+    print("✅ Course like counters reconciled")
@@ -0,0 +1,259 @@
+import os
+import numpy as np
+from scipy import sparse
+from db.connection import get_db_connection
+
+TOP_K = int(os.getenv('RECOMMENDATIONS_TOP_K', 10))
+
+# Interaction weights: an enrollment says more than a like
+ENROLL_WEIGHT = 2.0
+LIKE_WEIGHT = 1.0
+
+
+def _load_interactions(cursor, user_ids=None):
+    """
+    Returns [(user_id, course_id, weight)] from active likes and enrollments,
+    optionally restricted to some users.
+    """
+    like_filter = enroll_filter = ''
+    params = ()
+    if user_ids:
+        # Filtered inside each arm: MySQL before 8.0.29 does not push
+        # conditions into a UNION, and would read every interaction
+        placeholders = ','.join(['%s'] * len(user_ids))
+        like_filter = f"AND user_id IN ({placeholders})"
+        enroll_filter = f"AND participant_id IN ({placeholders})"
+        params = tuple(user_ids) * 2
+
+    cursor.execute(f"""
+        SELECT user_id, course_id, SUM(weight)
+        FROM (
+            SELECT user_id, course_id, {LIKE_WEIGHT} AS weight
+            FROM course_likes
+            WHERE liked = TRUE {like_filter}
+            UNION ALL
+            SELECT participant_id AS user_id, course_id, {ENROLL_WEIGHT} AS weight
+            FROM courses_participants
+            WHERE is_active = TRUE {enroll_filter}
+        ) interactions
+        GROUP BY user_id, course_id
+    """, params)
+    return cursor.fetchall()
+
+
+def _top_k(row_indices, row_scores, k):
+    if len(row_scores) <= k:
+        order = np.argsort(-row_scores, kind='stable')
+    else:
+        part = np.argpartition(-row_scores, k)[:k]
+        order = part[np.argsort(-row_scores[part], kind='stable')]
+    return row_indices[order], row_scores[order]
+
+
+def compute_course_similarity(interactions):
+    """
+    Builds the sparse user x course matrix and returns (course_ids, S), where
+    S is the course x course cosine similarity with a zero diagonal.
+    """
+    user_index = {}
+    course_index = {}
+    rows, cols, vals = [], [], []
+    for user_id, course_id, weight in interactions:
+        rows.append(user_index.setdefault(user_id, len(user_index)))
+        cols.append(course_index.setdefault(course_id, len(course_index)))
+        vals.append(float(weight))
+
+    matrix = sparse.csr_matrix(
+        (vals, (rows, cols)), shape=(len(user_index), len(course_index)), dtype=np.float64
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = matrix @ sparse.diags(1.0 / norms)
+
+    similarity = (normalized.T @ normalized).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    course_ids = np.array(sorted(course_index, key=course_index.get))
+    return course_ids, similarity
+
+
+def _write_course_neighbors(cursor, course_ids, similarity, k):
+    rows = []
+    for i in range(similarity.shape[0]):
+        start, end = similarity.indptr[i], similarity.indptr[i + 1]
+        if start == end:
+            continue
+        neighbors, scores = _top_k(similarity.indices[start:end], similarity.data[start:end], k)
+        for rank, (j, score) in enumerate(zip(neighbors, scores), start=1):
+            rows.append((int(course_ids[i]), rank, int(course_ids[j]), float(score)))
+
+    cursor.execute("DELETE FROM course_recommendations")
+    if rows:
+        cursor.executemany("""
+            INSERT INTO course_recommendations (course_id, `rank`, recommended_course_id, score)
+            VALUES (%s, %s, %s, %s)
+        """, rows)
+    return len(rows)
+
+
+def _load_course_neighbors(cursor):
+    cursor.execute("SELECT course_id, recommended_course_id, score FROM course_recommendations")
+    neighbors = {}
+    for course_id, other_id, score in cursor.fetchall():
+        neighbors.setdefault(course_id, []).append((other_id, float(score)))
+    return neighbors
+
+
+def _score_users(interactions, neighbors, k):
+    """
+    Scores unseen courses per user as the weighted sum of the neighbor
+    similarities of the courses the user already interacted with.
+    """
+    by_user = {}
+    for user_id, course_id, weight in interactions:
+        by_user.setdefault(user_id, {})[course_id] = float(weight)
+
+    results = {}
+    for user_id, seen in by_user.items():
+        scores = {}
+        for course_id, weight in seen.items():
+            for other_id, similarity in neighbors.get(course_id, ()):
+                if other_id not in seen:
+                    scores[other_id] = scores.get(other_id, 0.0) + weight * similarity
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        results[user_id] = ranked
+    return results
+
+
+def _write_user_recommendations(cursor, results, user_ids):
+    if user_ids:
+        placeholders = ','.join(['%s'] * len(user_ids))
+        cursor.execute(
+            f"DELETE FROM user_recommendations WHERE user_id IN ({placeholders})",
+            tuple(user_ids)
+        )
+    else:
+        cursor.execute("DELETE FROM user_recommendations")
+
+    rows = [
+        (user_id, rank, course_id, score)
+        for user_id, ranked in results.items()
+        for rank, (course_id, score) in enumerate(ranked, start=1)
+    ]
+    if rows:
+        cursor.executemany("""
+            INSERT INTO user_recommendations (user_id, `rank`, course_id, score)
+            VALUES (%s, %s, %s, %s)
+        """, rows)
+    return len(rows)
+
+
+def rebuild_recommendations(k=TOP_K):
+    """
+    Full rebuild: recomputes course-course similarity from every like and
+    enrollment, then the top-K lists for every course and user.
+    """
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT NOW(6)")
+        started_at = cursor.fetchone()[0]
+
+        interactions = _load_interactions(cursor)
+        if not interactions:
+            db.commit()
+            return 0
+        course_ids, similarity = compute_course_similarity(interactions)
+        course_rows = _write_course_neighbors(cursor, course_ids, similarity, k)
+        neighbors = _load_course_neighbors(cursor)
+        user_rows = _write_user_recommendations(cursor, _score_users(interactions, neighbors, k), None)
+        # Users queued after the snapshot was read stay queued for the next refresh
+        cursor.execute("DELETE FROM recommendation_refresh_queue WHERE queued_at <= %s", (started_at,))
+        db.commit()
+        print(f"✅ Recommendations rebuilt: {course_rows} course rows, {user_rows} user rows")
+        return course_rows + user_rows
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+        db.close()
+
+
+def refresh_queued_users(k=TOP_K, batch_size=500):
+    """
+    Incremental update: recomputes recommendations only for users whose
+    likes or enrollments changed since they were last scored, using the
+    stored course neighbor lists.
+    """
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            "SELECT user_id FROM recommendation_refresh_queue ORDER BY queued_at LIMIT %s FOR UPDATE SKIP LOCKED",
+            (batch_size,)
+        )
+        user_ids = [row[0] for row in cursor.fetchall()]
+        if not user_ids:
+            db.commit()
+            return 0
+
+        neighbors = _load_course_neighbors(cursor)
+        interactions = _load_interactions(cursor, user_ids)
+        results = {user_id: [] for user_id in user_ids}
+        results.update(_score_users(interactions, neighbors, k))
+        _write_user_recommendations(cursor, results, user_ids)
+
+        placeholders = ','.join(['%s'] * len(user_ids))
+        cursor.execute(
+            f"DELETE FROM recommendation_refresh_queue WHERE user_id IN ({placeholders})",
+            tuple(user_ids)
+        )
+        db.commit()
+        return len(user_ids)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+        db.close()
+
+
+_QUEUE_SQL = """
+    INSERT INTO recommendation_refresh_queue (user_id)
+    VALUES (%s)
+    ON DUPLICATE KEY UPDATE queued_at = CURRENT_TIMESTAMP(6)
+"""
+
+
+def queue_user_refresh(cursor, user_id):
+    """
+    Marks a user for incremental re-scoring. Call inside the transaction that
+    changed the user's likes or enrollments.
+    """
+    cursor.execute(_QUEUE_SQL, (user_id,))
+
+
+def queue_users_refresh(cursor, user_ids):
+    if user_ids:
+        cursor.executemany(_QUEUE_SQL, [(user_id,) for user_id in user_ids])
+
+
+def refresh_recommendations():
+    return refresh_queued_users()
+
+
+def get_user_recommendations(cursor, user_id, limit=TOP_K):
+    """
+    Reads a user's precomputed recommendations (primary key range scan).
+    """
+    cursor.execute("""
+        SELECT c.id, c.name, c.category, ur.score
+        FROM user_recommendations ur
+        JOIN courses c ON c.id = ur.course_id
+        WHERE ur.user_id = %s
+        ORDER BY ur.`rank`
+        LIMIT %s
+    """, (user_id, limit))
+    return cursor.fetchall()
@@ -0,0 +1,235 @@
+import os
+import json
+import datetime
+import unicodedata
+from zoneinfo import ZoneInfo
+from db.connection import get_db_connection
+from schedule.clock import APP_TIMEZONE, today_local
+from schedule import user_calendar
+
+# How far ahead weekly rules are materialized into course_sessions
+SESSION_HORIZON_DAYS = int(os.getenv('SESSION_HORIZON_DAYS', 120))
+
+_WEEKDAYS = {
+    # English
+    'monday': 0, 'mon': 0, 'tuesday': 1, 'tue': 1, 'wednesday': 2, 'wed': 2,
+    'thursday': 3, 'thu': 3, 'friday': 4, 'fri': 4, 'saturday': 5, 'sat': 5,
+    'sunday': 6, 'sun': 6,
+    # Spanish (accents are stripped before lookup)
+    'lunes': 0, 'martes': 1, 'miercoles': 2, 'jueves': 3, 'viernes': 4,
+    'sabado': 5, 'domingo': 6,
+    # Hebrew
+    'שני': 0, 'שלישי': 1, 'רביעי': 2, 'חמישי': 3, 'שישי': 4, 'שבת': 5, 'ראשון': 6,
+}
+
+
+def _weekday(name):
+    key = unicodedata.normalize('NFKD', str(name).strip().lower())
+    key = ''.join(ch for ch in key if not unicodedata.combining(ch))
+    if key.startswith('יום '):
+        key = key[len('יום '):].strip()
+    if key not in _WEEKDAYS:
+        raise ValueError(f'Unknown weekday: {name}')
+    return _WEEKDAYS[key]
+
+
+def _time(value):
+    return datetime.time.fromisoformat(str(value).strip())
+
+
+def _weekly_rule(item):
+    """
+    Accepts {'day': 'monday', 'time': '10:00'} or 'Monday 10:00'.
+    """
+    if isinstance(item, dict):
+        return _weekday(item['day']), _time(item['time'])
+    day, _, time_part = str(item).strip().rpartition(' ')
+    return _weekday(day), _time(time_part)
+
+
+def parse_schedule(raw):
+    """
+    Normalizes a course schedule into a rule dict:
+
+        {
+          'timezone': ZoneInfo,
+          'start_date': date | None, 'end_date': date | None,
+          'weekly': [(weekday, time)],
+          'dates': [datetime],            # explicit one-off occurrences
+          'exceptions': [date | datetime] # cancelled days / occurrences
+        }
+
+    Supported inputs: the legacy list of ISO datetimes, a comma-separated
+    string of them, 'Weekday HH:MM' entries (English, Spanish or Hebrew day
+    names), or a dict with timezone / start_date / end_date / weekly /
+    dates / exceptions keys. Raises ValueError on anything else.
+    """
+    if raw is None or raw == '':
+        raw = []
+    if isinstance(raw, (bytes, bytearray)):
+        raw = raw.decode('utf-8')
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            raw = [part.strip() for part in raw.split(',') if part.strip()]
+
+    if isinstance(raw, str):
+        raw = [raw]
+    if isinstance(raw, list):
+        raw = {'entries': raw}
+    if not isinstance(raw, dict):
+        raise ValueError('Schedule must be a list or an object')
+
+    tz = ZoneInfo(raw['timezone']) if raw.get('timezone') else APP_TIMEZONE
+    rule = {
+        'timezone': tz,
+        'start_date': datetime.date.fromisoformat(raw['start_date']) if raw.get('start_date') else None,
+        'end_date': datetime.date.fromisoformat(raw['end_date']) if raw.get('end_date') else None,
+        'weekly': [_weekly_rule(item) for item in raw.get('weekly', [])],
+        'dates': [],
+        'exceptions': [],
+    }
+
+    for entry in list(raw.get('entries', [])) + list(raw.get('dates', [])):
+        if isinstance(entry, dict):
+            rule['weekly'].append(_weekly_rule(entry))
+            continue
+        try:
+            rule['dates'].append(datetime.datetime.fromisoformat(str(entry).strip()))
+        except ValueError:
+            rule['weekly'].append(_weekly_rule(entry))
+
+    for entry in raw.get('exceptions', []):
+        text = str(entry).strip()
+        if len(text) == 10:
+            rule['exceptions'].append(datetime.date.fromisoformat(text))
+        else:
+            rule['exceptions'].append(datetime.datetime.fromisoformat(text))
+
+    return rule
+
+
+def _localize(value, tz):
+    return value.replace(tzinfo=tz) if value.tzinfo is None else value
+
+
+def expand(rule, window_start, window_end):
+    """
+    Expands a parsed rule into the sorted occurrences whose date, in
+    APP_TIMEZONE, falls within [window_start, window_end]. Returns a list of
+    (session_date, session_time) tuples in APP_TIMEZONE.
+    """
+    tz = rule['timezone']
+    skip_days = {e for e in rule['exceptions'] if not isinstance(e, datetime.datetime)}
+    skip_times = {_localize(e, tz) for e in rule['exceptions'] if isinstance(e, datetime.datetime)}
+
+    candidates = [_localize(d, tz) for d in rule['dates']]
+
+    if rule['weekly']:
+        # Pad by a day on each side so zone offsets cannot push an edge
+        # occurrence out of the window
+        first = window_start - datetime.timedelta(days=1)
+        last = window_end + datetime.timedelta(days=1)
+        if rule['start_date']:
+            first = max(first, rule['start_date'])
+        if rule['end_date']:
+            last = min(last, rule['end_date'])
+
+        day = first
+        while day <= last:
+            for weekday, at in rule['weekly']:
+                if day.weekday() == weekday:
+                    candidates.append(datetime.datetime.combine(day, at, tzinfo=tz))
+            day += datetime.timedelta(days=1)
+
+    occurrences = set()
+    for occurrence in candidates:
+        local = occurrence.astimezone(tz)
+        if local.date() in skip_days or local in skip_times:
+            continue
+        app_local = occurrence.astimezone(APP_TIMEZONE)
+        if window_start <= app_local.date() <= window_end:
+            occurrences.add((app_local.date(), app_local.time().replace(tzinfo=None)))
+    return sorted(occurrences)
+
+
+def _as_time(value):
+    # mysql-connector returns TIME columns as timedelta
+    if isinstance(value, datetime.timedelta):
+        return (datetime.datetime.min + value).time()
+    return value
+
+
+def materialize_course_sessions(cursor, course_id, schedule, start=None, horizon_days=SESSION_HORIZON_DAYS):
+    """
+    Syncs future schedule-generated course_sessions rows with the course's
+    schedule definition: inserts missing occurrences and deletes generated
+    ones that are no longer in the schedule. Past sessions and manually
+    added sessions are left alone. Returns (inserted, deleted).
+    """
+    start = start or today_local()
+    end = max(start, today_local()) + datetime.timedelta(days=horizon_days)
+    wanted = set(expand(parse_schedule(schedule), start, end))
+
+    cursor.execute("""
+        SELECT id, session_date, session_time
+        FROM course_sessions
+        WHERE course_id = %s AND source = 'schedule' AND session_date >= %s
+    """, (course_id, start))
+    existing = {(row[1], _as_time(row[2])): row[0] for row in cursor.fetchall()}
+
+    stale = [session_id for key, session_id in existing.items() if key not in wanted]
+    missing = sorted(key for key in wanted if key not in existing)
+
+    if stale:
+        placeholders = ','.join(['%s'] * len(stale))
+        cursor.execute(f"DELETE FROM course_sessions WHERE id IN ({placeholders})", tuple(stale))
+    if missing:
+        cursor.executemany("""
+            INSERT IGNORE INTO course_sessions (course_id, session_date, session_time, source)
+            VALUES (%s, %s, %s, 'schedule')
+        """, [(course_id, day, at) for day, at in missing])
+
+    if stale or missing:
+        user_calendar.sync_course(cursor, course_id)
+
+    return len(missing), len(stale)
+
+
+def materialize_all_courses(db, start=None):
+    """
+    Backfill / rolling-horizon job: materializes every course's schedule,
+    one transaction per course. Pass an earlier `start` to also backfill
+    past one-off dates. Returns {course_id: (inserted, deleted)}; courses
+    with an unparseable schedule are reported and skipped.
+    """
+    cursor = db.cursor()
+    results = {}
+    try:
+        cursor.execute("SELECT id, schedule FROM courses ORDER BY id")
+        courses = cursor.fetchall()
+        for course_id, schedule in courses:
+            try:
+                results[course_id] = materialize_course_sessions(cursor, course_id, schedule, start=start)
+                db.commit()
+            except (ValueError, KeyError, TypeError) as err:
+                db.rollback()
+                print(f"[WARN] Course {course_id} has an invalid schedule: {err}")
+    finally:
+        cursor.close()
+    return results
+
+
+def extend_session_horizon():
+    """
+    Daily job: rolls the materialized horizon forward for every course.
+    """
+    db = get_db_connection()
+    try:
+        results = materialize_all_courses(db)
+    finally:
+        db.close()
+    inserted = sum(r[0] for r in results.values())
+    print(f"📅 Session horizon extended: {inserted} sessions added across {len(results)} courses")
+    return inserted
@@ -0,0 +1,249 @@
+import re
+import hashlib
+import threading
+import unicodedata
+from courses.catalog import catalog_snapshot
+from courses.likes import like_counts
+
+# Field weights used for ranking
+SEARCH_FIELDS = {
+    'name': 3.0,
+    'category': 2.0,
+    'suitableFor': 1.0,
+    'medicalNote': 1.0,
+}
+
+_FINAL_LETTERS = str.maketrans({
+    'ך': 'כ',
+    'ם': 'מ',
+    'ן': 'נ',
+    'ף': 'פ',
+    'ץ': 'צ',
+})
+
+# Hebrew cantillation marks and niqqud points (U+0591..U+05C7), except the
+# maqaf and sof pasuq punctuation, which the tokenizer treats as separators
+_NIQQUD = re.compile('[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]')
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    """
+    Normalizes text for indexing and querying: strips niqqud, folds Hebrew
+    final letters, drops Latin accents (Spanish) and case-folds.
+    """
+    text = _NIQQUD.sub('', text or '')
+    text = text.translate(_FINAL_LETTERS)
+    decomposed = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return text.casefold()
+
+
+def tokenize(text: str):
+    return _TOKEN.findall(normalize(text))
+
+
+class _TrieNode:
+    __slots__ = ('children', 'term')
+
+    def __init__(self):
+        self.children = {}
+        self.term = None
+
+
+class PrefixTrie:
+    """
+    Prefix tree over indexed terms, used for autocomplete and for expanding
+    the last (still being typed) query word.
+    """
+
+    def __init__(self):
+        self._root = _TrieNode()
+
+    def add(self, term):
+        node = self._root
+        for ch in term:
+            node = node.children.setdefault(ch, _TrieNode())
+        node.term = term
+
+    def remove(self, term):
+        path = [self._root]
+        for ch in term:
+            node = path[-1].children.get(ch)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].term = None
+        # Prune empty branches bottom-up
+        for depth in range(len(term), 0, -1):
+            node = path[depth]
+            if node.term is None and not node.children:
+                del path[depth - 1].children[term[depth - 1]]
+            else:
+                break
+
+    def complete(self, prefix, limit=None):
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        terms = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.term is not None:
+                terms.append(node.term)
+                if limit is not None and len(terms) >= limit:
+                    break
+            stack.extend(node.children.values())
+        return terms
+
+
+class CourseSearchIndex:
+    """
+    In-memory inverted index over the course catalog.
+
+    The index follows the catalog snapshot: when the catalog version changes
+    it diffs each course's searchable fields by fingerprint and re-indexes
+    only the courses that were added, changed or removed.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}        # term -> {course_id: weight}
+        self._doc_terms = {}       # course_id -> {term: weight}
+        self._fingerprints = {}    # course_id -> digest of searchable fields
+        self._courses = {}         # course_id -> course dict
+        self._trie = PrefixTrie()
+        self._version = None
+        self.reindexed = 0
+
+    @staticmethod
+    def _fingerprint(course):
+        raw = '\x1f'.join(str(course.get(field) or '') for field in SEARCH_FIELDS)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _terms_for(course):
+        terms = {}
+        for field, weight in SEARCH_FIELDS.items():
+            for term in tokenize(str(course.get(field) or '')):
+                terms[term] = terms.get(term, 0.0) + weight
+        return terms
+
+    def _remove_doc(self, course_id):
+        for term in self._doc_terms.pop(course_id, {}):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(course_id, None)
+            if not postings:
+                del self._postings[term]
+                self._trie.remove(term)
+        self._fingerprints.pop(course_id, None)
+        self._courses.pop(course_id, None)
+
+    def _add_doc(self, course, fingerprint):
+        course_id = course['id']
+        terms = self._terms_for(course)
+        for term, weight in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._trie.add(term)
+            postings[course_id] = weight
+        self._doc_terms[course_id] = terms
+        self._fingerprints[course_id] = fingerprint
+        self._courses[course_id] = course
+
+    def sync(self):
+        """
+        Brings the index up to date with the catalog snapshot.
+        """
+        _, _, version = catalog_snapshot.get()
+        if version == self._version and self._courses:
+            return
+        courses = catalog_snapshot.courses()
+
+        with self._lock:
+            seen = set()
+            for course in courses:
+                course_id = course['id']
+                seen.add(course_id)
+                fingerprint = self._fingerprint(course)
+                if self._fingerprints.get(course_id) == fingerprint:
+                    # Searchable fields unchanged; refresh display fields only
+                    self._courses[course_id] = course
+                    continue
+                self._remove_doc(course_id)
+                self._add_doc(course, fingerprint)
+                self.reindexed += 1
+            for course_id in [cid for cid in self._courses if cid not in seen]:
+                self._remove_doc(course_id)
+            self._version = version
+
+    def _match(self, term, as_prefix):
+        """
+        Returns {course_id: weight} for a query word. The last word of the
+        query also matches every indexed term it is a prefix of.
+        """
+        if not as_prefix:
+            return dict(self._postings.get(term, {}))
+        matches = {}
+        for candidate in self._trie.complete(term, limit=200):
+            # Exact matches outrank prefix matches
+            factor = 1.0 if candidate == term else 0.5
+            for course_id, weight in self._postings[candidate].items():
+                matches[course_id] = max(matches.get(course_id, 0.0), weight * factor)
+        return matches
+
+    def search(self, query, limit=20):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        self.sync()
+
+        with self._lock:
+            scores = None
+            for i, term in enumerate(terms):
+                matches = self._match(term, as_prefix=(i == len(terms) - 1))
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {cid: scores[cid] + w for cid, w in matches.items() if cid in scores}
+                if not scores:
+                    return []
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            counts = like_counts.get()
+            results = []
+            for course_id, score in ranked:
+                course = self._courses[course_id]
+                results.append({
+                    'id': course_id,
+                    'name': course.get('name'),
+                    'category': course.get('category'),
+                    'suitableFor': course.get('suitableFor'),
+                    'like_count': counts.get(course_id, 0),
+                    'score': round(score, 3),
+                })
+            return results
+
+    def autocomplete(self, prefix, limit=10):
+        """
+        Suggests indexed words starting with the last word of `prefix`,
+        most common first.
+        """
+        terms = tokenize(prefix)
+        if not terms:
+            return []
+        self.sync()
+
+        with self._lock:
+            candidates = self._trie.complete(terms[-1], limit=500)
+            candidates.sort(key=lambda t: (-len(self._postings.get(t, ())), t))
+            return candidates[:limit]
+
+
+search_index = CourseSearchIndex()
@@ -1,14 +1,86 @@
 import os
+import threading
 import mysql.connector
+from mysql.connector.constants import ClientFlag
 from dotenv import load_dotenv
+from flask import g, has_app_context
+from db.pool import ConnectionPool
 
 load_dotenv(dotenv_path="../.env")  # Load environment variables from a .env file
 
-def get_db_connection():
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _connect():
     return mysql.connector.connect(
         host=os.getenv('MYSQL_HOST', 'localhost'),
         user=os.getenv('MYSQL_USER', 'root'),
         password=os.getenv('MYSQL_PASSWORD', ''),
         database=os.getenv('MYSQL_DATABASE', 'time_to_weave'),
+        charset='utf8mb4',
+        collation='utf8mb4_unicode_ci',
+        # Report changed rows, not matched rows, so ON DUPLICATE KEY UPDATE
+        # returns 1 (inserted), 2 (updated) or 0 (unchanged)
+        client_flags=[-ClientFlag.FOUND_ROWS],
         auth_plugin='mysql_native_password'  # Optional: depending on your MySQL setup
     )
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Returns the process-wide connection pool, creating it on first use.
+    Sizing is configured through DB_POOL_* environment variables.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    size=int(os.getenv('DB_POOL_SIZE', 5)),
+                    max_overflow=int(os.getenv('DB_POOL_MAX_OVERFLOW', 10)),
+                    recycle=int(os.getenv('DB_POOL_RECYCLE', 3600)),
+                    pre_ping=os.getenv('DB_POOL_PRE_PING', '1') not in ('0', 'false', 'False'),
+                    timeout=float(os.getenv('DB_POOL_TIMEOUT', 30)),
+                )
+    return _pool
+
+
+def get_db_connection():
+    """
+    Returns a pooled connection.
+
+    Inside a Flask app context every caller shares one borrowed connection,
+    stored on flask.g and returned to the pool by the teardown hook; calling
+    close() on it is a no-op. Outside a request (scheduler jobs, scripts)
+    each call checks out its own connection and close() returns it.
+    """
+    if not has_app_context():
+        return get_pool().acquire()
+
+    conn = g.get('_db_conn')
+    if conn is None:
+        conn = get_pool().acquire(request_scoped=True)
+        g._db_conn = conn
+    return conn
+
+
+def release_request_connection(exc=None):
+    """
+    Teardown hook: returns the request's connection to the pool.
+    """
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.release()
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+def init_app(app):
+    """
+    Registers the teardown hook that returns request-scoped connections.
+    """
+    app.teardown_appcontext(release_request_connection)
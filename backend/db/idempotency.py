@@ -0,0 +1,226 @@
+import os
+import time
+import hashlib
+from functools import wraps
+import mysql.connector
+from mysql.connector import errorcode
+from flask import Response, g, jsonify, make_response, request
+from db.connection import get_db_connection
+from auth.token_utils import get_user_id_from_token
+
+IDEMPOTENCY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_TTL_HOURS', 24))
+# How long a first request owns its key; a crashed owner's key is taken over after this
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv('IDEMPOTENCY_LEASE_SECONDS', 60))
+# How long a duplicate waits for the in-flight original before answering 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 10))
+MAX_KEY_LENGTH = 255
+# Attempts at storing the owner's response when it hits a lock error
+COMPLETE_RETRIES = 5
+
+CLAIMED = 'claimed'
+COMPLETED = 'completed'
+IN_FLIGHT = 'in_flight'
+MISMATCH = 'mismatch'
+
+_RETRYABLE = (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT)
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def claim_key(db, key_hash, user_id, endpoint, request_hash):
+    """
+    Tries to make this request the owner of an idempotency key.
+    Returns (outcome, row): CLAIMED, or for an existing key COMPLETED (row
+    holds the stored response), IN_FLIGHT (the original is still running)
+    or MISMATCH (the key was used for a different request). Expired keys
+    and keys whose owner's lease ran out are taken over.
+
+    The row is locked exclusively from the first statement: INSERT IGNORE
+    would take a shared lock on an existing key, and upgrading it for the
+    SELECT ... FOR UPDATE deadlocks against a concurrent duplicate or the
+    owner's complete_key().
+    """
+    cursor = db.cursor(dictionary=True)
+    try:
+        # A no-op update leaves rowcount 0 (FOUND_ROWS is off), 1 means inserted
+        cursor.execute("""
+            INSERT INTO idempotency_keys
+                (key_hash, user_id, endpoint, request_hash, locked_until, expires_at)
+            VALUES (%s, %s, %s, %s, NOW() + INTERVAL %s SECOND, NOW() + INTERVAL %s HOUR)
+            ON DUPLICATE KEY UPDATE key_hash = key_hash
+        """, (key_hash, user_id, endpoint, request_hash, IDEMPOTENCY_LEASE_SECONDS, IDEMPOTENCY_TTL_HOURS))
+        if cursor.rowcount == 1:
+            db.commit()
+            return CLAIMED, None
+
+        cursor.execute("""
+            SELECT status, request_hash, response_code, response_type, response_body,
+                   expires_at < NOW() AS expired, locked_until < NOW() AS lease_expired
+            FROM idempotency_keys
+            WHERE key_hash = %s
+            FOR UPDATE
+        """, (key_hash,))
+        row = cursor.fetchone()
+
+        if row['expired'] or (row['status'] == IN_FLIGHT and row['lease_expired']):
+            cursor.execute("""
+                UPDATE idempotency_keys
+                SET status = 'in_flight', request_hash = %s,
+                    response_code = NULL, response_type = NULL, response_body = NULL,
+                    locked_until = NOW() + INTERVAL %s SECOND,
+                    expires_at = NOW() + INTERVAL %s HOUR
+                WHERE key_hash = %s
+            """, (request_hash, IDEMPOTENCY_LEASE_SECONDS, IDEMPOTENCY_TTL_HOURS, key_hash))
+            outcome = CLAIMED
+        elif row['request_hash'] != request_hash:
+            outcome = MISMATCH
+        else:
+            outcome = row['status']
+        db.commit()
+        return outcome, row
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def complete_key(db, key_hash, response):
+    """
+    Stores the response of the request that owns the key. Lock errors are
+    retried: the view's work is already committed, and a key left in
+    flight would let a retry run it again once the lease expires.
+    """
+    cursor = db.cursor()
+    try:
+        for attempt in range(COMPLETE_RETRIES):
+            try:
+                cursor.execute("""
+                    UPDATE idempotency_keys
+                    SET status = 'completed', response_code = %s, response_type = %s, response_body = %s
+                    WHERE key_hash = %s
+                """, (response.status_code, response.mimetype, response.get_data(as_text=True), key_hash))
+                db.commit()
+                return
+            except mysql.connector.Error as err:
+                db.rollback()
+                if err.errno not in _RETRYABLE or attempt == COMPLETE_RETRIES - 1:
+                    raise
+                time.sleep(0.05 * 2 ** attempt)
+    finally:
+        cursor.close()
+
+
+def release_key(db, key_hash):
+    """
+    Forgets a key whose request failed, so a retry executes it again.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute("DELETE FROM idempotency_keys WHERE key_hash = %s AND status = 'in_flight'", (key_hash,))
+        db.commit()
+    finally:
+        cursor.close()
+
+
+def idempotent(endpoint):
+    """
+    Honors an `Idempotency-Key` header on a POST view. The first request
+    with a key runs the view and its response is stored for
+    IDEMPOTENCY_TTL_HOURS; a retry with the same key and body gets the
+    stored response back (with `Idempotent-Replayed: true`) instead of
+    running the view again. A duplicate arriving while the original is
+    still running waits for it, up to IDEMPOTENCY_WAIT_SECONDS.
+
+    Keys are scoped per user and endpoint. 5xx responses are not stored.
+    Requests without the header behave as before.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if key is None:
+                return view(*args, **kwargs)
+            key = key.strip()
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return jsonify({'error': f'Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters'}), 400
+
+            user_id = g.get('user_id') or get_user_id_from_token(request)
+            if not user_id:
+                return view(*args, **kwargs)  # the view answers 401
+
+            key_hash = _sha256(user_id, endpoint, key)
+            request_hash = _sha256(request.method, request.path, request.get_data())
+
+            db = get_db_connection()
+            deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+            delay = 0.05
+            while True:
+                try:
+                    outcome, row = claim_key(db, key_hash, user_id, endpoint, request_hash)
+                except mysql.connector.Error as err:
+                    if err.errno not in _RETRYABLE:
+                        raise
+                    outcome, row = IN_FLIGHT, None  # lost a lock race; look again
+                if outcome == CLAIMED:
+                    break
+                if outcome == MISMATCH:
+                    return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+                if outcome == COMPLETED:
+                    replay = Response(row['response_body'], status=row['response_code'], mimetype=row['response_type'])
+                    replay.headers['Idempotent-Replayed'] = 'true'
+                    return replay
+                if time.monotonic() >= deadline:
+                    response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+                    response.headers['Retry-After'] = '1'
+                    return response, 409
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                db = get_db_connection()
+                db.rollback()
+                release_key(db, key_hash)
+                raise
+            # Whatever the view left uncommitted would be rolled back at
+            # check-in anyway; it must not ride along with the key update
+            db = get_db_connection()
+            db.rollback()
+            if response.status_code >= 500 or response.is_streamed:
+                release_key(db, key_hash)
+            else:
+                complete_key(db, key_hash, response)
+            return response
+        return wrapper
+    return decorator
+
+
+def prune_idempotency_keys(batch_size=1000):
+    """
+    Scheduler job: deletes expired keys in small batches, each its own
+    transaction, so the purge never holds long locks. Returns the count.
+    """
+    db = get_db_connection()
+    cursor = db.cursor()
+    deleted = 0
+    try:
+        while True:
+            cursor.execute(
+                "DELETE FROM idempotency_keys WHERE expires_at < NOW() ORDER BY expires_at LIMIT %s",
+                (batch_size,)
+            )
+            db.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return deleted
+    finally:
+        cursor.close()
+        db.close()
@@ -0,0 +1,72 @@
+import base64
+from datetime import datetime
+
+# Position before every row, for streams the client has not seen anything of
+ORIGIN = (datetime(1970, 1, 1), 0)
+
+
+def encode_cursor(position):
+    """
+    Encodes a (timestamp, id) keyset position as an opaque URL-safe token.
+    """
+    value, row_id = position
+    raw = f"{value.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Inverse of encode_cursor. Raises ValueError on a malformed token.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        value, row_id = raw.split('|')
+        return datetime.fromisoformat(value), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {token}') from e
+
+
+def partitioned_page(cursor, table, columns, partition_column, partitions, sort_column,
+                     limit, before=None, after=None):
+    """
+    One keyset page of `table` ordered by (sort_column, id) across several
+    partitions, e.g. the messages of all of a user's courses.
+
+    Each partition is read as its own UNION ALL arm with its own LIMIT, so
+    with an index on (partition_column, sort_column, id) every arm is a
+    short index range scan and the merge sorts at most
+    len(partitions) * (limit + 1) rows, however long the history is.
+
+    Without `after` rows come newest first, older than `before` if given;
+    with `after` they come oldest first, newer than `after` (incremental
+    sync). Returns (rows, has_more). `columns` must include sort_column and id.
+    """
+    if not partitions:
+        return [], False
+
+    if after is not None:
+        position, order = after, 'ASC'
+        keyset = f"({sort_column} > %s OR ({sort_column} = %s AND id > %s))"
+    else:
+        position, order = before, 'DESC'
+        keyset = f"({sort_column} < %s OR ({sort_column} = %s AND id < %s))"
+
+    arm = f"SELECT {columns} FROM {table} WHERE {partition_column} = %s"
+    if position is not None:
+        arm += f" AND {keyset}"
+    arm += f" ORDER BY {sort_column} {order}, id {order} LIMIT %s"
+
+    params = []
+    for partition in partitions:
+        params.append(partition)
+        if position is not None:
+            params.extend((position[0], position[0], position[1]))
+        params.append(limit + 1)
+
+    cursor.execute(
+        " UNION ALL ".join(f"({arm})" for _ in partitions)
+        + f" ORDER BY {sort_column} {order}, id {order} LIMIT %s",
+        (*params, limit + 1)
+    )
+    rows = cursor.fetchall()
+    return rows[:limit], len(rows) > limit
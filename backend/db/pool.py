@@ -0,0 +1,211 @@
+import time
+import threading
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection could be checked out within the pool timeout.
+    """
+
+
+class PooledConnection:
+    """
+    Thin proxy around a raw MySQL connection borrowed from a ConnectionPool.
+    Every attribute is forwarded to the raw connection, except close(), which
+    hands the connection back to the pool instead of tearing it down.
+
+    When request_scoped is True, close() is a no-op: the connection belongs to
+    the current Flask request and is released by the teardown hook, so route
+    handlers can keep calling db.close() as they always did.
+    """
+
+    def __init__(self, pool, raw, created_at, request_scoped=False):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._request_scoped = request_scoped
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._request_scoped:
+            return
+        self.release()
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool._checkin(self._raw, self._created_at)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of MySQL connections.
+
+    - size: number of idle connections kept open between checkouts.
+    - max_overflow: extra connections opened under load and closed on return.
+    - recycle: seconds after which a connection is closed and reopened.
+    - pre_ping: ping idle connections before handing them out.
+    - timeout: seconds to wait for a free connection before PoolTimeout.
+    """
+
+    def __init__(self, connect, size=5, max_overflow=10, recycle=3600, pre_ping=True, timeout=30):
+        self._connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self._checked_out = 0
+
+        self._connects = 0
+        self._recycled = 0
+        self._invalidated = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+
+    def acquire(self, request_scoped=False):
+        """
+        Checks out a connection, opening a new one if the pool has room,
+        otherwise waiting up to `timeout` seconds for one to be returned.
+        """
+        raw, created_at = self._checkout()
+        return PooledConnection(self, raw, created_at, request_scoped=request_scoped)
+
+    def _checkout(self):
+        deadline = None
+        waited_since = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                    self._checked_out += 1
+                    break
+                if self._open < self.size + self.max_overflow:
+                    raw, created_at = None, None
+                    self._open += 1
+                    self._checked_out += 1
+                    break
+
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    deadline = waited_since + self.timeout
+                    self._waits += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._wait_time += time.monotonic() - waited_since
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout}s"
+                    )
+                self._cond.wait(remaining)
+
+            if waited_since is not None:
+                self._wait_time += time.monotonic() - waited_since
+
+        # Network work happens outside the lock
+        try:
+            if raw is not None:
+                raw = self._validate(raw, created_at)
+            if raw is None:
+                raw, created_at = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+        return raw, created_at
+
+    def _new_connection(self):
+        raw = self._connect()
+        with self._cond:
+            self._connects += 1
+        return raw, time.monotonic()
+
+    def _validate(self, raw, created_at):
+        """
+        Returns the connection if it is still usable, otherwise closes it and
+        returns None so the caller opens a fresh one.
+        """
+        if self.recycle and time.monotonic() - created_at > self.recycle:
+            self._discard(raw)
+            with self._cond:
+                self._recycled += 1
+            return None
+
+        if self.pre_ping:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                self._discard(raw)
+                with self._cond:
+                    self._invalidated += 1
+                return None
+        return raw
+
+    def _checkin(self, raw, created_at):
+        # Drop any open transaction so the next borrower starts clean
+        healthy = True
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._checked_out -= 1
+            if healthy and len(self._idle) < self.size:
+                self._idle.append((raw, created_at))
+                self._cond.notify()
+                return
+            self._open -= 1
+            if not healthy:
+                self._invalidated += 1
+            self._cond.notify()
+        self._discard(raw)
+
+    @staticmethod
+    def _discard(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def dispose(self):
+        """
+        Closes every idle connection. Checked-out connections are closed when
+        they are returned if the pool is over its idle size.
+        """
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'idle': len(self._idle),
+                'checked_out': self._checked_out,
+                'overflow': max(0, self._open - self.size),
+                'connects': self._connects,
+                'recycled': self._recycled,
+                'invalidated': self._invalidated,
+                'waits': self._waits,
+                'wait_time_seconds': round(self._wait_time, 6),
+                'timeouts': self._timeouts,
+            }
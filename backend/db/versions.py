@@ -0,0 +1,28 @@
+from db.connection import get_db_connection
+
+
+def bump_version(cursor, name: str):
+    """
+    Increments the named cache version inside the caller's transaction, so the
+    bump commits (or rolls back) together with the write it describes.
+    """
+    cursor.execute("""
+        INSERT INTO cache_versions (name, version)
+        VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """, (name,))
+
+
+def get_version(name: str) -> int:
+    """
+    Returns the current version of a named cache, or 0 if it was never bumped.
+    """
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT version FROM cache_versions WHERE name = %s", (name,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        cursor.close()
+        db.close()
@@ -0,0 +1,29 @@
+def get_watermark(cursor, name: str, default=None):
+    """
+    Returns a job's persisted high-water mark, locking its row until the
+    caller's transaction ends so two runners cannot process the same range.
+    Returns `default` (and creates nothing) if the job never ran.
+    """
+    cursor.execute("SELECT position FROM job_watermarks WHERE name = %s FOR UPDATE", (name,))
+    row = cursor.fetchone()
+    return row[0] if row else default
+
+
+def set_watermark(cursor, name: str, position):
+    """
+    Advances a job's high-water mark inside the transaction that processed
+    everything up to it.
+    """
+    cursor.execute("""
+        INSERT INTO job_watermarks (name, position)
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE position = VALUES(position)
+    """, (name, position))
+
+
+def all_watermarks(cursor):
+    """
+    Returns {name: (position, updated_at)} for every job.
+    """
+    cursor.execute("SELECT name, position, updated_at FROM job_watermarks ORDER BY name")
+    return {name: (position, updated_at) for name, position, updated_at in cursor.fetchall()}
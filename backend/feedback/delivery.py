@@ -0,0 +1,134 @@
+import os
+import asyncio
+from email.message import EmailMessage
+from db.connection import get_db_connection
+from feedback.messages import render_reminder
+from notifications.mailer import send_all, MAIL_FROM
+
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', 200))
+# Across runs: a failed row waits 2^attempts minutes, up to MAX_ATTEMPTS
+MAX_ATTEMPTS = int(os.getenv('REMINDER_MAX_ATTEMPTS', 6))
+# How long a claimed batch is reserved before another worker may retry it
+CLAIM_LEASE_SECONDS = int(os.getenv('REMINDER_CLAIM_LEASE', 600))
+
+
+def _in_clause(values):
+    return ','.join(['%s'] * len(values))
+
+
+def claim_batch(db, batch_size=REMINDER_BATCH_SIZE):
+    """
+    Claims up to batch_size due reminders. Rows are picked with FOR UPDATE
+    SKIP LOCKED, so concurrent workers get disjoint batches, and reserved by
+    pushing next_attempt_at past the lease before the transaction commits;
+    no row locks are held while mail is being sent.
+    """
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT id
+            FROM feedback_reminders
+            WHERE is_sent = 0
+              AND attempts < %s
+              AND (next_attempt_at IS NULL OR next_attempt_at <= NOW())
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (MAX_ATTEMPTS, batch_size))
+        ids = [row['id'] for row in cursor.fetchall()]
+        if not ids:
+            db.commit()
+            return []
+
+        cursor.execute(f"""
+            UPDATE feedback_reminders
+            SET attempts = attempts + 1,
+                next_attempt_at = NOW() + INTERVAL %s SECOND
+            WHERE id IN ({_in_clause(ids)})
+        """, (CLAIM_LEASE_SECONDS, *ids))
+
+        cursor.execute(f"""
+            SELECT fr.id, fr.type, fr.course_id, fr.session_date, fr.attempts,
+                   u.email, u.full_name, u.preferred_language, c.name AS course_name
+            FROM feedback_reminders fr
+            JOIN users u ON u.id = fr.participant_id
+            JOIN courses c ON c.id = fr.course_id
+            WHERE fr.id IN ({_in_clause(ids)})
+        """, tuple(ids))
+        reminders = cursor.fetchall()
+        db.commit()
+        return reminders
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _build_message(reminder):
+    subject, body = render_reminder(reminder)
+    message = EmailMessage()
+    message['From'] = MAIL_FROM
+    message['To'] = reminder['email']
+    message['Subject'] = subject
+    message.set_content(body)
+    return message
+
+
+def record_results(db, sent_ids, failed):
+    """
+    Marks delivered rows sent in one UPDATE and schedules failed rows for a
+    later attempt (or gives up on permanent failures).
+    """
+    cursor = db.cursor()
+    try:
+        if sent_ids:
+            cursor.execute(f"""
+                UPDATE feedback_reminders
+                SET is_sent = 1, sent_at = NOW(), next_attempt_at = NULL, last_error = NULL
+                WHERE id IN ({_in_clause(sent_ids)})
+            """, tuple(sent_ids))
+        if failed:
+            cursor.executemany("""
+                UPDATE feedback_reminders
+                SET next_attempt_at = NOW() + INTERVAL POW(2, attempts) MINUTE,
+                    attempts = IF(%s, %s, attempts),
+                    last_error = %s
+                WHERE id = %s
+            """, [(permanent, MAX_ATTEMPTS, error[:255], reminder_id)
+                  for reminder_id, error, permanent in failed])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def deliver_reminders(max_batches=10):
+    """
+    Scheduler job: claims, sends and records up to max_batches batches.
+    Returns the number of reminders delivered.
+    """
+    delivered = 0
+    db = get_db_connection()
+    try:
+        for _ in range(max_batches):
+            reminders = claim_batch(db)
+            if not reminders:
+                break
+            sent_ids, failed = asyncio.run(send_all(
+                [(reminder['id'], _build_message(reminder)) for reminder in reminders]
+            ))
+            record_results(db, sent_ids, failed)
+            delivered += len(sent_ids)
+            if failed:
+                print(f"[WARN] {len(failed)} feedback reminders failed to send, first: {failed[0][1]}")
+            if len(reminders) < REMINDER_BATCH_SIZE:
+                break
+    finally:
+        db.close()
+
+    if delivered:
+        print(f"📧 Delivered {delivered} feedback reminders")
+    return delivered
@@ -0,0 +1,78 @@
+import os
+
+FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
+DEFAULT_LANGUAGE = 'en'
+
+# (subject, body) per language and reminder type
+_TEMPLATES = {
+    'en': {
+        'lesson': (
+            'How was today\'s {course_name} class?',
+            'Hi {full_name},\n\n'
+            'Thank you for joining {course_name} on {session_date}. '
+            'We would love to hear how the class went for you:\n\n{link}\n\n'
+            'Time to Weave'
+        ),
+        'course': (
+            'Your feedback on {course_name}',
+            'Hi {full_name},\n\n'
+            'You have finished {course_name}. A few words about the course '
+            'help us plan the next ones:\n\n{link}\n\n'
+            'Time to Weave'
+        ),
+    },
+    'he': {
+        'lesson': (
+            'איך היה השיעור של {course_name} היום?',
+            'שלום {full_name},\n\n'
+            'תודה שהשתתפת ב{course_name} בתאריך {session_date}. '
+            'נשמח לשמוע איך היה השיעור:\n\n{link}\n\n'
+            'Time to Weave'
+        ),
+        'course': (
+            'נשמח למשוב על {course_name}',
+            'שלום {full_name},\n\n'
+            'סיימת את {course_name}. כמה מילים על הקורס יעזרו לנו '
+            'לתכנן את הקורסים הבאים:\n\n{link}\n\n'
+            'Time to Weave'
+        ),
+    },
+    'es': {
+        'lesson': (
+            '¿Qué tal la clase de {course_name} de hoy?',
+            'Hola {full_name}:\n\n'
+            'Gracias por participar en {course_name} el {session_date}. '
+            'Nos encantaría saber cómo te fue la clase:\n\n{link}\n\n'
+            'Time to Weave'
+        ),
+        'course': (
+            'Tu opinión sobre {course_name}',
+            'Hola {full_name}:\n\n'
+            'Has terminado {course_name}. Unas palabras sobre el curso nos '
+            'ayudan a planificar los próximos:\n\n{link}\n\n'
+            'Time to Weave'
+        ),
+    },
+}
+
+
+def language_for(preferred):
+    code = (preferred or '').strip().lower().replace('_', '-').split('-')[0]
+    return code if code in _TEMPLATES else DEFAULT_LANGUAGE
+
+
+def render_reminder(reminder):
+    """
+    Returns (subject, body) for a reminder row joined with its user and
+    course (full_name, preferred_language, course_name, session_date, type).
+    """
+    subject, body = _TEMPLATES[language_for(reminder.get('preferred_language'))][reminder['type']]
+    session_date = reminder.get('session_date')
+    values = {
+        'full_name': reminder.get('full_name') or '',
+        'course_name': reminder.get('course_name') or '',
+        'session_date': session_date.strftime('%d/%m/%Y') if session_date else '',
+        'link': f"{FRONTEND_URL}/feedback?courseId={reminder['course_id']}"
+                + (f"&sessionDate={session_date.isoformat()}" if session_date else ''),
+    }
+    return subject.format(**values), body.format(**values)
@@ -1,50 +1,203 @@
-from datetime import datetime
-from db.connection import get_db_connection  # adjust to your connection method
+import os
+import datetime
+from db.connection import get_db_connection
+from db.watermarks import get_watermark, set_watermark, all_watermarks
+from schedule.clock import now_local
+
+# course_sessions has no end time; lessons are assumed to run this long
+LESSON_DURATION_MINUTES = int(os.getenv('LESSON_DURATION_MINUTES', 60))
+# Enrollment changes newer than this are left for the next tick, so rows
+# from transactions that have not committed yet are not skipped
+ENROLLMENT_COMMIT_GRACE_SECONDS = int(os.getenv('ENROLLMENT_COMMIT_GRACE_SECONDS', 60))
+# After downtime, missed session time is worked off in steps of this size,
+# one transaction (and one watermark advance) per step
+CATCHUP_STEP_HOURS = int(os.getenv('REMINDER_CATCHUP_STEP_HOURS', 6))
+
+LESSON_WATERMARK = 'reminders.lesson_session_end'
+COURSE_WATERMARK = 'reminders.enrollment_change'
+
+# One row per participant and course/session; backed by
+# uq_feedback_reminder (participant_id, course_id, session_date, type)
+_LESSON_REMINDERS_SQL = """
+    INSERT IGNORE INTO feedback_reminders (participant_id, course_id, session_date, type)
+    SELECT DISTINCT cp.participant_id, cs.course_id, cs.session_date, 'lesson'
+    FROM course_sessions cs
+    JOIN courses_participants cp ON cp.course_id = cs.course_id AND cp.is_active = 1
+    LEFT JOIN feedback_reminders fr
+           ON fr.participant_id = cp.participant_id
+          AND fr.course_id = cs.course_id
+          AND fr.session_date = cs.session_date
+          AND fr.type = 'lesson'
+    WHERE cs.session_date BETWEEN %s AND %s
+      AND TIMESTAMP(cs.session_date, cs.session_time) > %s
+      AND TIMESTAMP(cs.session_date, cs.session_time) <= %s
+      AND fr.id IS NULL
+"""
+
+# Course reminders have no session_date, and NULLs never collide in a unique
+# key, so the anti-join alone keeps them to one per enrollment
+_COURSE_REMINDERS_SQL = """
+    INSERT INTO feedback_reminders (participant_id, course_id, type)
+    SELECT cp.participant_id, cp.course_id, 'course'
+    FROM courses_participants cp
+    LEFT JOIN feedback_reminders fr
+           ON fr.participant_id = cp.participant_id
+          AND fr.course_id = cp.course_id
+          AND fr.type = 'course'
+    WHERE cp.is_active = 0
+      AND fr.id IS NULL
+"""
+
+
+def generate_lesson_reminders(cursor, started_after, started_by):
+    """
+    Queues a 'lesson' reminder for every active participant of each session
+    that started in (started_after, started_by]. Returns the rows inserted.
+    """
+    cursor.execute(_LESSON_REMINDERS_SQL, (
+        started_after.date(), started_by.date(), started_after, started_by
+    ))
+    return cursor.rowcount
+
+
+def generate_course_reminders(cursor, changed_after=None, changed_by=None):
+    """
+    Queues a 'course' reminder for every finished (inactive) enrollment,
+    optionally only those whose row changed in (changed_after, changed_by].
+    Returns the rows inserted.
+    """
+    sql, params = _COURSE_REMINDERS_SQL, ()
+    if changed_after is not None:
+        sql += " AND cp.updated_at > %s AND cp.updated_at <= %s"
+        params = (changed_after, changed_by)
+    cursor.execute(sql, params)
+    return cursor.rowcount
+
+
+def _lesson_duration():
+    return datetime.timedelta(minutes=LESSON_DURATION_MINUTES)
+
+
+def process_ended_sessions(db, now=None):
+    """
+    Queues lesson reminders for sessions that ended since the watermark.
+    A first run starts from midnight today; after downtime the backlog is
+    processed in CATCHUP_STEP_HOURS steps, each committed with its
+    watermark so an interrupted catch-up resumes where it stopped.
+    """
+    now = now or now_local()
+    step = datetime.timedelta(hours=CATCHUP_STEP_HOURS)
+    duration = _lesson_duration()
+    inserted = 0
+
+    cursor = db.cursor()
+    try:
+        while True:
+            start = get_watermark(cursor, LESSON_WATERMARK) or datetime.datetime.combine(now.date(), datetime.time.min)
+            if start >= now:
+                db.rollback()
+                break
+            end = min(now, start + step)
+            # Session end = start + duration, so shift the window back
+            inserted += generate_lesson_reminders(cursor, start - duration, end - duration)
+            set_watermark(cursor, LESSON_WATERMARK, end)
+            db.commit()
+            if end >= now:
+                break
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    return inserted
+
+
+def process_enrollment_changes(db):
+    """
+    Queues course reminders for enrollments deactivated since the watermark,
+    found through courses_participants.updated_at. A first run covers every
+    enrollment ever made.
+    """
+    cursor = db.cursor()
+    try:
+        start = get_watermark(cursor, COURSE_WATERMARK, datetime.datetime(1970, 1, 2))
+        cursor.execute("SELECT NOW(6) - INTERVAL %s SECOND", (ENROLLMENT_COMMIT_GRACE_SECONDS,))
+        end = cursor.fetchone()[0]
+        if end <= start:
+            db.rollback()
+            return 0
+        inserted = generate_course_reminders(cursor, start, end)
+        set_watermark(cursor, COURSE_WATERMARK, end)
+        db.commit()
+        return inserted
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def reminder_lag(db):
+    """
+    Reports how far each reminder watermark trails the present and how many
+    source rows are waiting past it.
+    """
+    now = now_local()
+    cursor = db.cursor()
+    try:
+        marks = all_watermarks(cursor)
+        cursor.execute("SELECT NOW(6)")
+        db_now = cursor.fetchone()[0]
+
+        lesson_mark = marks.get(LESSON_WATERMARK, (None, None))[0]
+        pending_sessions = None
+        if lesson_mark:
+            started_after = lesson_mark - _lesson_duration()
+            started_by = now - _lesson_duration()
+            cursor.execute("""
+                SELECT COUNT(*) FROM course_sessions
+                WHERE session_date BETWEEN %s AND %s
+                  AND TIMESTAMP(session_date, session_time) > %s
+                  AND TIMESTAMP(session_date, session_time) <= %s
+            """, (started_after.date(), started_by.date(), started_after, started_by))
+            pending_sessions = cursor.fetchone()[0]
+
+        course_mark = marks.get(COURSE_WATERMARK, (None, None))[0]
+        pending_enrollments = None
+        if course_mark:
+            cursor.execute(
+                "SELECT COUNT(*) FROM courses_participants WHERE updated_at > %s AND is_active = 0",
+                (course_mark,)
+            )
+            pending_enrollments = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+    def describe(name, reference, pending):
+        position, updated_at = marks.get(name, (None, None))
+        return {
+            'watermark': position.isoformat() if position else None,
+            'lag_seconds': round((reference - position).total_seconds(), 1) if position else None,
+            'last_run_at': updated_at.isoformat() if updated_at else None,
+            'pending': pending,
+        }
+
+    return {
+        'lesson_sessions': describe(LESSON_WATERMARK, now, pending_sessions),
+        'enrollment_changes': describe(COURSE_WATERMARK, db_now, pending_enrollments),
+    }
+
 
 def schedule_feedback_reminders():
     db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
-
-    now = datetime.now()
-    today = now.date()
-    current_time = now.time()
-
-    # Handle lesson-level feedback (after the Zoom session)
-    cursor.execute("""
-        SELECT cs.course_id, cs.session_date, cs.session_time, cp.participant_id
-        FROM course_sessions cs
-        JOIN courses_participants cp ON cs.course_id = cp.course_id
-        WHERE cs.session_date = %s AND cs.session_time <= %s AND cp.is_active = 1
-    """, (today, current_time))
-
-    for session in cursor.fetchall():
-        cursor.execute("""
-            SELECT 1 FROM feedback_reminders
-            WHERE participant_id = %s AND course_id = %s AND session_date = %s AND type = 'lesson'
-        """, (session['participant_id'], session['course_id'], session['session_date']))
-        if not cursor.fetchone():
-            cursor.execute("""
-                INSERT INTO feedback_reminders (participant_id, course_id, session_date, type)
-                VALUES (%s, %s, %s, 'lesson')
-            """, (session['participant_id'], session['course_id'], session['session_date']))
-
-    # Handle course-level feedback (after course is completed)
-    cursor.execute("""
-        SELECT cp.participant_id, cp.course_id
-        FROM courses_participants cp
-        WHERE cp.is_active = 0
-    """)
-    for row in cursor.fetchall():
-        cursor.execute("""
-            SELECT 1 FROM feedback_reminders
-            WHERE participant_id = %s AND course_id = %s AND type = 'course'
-        """, (row['participant_id'], row['course_id']))
-        if not cursor.fetchone():
-            cursor.execute("""
-                INSERT INTO feedback_reminders (participant_id, course_id, type)
-                VALUES (%s, %s, 'course')
-            """, (row['participant_id'], row['course_id']))
+    try:
+        # Handle lesson-level feedback (after the Zoom session)
+        lessons = process_ended_sessions(db)
+        # Handle course-level feedback (after course is completed)
+        courses = process_enrollment_changes(db)
+    finally:
+        db.close()
 
-    db.commit()
-    cursor.close()
-    db.close()
+    if lessons or courses:
+        print(f"⏰ Feedback reminders queued: {lessons} lesson, {courses} course")
+    return lessons + courses
@@ -0,0 +1,263 @@
+import os
+import time
+import uuid
+import socket
+import datetime
+import threading
+import traceback
+from apscheduler.schedulers.background import BackgroundScheduler
+from db.connection import get_db_connection
+
+LEASE_NAME = 'scheduler.leader'
+LEASE_TTL_SECONDS = int(os.getenv('SCHEDULER_LEASE_TTL', 30))
+HEARTBEAT_SECONDS = int(os.getenv('SCHEDULER_HEARTBEAT', 10))
+JOB_RUN_RETENTION_DAYS = int(os.getenv('JOB_RUN_RETENTION_DAYS', 14))
+
+
+class LeaderLease:
+    """
+    Leader election over a row in scheduler_leases.
+
+    Every process heartbeats every HEARTBEAT_SECONDS: the leader extends its
+    lease, the others take it over only once it has expired (so a crashed
+    or hung leader is replaced within LEASE_TTL_SECONDS). Expiry is compared
+    on the database clock; locally, leadership is trusted only until the
+    last successful renewal plus the TTL minus one heartbeat, so a leader
+    that cannot reach MySQL steps down before anyone else can take over.
+    """
+
+    def __init__(self, name=LEASE_NAME, ttl=LEASE_TTL_SECONDS, heartbeat=HEARTBEAT_SECONDS):
+        self.name = name
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self._valid_until = 0.0
+        self._lock = threading.Lock()
+        self.elections = 0
+
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._valid_until
+
+    def heartbeat(self) -> bool:
+        """
+        Acquires or renews the lease. Returns whether this process leads.
+        """
+        with self._lock:
+            started = time.monotonic()
+            db = get_db_connection()
+            cursor = db.cursor()
+            try:
+                # Assignments run left to right: owner first, then the
+                # remaining columns see the new owner
+                cursor.execute("""
+                    INSERT INTO scheduler_leases (name, owner, acquired_at, heartbeat_at, expires_at)
+                    VALUES (%s, %s, NOW(6), NOW(6), NOW(6) + INTERVAL %s SECOND)
+                    ON DUPLICATE KEY UPDATE
+                        acquired_at = IF(owner = VALUES(owner), acquired_at,
+                                         IF(expires_at < NOW(6), NOW(6), acquired_at)),
+                        owner = IF(owner = VALUES(owner) OR expires_at < NOW(6), VALUES(owner), owner),
+                        heartbeat_at = IF(owner = VALUES(owner), NOW(6), heartbeat_at),
+                        expires_at = IF(owner = VALUES(owner), VALUES(expires_at), expires_at)
+                """, (self.name, self.owner, self.ttl))
+                cursor.execute("SELECT owner FROM scheduler_leases WHERE name = %s", (self.name,))
+                row = cursor.fetchone()
+                db.commit()
+            except Exception as e:
+                print(f"[WARN] Scheduler heartbeat failed: {e}")
+                return self.is_leader()
+            finally:
+                cursor.close()
+                db.close()
+
+            leading = bool(row) and row[0] == self.owner
+            if leading:
+                if not self.is_leader():
+                    self.elections += 1
+                    print(f"👑 Scheduler leadership acquired by {self.owner}")
+                self._valid_until = started + self.ttl - self.heartbeat_interval
+            else:
+                self._valid_until = 0.0
+            return leading
+
+    def release(self):
+        """
+        Gives the lease up (on shutdown) so a follower can take over on its
+        next heartbeat instead of waiting for expiry.
+        """
+        self._valid_until = 0.0
+        try:
+            db = get_db_connection()
+            cursor = db.cursor()
+            try:
+                cursor.execute(
+                    "UPDATE scheduler_leases SET expires_at = NOW(6) WHERE name = %s AND owner = %s",
+                    (self.name, self.owner)
+                )
+                db.commit()
+            finally:
+                cursor.close()
+                db.close()
+        except Exception as e:
+            print(f"[WARN] Scheduler lease release failed: {e}")
+
+
+def _record_run(job_name, owner, started_at, duration_ms, rows, error):
+    try:
+        db = get_db_connection()
+        cursor = db.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO job_runs (job_name, owner, started_at, duration_ms, rows_affected, status, error)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (job_name, owner, started_at, duration_ms, rows,
+                  'error' if error else 'ok', error))
+            db.commit()
+        finally:
+            cursor.close()
+            db.close()
+    except Exception as e:
+        print(f"[WARN] Could not record run of {job_name}: {e}")
+
+
+class ClusterScheduler:
+    """
+    APScheduler wrapper with two kinds of jobs:
+
+      - add_job(): cluster jobs, which fire in every process but only run in
+        the elected leader, and whose runs are recorded in job_runs
+        (start, duration, rows affected as returned by the job, error);
+      - add_local_job(): per-process jobs that maintain in-memory state
+        (buffered counters, indexes) and must run in every process.
+    """
+
+    def __init__(self, lease=None):
+        self.lease = lease or LeaderLease()
+        self._scheduler = BackgroundScheduler()
+        self._cluster_jobs = {}
+        self.skipped = 0
+
+    def _wrap(self, name, func):
+        def run():
+            if not self.lease.is_leader():
+                self.skipped += 1
+                return None
+            started_at = datetime.datetime.utcnow()
+            started = time.perf_counter()
+            rows, error = None, None
+            try:
+                result = func()
+                rows = result if isinstance(result, int) and not isinstance(result, bool) else None
+                return result
+            except Exception:
+                error = traceback.format_exc(limit=5)
+                print(f"❌ Job {name} failed:\n{error}")
+            finally:
+                duration_ms = int((time.perf_counter() - started) * 1000)
+                _record_run(name, self.lease.owner, started_at, duration_ms, rows, error)
+        run.__name__ = name
+        return run
+
+    def add_job(self, func, trigger, name=None, **trigger_args):
+        name = name or func.__name__
+        self._cluster_jobs[name] = self._scheduler.add_job(
+            self._wrap(name, func), trigger, id=name, name=name,
+            max_instances=1, coalesce=True, **trigger_args
+        )
+
+    def add_local_job(self, func, trigger, **trigger_args):
+        self._scheduler.add_job(func, trigger, max_instances=1, coalesce=True, **trigger_args)
+
+    def start(self):
+        self._scheduler.add_job(
+            self.lease.heartbeat, 'interval', seconds=self.lease.heartbeat_interval,
+            id='scheduler.heartbeat', max_instances=1, coalesce=True,
+            next_run_time=datetime.datetime.now()
+        )
+        self.add_job(prune_job_runs, 'cron', hour=5)
+        self._scheduler.start()
+
+    def shutdown(self):
+        self._scheduler.shutdown(wait=False)
+        self.lease.release()
+
+    def status(self):
+        return {
+            'owner': self.lease.owner,
+            'is_leader': self.lease.is_leader(),
+            'elections': self.lease.elections,
+            'skipped_runs': self.skipped,
+            'jobs': [
+                {
+                    'name': name,
+                    'trigger': str(job.trigger),
+                    'next_run_at': job.next_run_time.isoformat() if job.next_run_time else None,
+                }
+                for name, job in sorted(self._cluster_jobs.items())
+            ],
+        }
+
+
+def current_leader(cursor, name=LEASE_NAME):
+    cursor.execute("""
+        SELECT owner, acquired_at, heartbeat_at, expires_at, expires_at > NOW(6) AS live
+        FROM scheduler_leases
+        WHERE name = %s
+    """, (name,))
+    return cursor.fetchone()
+
+
+def job_run_history(cursor, job_name=None, limit=50):
+    """
+    Latest runs, newest first, optionally for one job.
+    """
+    where, params = '', ()
+    if job_name:
+        where, params = 'WHERE job_name = %s', (job_name,)
+    cursor.execute(f"""
+        SELECT id, job_name, owner, started_at, duration_ms, rows_affected, status, error
+        FROM job_runs
+        {where}
+        ORDER BY started_at DESC, id DESC
+        LIMIT %s
+    """, params + (limit,))
+    return cursor.fetchall()
+
+
+def job_run_summary(cursor, since_hours=24):
+    """
+    Per-job counts, failures, average/max duration and last run over the
+    last `since_hours`.
+    """
+    cursor.execute("""
+        SELECT job_name,
+               COUNT(*) AS runs,
+               SUM(status = 'error') AS failures,
+               ROUND(AVG(duration_ms)) AS avg_duration_ms,
+               MAX(duration_ms) AS max_duration_ms,
+               SUM(rows_affected) AS rows_affected,
+               MAX(started_at) AS last_started_at
+        FROM job_runs
+        WHERE started_at >= UTC_TIMESTAMP() - INTERVAL %s HOUR
+        GROUP BY job_name
+        ORDER BY job_name
+    """, (since_hours,))
+    return cursor.fetchall()
+
+
+def prune_job_runs():
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            "DELETE FROM job_runs WHERE started_at < UTC_TIMESTAMP() - INTERVAL %s DAY LIMIT 10000",
+            (JOB_RUN_RETENTION_DAYS,)
+        )
+        deleted = cursor.rowcount
+        db.commit()
+        return deleted
+    finally:
+        cursor.close()
+        db.close()
+
+
+cluster_scheduler = ClusterScheduler()
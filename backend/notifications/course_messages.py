@@ -0,0 +1,306 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from db.connection import get_db_connection
+from feedback.messages import language_for, FRONTEND_URL
+from notifications.mailer import send_stream, MAIL_FROM
+
+FANOUT_CHUNK_SIZE = int(os.getenv('FANOUT_CHUNK_SIZE', 500))
+FANOUT_MAX_ATTEMPTS = int(os.getenv('FANOUT_MAX_ATTEMPTS', 5))
+# How long a claimed chunk is reserved before another worker may resend it
+FANOUT_CLAIM_LEASE = int(os.getenv('FANOUT_CLAIM_LEASE', 600))
+
+_SUBJECTS = {
+    'en': 'New message from {course_name}',
+    'he': 'הודעה חדשה מ{course_name}',
+    'es': 'Nuevo mensaje de {course_name}',
+}
+_FOOTERS = {
+    'en': 'You are receiving this because you are enrolled in {course_name}.\n{link}',
+    'he': 'הודעה זו נשלחה אלייך כמשתתף/ת ב{course_name}.\n{link}',
+    'es': 'Recibes este mensaje porque estás inscrito en {course_name}.\n{link}',
+}
+
+# Jobs started by this process run here, off the request thread
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='message-fanout')
+
+
+def _in_clause(values):
+    return ','.join(['%s'] * len(values))
+
+
+def create_message_job(cursor, course_id, message):
+    """
+    Stores the message and queues one delivery row per active participant
+    with a single INSERT ... SELECT. Returns (message_id, job_id, recipients),
+    or None if the course does not exist.
+    """
+    cursor.execute("SELECT 1 FROM courses WHERE id = %s", (course_id,))
+    if not cursor.fetchone():
+        return None
+
+    cursor.execute("INSERT INTO course_messages (course_id, message) VALUES (%s, %s)", (course_id, message))
+    message_id = cursor.lastrowid
+    cursor.execute(
+        "INSERT INTO message_jobs (message_id, course_id, status) VALUES (%s, %s, 'queued')",
+        (message_id, course_id)
+    )
+    job_id = cursor.lastrowid
+    cursor.execute("""
+        INSERT INTO message_deliveries (job_id, user_id, email)
+        SELECT %s, u.id, u.email
+        FROM courses_participants cp
+        JOIN users u ON u.id = cp.participant_id
+        WHERE cp.course_id = %s AND cp.is_active = TRUE
+    """, (job_id, course_id))
+    recipients = cursor.rowcount
+    cursor.execute("UPDATE message_jobs SET total = %s WHERE id = %s", (recipients, job_id))
+    return message_id, job_id, recipients
+
+
+def _claim_chunk(db, job_id, chunk_size=FANOUT_CHUNK_SIZE):
+    """
+    Claims the next pending deliveries of a job (FOR UPDATE SKIP LOCKED,
+    then a lease on next_attempt_at) and returns them with what is needed
+    to render them.
+    """
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT user_id
+            FROM message_deliveries
+            WHERE job_id = %s AND status = 'pending'
+              AND (next_attempt_at IS NULL OR next_attempt_at <= NOW())
+            ORDER BY user_id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (job_id, chunk_size))
+        user_ids = [row['user_id'] for row in cursor.fetchall()]
+        if not user_ids:
+            db.commit()
+            return []
+
+        cursor.execute(f"""
+            UPDATE message_deliveries
+            SET attempts = attempts + 1, next_attempt_at = NOW() + INTERVAL %s SECOND
+            WHERE job_id = %s AND user_id IN ({_in_clause(user_ids)})
+        """, (FANOUT_CLAIM_LEASE, job_id, *user_ids))
+        cursor.execute(f"""
+            SELECT d.user_id, d.email, u.full_name, u.preferred_language
+            FROM message_deliveries d
+            JOIN users u ON u.id = d.user_id
+            WHERE d.job_id = %s AND d.user_id IN ({_in_clause(user_ids)})
+        """, (job_id, *user_ids))
+        rows = cursor.fetchall()
+        db.commit()
+        return rows
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _build_message(recipient, course_name, course_id, text):
+    language = language_for(recipient['preferred_language'])
+    values = {'course_name': course_name, 'link': f'{FRONTEND_URL}/courses/{course_id}'}
+    message = EmailMessage()
+    message['From'] = MAIL_FROM
+    message['To'] = recipient['email']
+    message['Subject'] = _SUBJECTS[language].format(**values)
+    message.set_content(f"{text}\n\n--\n{_FOOTERS[language].format(**values)}")
+    return message
+
+
+def _record(db, job_id, sent_user_ids, failed):
+    """
+    Writes one chunk of outcomes: delivered rows in one UPDATE, failures
+    back to 'pending' with a 2^attempts minute backoff, or 'failed' once
+    permanent or out of attempts. Job counters are updated alongside.
+    """
+    cursor = db.cursor()
+    try:
+        if sent_user_ids:
+            cursor.execute(f"""
+                UPDATE message_deliveries
+                SET status = 'sent', sent_at = NOW(), next_attempt_at = NULL, last_error = NULL
+                WHERE job_id = %s AND user_id IN ({_in_clause(sent_user_ids)})
+            """, (job_id, *sent_user_ids))
+        if failed:
+            cursor.executemany("""
+                UPDATE message_deliveries
+                SET status = IF(%s OR attempts >= %s, 'failed', 'pending'),
+                    next_attempt_at = NOW() + INTERVAL POW(2, attempts) MINUTE,
+                    last_error = %s
+                WHERE job_id = %s AND user_id = %s
+            """, [(permanent, FANOUT_MAX_ATTEMPTS, error[:255], job_id, user_id)
+                  for user_id, error, permanent in failed])
+        cursor.execute("""
+            UPDATE message_jobs j
+            SET sent = (SELECT COUNT(*) FROM message_deliveries WHERE job_id = j.id AND status = 'sent'),
+                failed = (SELECT COUNT(*) FROM message_deliveries WHERE job_id = j.id AND status = 'failed')
+            WHERE j.id = %s
+        """, (job_id,))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _finish(db, job_id):
+    cursor = db.cursor()
+    try:
+        cursor.execute("""
+            UPDATE message_jobs j
+            SET status = IF(EXISTS (
+                    SELECT 1 FROM message_deliveries d WHERE d.job_id = j.id AND d.status = 'pending'
+                ), 'running', IF(j.failed > 0 AND j.sent = 0, 'failed', 'done')),
+                finished_at = IF(status IN ('done', 'failed'), NOW(), NULL)
+            WHERE j.id = %s
+        """, (job_id,))
+        db.commit()
+    finally:
+        cursor.close()
+
+
+def process_job(job_id):
+    """
+    Streams a job's pending deliveries through the SMTP pool chunk by chunk.
+    The mailer only pulls the next chunk once the send queue has drained,
+    so memory stays at one chunk however large the course is. Safe to run
+    from several processes at once: chunks are claimed with SKIP LOCKED.
+    Returns the number of messages sent.
+    """
+    db = get_db_connection()
+    sent_total = 0
+    try:
+        cursor = db.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT j.course_id, c.name AS course_name, m.message
+                FROM message_jobs j
+                JOIN courses c ON c.id = j.course_id
+                JOIN course_messages m ON m.id = j.message_id
+                WHERE j.id = %s
+            """, (job_id,))
+            job = cursor.fetchone()
+            if not job:
+                return 0
+            cursor.execute(
+                "UPDATE message_jobs SET status = 'running', started_at = COALESCE(started_at, NOW()) WHERE id = %s",
+                (job_id,)
+            )
+            db.commit()
+        finally:
+            cursor.close()
+
+        # Claiming and recording run concurrently in worker threads, so
+        # they use separate connections
+        def chunks():
+            while True:
+                recipients = _claim_chunk(claim_db, job_id)
+                if not recipients:
+                    return
+                yield [
+                    (r['user_id'], _build_message(r, job['course_name'], job['course_id'], job['message']))
+                    for r in recipients
+                ]
+
+        def on_results(sent_user_ids, failed):
+            nonlocal sent_total
+            _record(db, job_id, sent_user_ids, failed)
+            sent_total += len(sent_user_ids)
+
+        claim_db = get_db_connection()
+        try:
+            asyncio.run(send_stream(chunks(), on_results))
+        finally:
+            claim_db.close()
+        _finish(db, job_id)
+    finally:
+        db.close()
+    return sent_total
+
+
+def start_job(job_id):
+    """
+    Starts a freshly queued job in this process without waiting for the
+    scheduler; the periodic job picks up anything left over.
+    """
+    def run():
+        try:
+            process_job(job_id)
+        except Exception as e:
+            print(f"[ERROR] Message job {job_id} failed: {e}")
+    _executor.submit(run)
+
+
+def run_message_jobs():
+    """
+    Scheduler job: resumes queued/running jobs with due deliveries (retries,
+    chunks whose claim lease expired, jobs interrupted by a restart).
+    """
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        cursor.execute("""
+            SELECT DISTINCT d.job_id
+            FROM message_deliveries d
+            JOIN message_jobs j ON j.id = d.job_id
+            WHERE j.status IN ('queued', 'running')
+              AND d.status = 'pending'
+              AND (d.next_attempt_at IS NULL OR d.next_attempt_at <= NOW())
+            ORDER BY d.job_id
+        """)
+        job_ids = [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        db.close()
+
+    sent = 0
+    for job_id in job_ids:
+        sent += process_job(job_id)
+    return sent
+
+
+def job_status(cursor, job_id):
+    """
+    Returns the job row with live per-status counts, or None.
+    """
+    cursor.execute("""
+        SELECT id, message_id, course_id, status, total, sent, failed,
+               created_at, started_at, finished_at
+        FROM message_jobs
+        WHERE id = %s
+    """, (job_id,))
+    job = cursor.fetchone()
+    if not job:
+        return None
+    cursor.execute(
+        "SELECT status, COUNT(*) AS count FROM message_deliveries WHERE job_id = %s GROUP BY status",
+        (job_id,)
+    )
+    job['deliveries'] = {row['status']: row['count'] for row in cursor.fetchall()}
+    return job
+
+
+def job_recipients(cursor, job_id, status=None, after_user_id=0, limit=100):
+    """
+    Per-recipient delivery status, paged by user_id.
+    """
+    sql = """
+        SELECT user_id, email, status, attempts, last_error, sent_at
+        FROM message_deliveries
+        WHERE job_id = %s AND user_id > %s
+    """
+    params = [job_id, after_user_id]
+    if status:
+        sql += " AND status = %s"
+        params.append(status)
+    sql += " ORDER BY user_id LIMIT %s"
+    params.append(limit)
+    cursor.execute(sql, tuple(params))
+    return cursor.fetchall()
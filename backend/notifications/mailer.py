@@ -0,0 +1,155 @@
+import os
+import asyncio
+import aiosmtplib
+
+# Defaults point at a local sink, e.g. `python -m aiosmtpd -n -l localhost:1025`
+SMTP_HOST = os.getenv('SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 1025))
+SMTP_USER = os.getenv('SMTP_USER') or None
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD') or None
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'false').lower() == 'true'
+SMTP_TIMEOUT = int(os.getenv('SMTP_TIMEOUT', 30))
+MAIL_FROM = os.getenv('MAIL_FROM', 'Time to Weave <no-reply@timetoweave.local>')
+
+MAIL_CONCURRENCY = int(os.getenv('MAIL_CONCURRENCY', 5))
+# In-process retries per message before it is reported as failed
+SEND_RETRIES = int(os.getenv('MAIL_SEND_RETRIES', 3))
+
+_PERMANENT_ERRORS = (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPSenderRefused)
+_DONE = object()
+
+
+def _smtp_client():
+    return aiosmtplib.SMTP(
+        hostname=SMTP_HOST, port=SMTP_PORT, timeout=SMTP_TIMEOUT,
+        username=SMTP_USER, password=SMTP_PASSWORD, start_tls=SMTP_STARTTLS
+    )
+
+
+async def _sender(queue, results):
+    """
+    One pooled sender: reuses a single SMTP connection, reconnecting after
+    errors. Transient failures are retried with exponential backoff (1s,
+    2s, 4s...); refused recipients and malformed messages are not. Each outcome is reported as
+    (key, error, permanent), error None on success.
+    """
+    client = None
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            key, message = item
+            for attempt in range(SEND_RETRIES):
+                try:
+                    if client is None or not client.is_connected:
+                        client = _smtp_client()
+                        await client.connect()
+                    await client.send_message(message)
+                    await results.put((key, None, False))
+                    break
+                except _PERMANENT_ERRORS as err:
+                    await results.put((key, str(err), True))
+                    break
+                except (aiosmtplib.SMTPException, OSError) as err:
+                    client = None
+                    if attempt == SEND_RETRIES - 1:
+                        await results.put((key, str(err), False))
+                    else:
+                        await asyncio.sleep(2 ** attempt)
+                except Exception as err:
+                    # A message the client rejects outright (e.g. no usable
+                    # recipient address) fails the same way on every retry
+                    client = None
+                    await results.put((key, f'{type(err).__name__}: {err}', True))
+                    break
+    finally:
+        if client is not None and client.is_connected:
+            try:
+                await client.quit()
+            except (aiosmtplib.SMTPException, OSError):
+                pass
+
+
+async def send_stream(chunks, on_results, concurrency=MAIL_CONCURRENCY, flush_size=200):
+    """
+    Sends an iterator of message chunks, each a list of (key, EmailMessage),
+    over `concurrency` pooled SMTP connections.
+
+    `chunks` and `on_results` are blocking (they talk to MySQL) and run in
+    a worker thread. The send queue holds at most two messages per
+    connection, so the next chunk is only pulled once senders have caught
+    up. on_results(sent_keys, [(key, error, permanent)]) is called every
+    `flush_size` outcomes and once at the end.
+    """
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue()
+    senders = [asyncio.create_task(_sender(queue, results)) for _ in range(concurrency)]
+
+    async def put(item):
+        # A bare queue.put() would wait forever once every sender has died
+        if not queue.full():
+            queue.put_nowait(item)
+            return
+        putter = asyncio.create_task(queue.put(item))
+        while not putter.done():
+            running = [task for task in senders if not task.done()]
+            if not running:
+                putter.cancel()
+                for task in senders:
+                    if task.exception() is not None:
+                        raise task.exception()
+                raise RuntimeError('All mail senders stopped')
+            await asyncio.wait([putter, *running], return_when=asyncio.FIRST_COMPLETED)
+
+    async def produce():
+        iterator = iter(chunks)
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, None)
+            if chunk is None:
+                break
+            for item in chunk:
+                await put(item)
+        for _ in senders:
+            await put(_DONE)
+
+    async def record():
+        sent, failed = [], []
+        while True:
+            outcome = await results.get()
+            if outcome is _DONE:
+                break
+            key, error, permanent = outcome
+            if error is None:
+                sent.append(key)
+            else:
+                failed.append(outcome)
+            if len(sent) + len(failed) >= flush_size:
+                await asyncio.to_thread(on_results, sent, failed)
+                sent, failed = [], []
+        if sent or failed:
+            await asyncio.to_thread(on_results, sent, failed)
+
+    recorder = asyncio.create_task(record())
+    try:
+        await produce()
+        await asyncio.gather(*senders)
+    finally:
+        for task in senders:
+            task.cancel()
+        await results.put(_DONE)
+        await recorder
+
+
+async def send_all(items, concurrency=MAIL_CONCURRENCY):
+    """
+    Sends one list of (key, EmailMessage). Returns (sent_keys, failures).
+    """
+    sent, failed = [], []
+
+    def collect(sent_keys, failures):
+        sent.extend(sent_keys)
+        failed.extend(failures)
+
+    await send_stream([items], collect, concurrency=max(1, min(concurrency, len(items))))
+    return sent, failed
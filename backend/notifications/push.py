@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import queue
+import datetime
+import threading
+from db.connection import get_db_connection
+from db.watermarks import get_watermark, set_watermark
+from schedule.clock import now_local
+
+PUSH_POLL_INTERVAL = float(os.getenv('PUSH_POLL_INTERVAL', 1))
+PUSH_HEARTBEAT_SECONDS = int(os.getenv('PUSH_HEARTBEAT_SECONDS', 15))
+# Events buffered per connection; a client that falls further behind is
+# disconnected and catches up from push_events with Last-Event-ID
+PUSH_QUEUE_SIZE = int(os.getenv('PUSH_QUEUE_SIZE', 100))
+# Most events replayed on reconnect; beyond that the client is told to resync
+PUSH_BACKLOG_LIMIT = int(os.getenv('PUSH_BACKLOG_LIMIT', 500))
+# Streams are closed after this long so the browser reconnects and the
+# course list is reloaded
+PUSH_MAX_CONNECTION_SECONDS = int(os.getenv('PUSH_MAX_CONNECTION_SECONDS', 1800))
+PUSH_RETENTION_HOURS = int(os.getenv('PUSH_RETENTION_HOURS', 24))
+# An id gap younger than this may be a transaction that has not committed yet
+PUSH_GAP_GRACE_SECONDS = float(os.getenv('PUSH_GAP_GRACE_SECONDS', 2))
+SESSION_START_LEAD_MINUTES = int(os.getenv('LIVE_LEAD_MINUTES', 15))
+
+WATERMARK = 'push.session_starts'
+
+_EVENT_SQL = """
+    SELECT id, course_id, type, payload,
+           TIMESTAMPDIFF(MICROSECOND, created_at, NOW(6)) / 1000000 AS age
+    FROM push_events
+"""
+
+
+def _json_default(value):
+    return value.isoformat()
+
+
+def publish_event(cursor, course_id, event_type, payload):
+    """
+    Appends an event for the members of a course. Call it in the same
+    transaction as the change it announces, then event_hub.notify() after
+    the commit so this worker pushes it without waiting for the next poll.
+    """
+    cursor.execute(
+        "INSERT INTO push_events (course_id, type, payload) VALUES (%s, %s, %s)",
+        (course_id, event_type, json.dumps(payload, default=_json_default, ensure_ascii=False))
+    )
+    return cursor.lastrowid
+
+
+class Subscription:
+    """
+    One SSE connection: a bounded queue of events for the user's courses.
+    When the queue is full the subscription is marked overflowed instead of
+    growing; the stream then ends and the client replays from the table.
+    """
+
+    def __init__(self, user_id, course_ids, maxsize=PUSH_QUEUE_SIZE):
+        self.user_id = user_id
+        self.course_ids = frozenset(course_ids)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+        self.baseline_id = 0  # hub position when subscribed
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+
+class EventHub:
+    """
+    In-process pub/sub for SSE connections, fed from the push_events table.
+
+    A single poller thread per process reads new rows by id and hands each
+    event to the subscriptions of its course, so every worker delivers
+    events published by any other worker with one query per poll
+    interval, however many clients are connected. The poller runs only
+    while this process has subscribers.
+
+    Ids are assigned at INSERT but become visible at COMMIT, so the poller
+    stops at an id gap until it is PUSH_GAP_GRACE_SECONDS old; a later
+    commit of the missing id is then still delivered in order.
+    """
+
+    def __init__(self, poll_interval=PUSH_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._by_course = {}  # course_id -> {Subscription}
+        self._subscribers = 0
+        self._last_id = None
+        self._poller = None
+        self._wake = threading.Event()
+        self.polls = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    def subscribe(self, user_id, course_ids):
+        """
+        Registers a subscription. Once this returns, every event with an id
+        above the current table maximum will reach it, so a caller that
+        replays from the table afterwards (deduplicating by id) misses nothing.
+        """
+        subscription = Subscription(user_id, course_ids)
+        with self._lock:
+            if self._last_id is None:
+                self._last_id = self._max_id()
+            subscription.baseline_id = self._last_id
+            for course_id in subscription.course_ids:
+                self._by_course.setdefault(course_id, set()).add(subscription)
+            self._subscribers += 1
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._run, name='push-poller', daemon=True)
+                self._poller.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for course_id in subscription.course_ids:
+                members = self._by_course.get(course_id)
+                if members:
+                    members.discard(subscription)
+                    if not members:
+                        del self._by_course[course_id]
+            self._subscribers -= 1
+
+    def notify(self):
+        """
+        Wakes the poller now, e.g. right after this worker published.
+        """
+        self._wake.set()
+
+    def _max_id(self):
+        db = get_db_connection()
+        cursor = db.cursor()
+        try:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM push_events")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+            db.close()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._lock:
+                if not self._subscribers:
+                    # Restarted (from a fresh MAX(id)) by the next subscribe()
+                    self._poller = None
+                    self._last_id = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[ERROR] Push event poll failed: {e}")
+                time.sleep(self.poll_interval)
+
+    def poll(self):
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
+        try:
+            cursor.execute(_EVENT_SQL + " WHERE id > %s ORDER BY id LIMIT 1000", (self._last_id,))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            db.close()
+        self.polls += 1
+
+        expected = self._last_id + 1
+        with self._lock:
+            for row in rows:
+                if row['id'] != expected and row['age'] < PUSH_GAP_GRACE_SECONDS:
+                    break
+                for subscription in self._by_course.get(row['course_id'], ()):
+                    if subscription.overflowed:
+                        continue
+                    subscription.offer(row)
+                    if subscription.overflowed:
+                        self.overflows += 1
+                    else:
+                        self.delivered += 1
+                self._last_id = row['id']
+                expected = row['id'] + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': self._subscribers,
+                'courses': len(self._by_course),
+                'last_event_id': self._last_id,
+                'polls': self.polls,
+                'delivered': self.delivered,
+                'overflows': self.overflows,
+            }
+
+
+event_hub = EventHub()
+
+
+def backlog(cursor, course_ids, after_id, limit=PUSH_BACKLOG_LIMIT):
+    """
+    Events of the given courses after a client's Last-Event-ID, oldest
+    first. Returns (rows, complete); complete is False when more than
+    `limit` events were missed.
+    """
+    if not course_ids:
+        return [], True
+    cursor.execute(
+        _EVENT_SQL + f" WHERE id > %s AND course_id IN ({','.join(['%s'] * len(course_ids))})"
+                     " ORDER BY id LIMIT %s",
+        (after_id, *course_ids, limit + 1)
+    )
+    rows = cursor.fetchall()
+    return rows[:limit], len(rows) <= limit
+
+
+def _format(event_id, event_type, data):
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode()
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+def stream_events(subscription, replay, resync=False, last_id=0):
+    """
+    SSE body for one connection: the replayed backlog, then live events
+    from the hub, with a comment line every PUSH_HEARTBEAT_SECONDS so
+    proxies keep the connection open. Ends (and unsubscribes) on overflow,
+    after PUSH_MAX_CONNECTION_SECONDS, or when the client goes away.
+    """
+    try:
+        yield f"retry: {PUSH_HEARTBEAT_SECONDS * 1000}\n\n"
+        if resync:
+            # Too much was missed to replay; refetch through /api/user/messages
+            yield _format(last_id, 'resync', '{}')
+        for row in replay:
+            last_id = row['id']
+            yield _format(row['id'], row['type'], row['payload'])
+
+        deadline = time.monotonic() + PUSH_MAX_CONNECTION_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                row = subscription.queue.get(timeout=PUSH_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                if subscription.overflowed:
+                    break
+                yield ": keepalive\n\n"
+                continue
+            if row['id'] <= last_id:
+                continue  # already sent from the backlog
+            last_id = row['id']
+            yield _format(row['id'], row['type'], row['payload'])
+            if subscription.overflowed and subscription.queue.empty():
+                break
+    finally:
+        event_hub.unsubscribe(subscription)
+
+
+def publish_session_starts():
+    """
+    Scheduler job: publishes a session_starting event for every Zoom
+    session that enters the next SESSION_START_LEAD_MINUTES, continuing
+    from a persisted watermark so each session is announced once.
+    """
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        now = now_local().replace(microsecond=0)
+        start = get_watermark(cursor, WATERMARK, now)
+        horizon = now + datetime.timedelta(minutes=SESSION_START_LEAD_MINUTES)
+
+        cursor.execute("""
+            INSERT INTO push_events (course_id, type, payload)
+            SELECT z.course_id, 'session_starting',
+                   JSON_OBJECT('id', z.id, 'course_id', z.course_id,
+                               'session_datetime', DATE_FORMAT(z.session_datetime, '%%Y-%%m-%%dT%%H:%%i:%%s'),
+                               'zoom_link', z.zoom_link, 'duration_minutes', z.duration_minutes)
+            FROM zoom_sessions z
+            WHERE z.session_datetime > %s AND z.session_datetime <= %s
+            ORDER BY z.session_datetime, z.id
+        """, (start, horizon))
+        published = cursor.rowcount
+        set_watermark(cursor, WATERMARK, horizon)
+        db.commit()
+        return published
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+        db.close()
+
+
+def prune_push_events(batch_size=10000):
+    """
+    Scheduler job: deletes events past PUSH_RETENTION_HOURS in batches.
+    """
+    db = get_db_connection()
+    cursor = db.cursor()
+    deleted = 0
+    try:
+        while True:
+            cursor.execute(
+                "DELETE FROM push_events WHERE created_at < NOW() - INTERVAL %s HOUR LIMIT %s",
+                (PUSH_RETENTION_HOURS, batch_size)
+            )
+            db.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return deleted
+    finally:
+        cursor.close()
+        db.close()
@@ -0,0 +1,80 @@
+import io
+import csv
+
+EXPORT_COLUMNS = ['id', 'user_id', 'email', 'full_name', 'amount', 'payment_method', 'description', 'created_at']
+
+# Spreadsheet apps evaluate cells starting with these as formulas
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _cell(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_payments_csv(db, start=None, end=None, user_id=None, batch_size=2000):
+    """
+    Yields payments as CSV, oldest first, chunk by chunk. Rows are read
+    through an unbuffered cursor, so memory stays at one batch however many
+    rows match. start/end are datetimes (end exclusive); the range scan runs
+    on (created_at, id), or (user_id, created_at, id) for one user.
+    """
+    conditions, params = [], []
+    if user_id is not None:
+        conditions.append("p.user_id = %s")
+        params.append(user_id)
+    if start is not None:
+        conditions.append("p.created_at >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("p.created_at < %s")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+
+    # The server waits on us while the client downloads; don't let a slow
+    # reader trip the default 60s write timeout halfway through
+    settings = db.cursor()
+    settings.execute("SET SESSION net_write_timeout = 3600")
+    settings.close()
+
+    cursor = db.cursor(buffered=False)
+    finished = False
+    try:
+        cursor.execute(f"""
+            SELECT p.id, p.user_id, u.email, u.full_name, p.amount,
+                   p.payment_method, p.description, p.created_at
+            FROM payments p
+            LEFT JOIN users u ON u.id = p.user_id
+            {where}
+            ORDER BY p.created_at, p.id
+        """, tuple(params))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                finished = True
+                break
+            buffer.seek(0)
+            buffer.truncate()
+            for payment_id, payer_id, email, full_name, amount, method, description, created_at in rows:
+                writer.writerow([
+                    payment_id, payer_id, _cell(email), _cell(full_name), amount,
+                    _cell(method), _cell(description), created_at.isoformat() if created_at else ''
+                ])
+            yield buffer.getvalue()
+    finally:
+        # An abandoned download leaves unread rows on the connection; the
+        # pool then fails its check-in rollback and discards it
+        try:
+            cursor.close()
+        except Exception:
+            pass
+    if finished:
+        settings = db.cursor()
+        settings.execute("SET SESSION net_write_timeout = DEFAULT")
+        settings.close()
@@ -0,0 +1,220 @@
+import datetime
+from sqlalchemy import text
+from db.connection import get_db_connection
+from auth.user_cache import invalidate_user
+
+# Ledger accounts: every payment moves its amount into the user's account
+# and out of the 'payments' clearing account, so the entries of one
+# transaction always sum to zero. Rows are only ever appended.
+_DERIVED_BALANCES = """
+    SELECT user_id, SUM(amount) AS total
+    FROM ledger_entries
+    WHERE account = 'user'
+    GROUP BY user_id
+"""
+
+_DERIVED_MONTHLY = """
+    SELECT user_id, DATE_FORMAT(created_at, '%Y-%m-01') AS month,
+           SUM(amount) AS amount, COUNT(*) AS payments
+    FROM ledger_entries
+    WHERE account = 'user' AND entry_type = 'payment'
+    GROUP BY user_id, month
+"""
+
+
+def month_of(moment):
+    return datetime.date(moment.year, moment.month, 1)
+
+
+def record_payment(session, payment):
+    """
+    Posts a flushed Payment to the ledger and updates the user's balance
+    and monthly spend, all in the caller's (SQLAlchemy) transaction, so
+    the rollups are exactly as durable as the payment itself. The caller
+    invalidates the user's cached row after committing.
+    """
+    params = {
+        'payment_id': payment.id,
+        'user_id': payment.user_id,
+        'amount': payment.amount,
+        'created_at': payment.created_at,
+        'month': month_of(payment.created_at),
+    }
+    session.execute(text("""
+        INSERT INTO ledger_entries (payment_id, entry_type, account, user_id, amount, created_at)
+        VALUES (:payment_id, 'payment', 'user', :user_id, :amount, :created_at),
+               (:payment_id, 'payment', 'payments', :user_id, -:amount, :created_at)
+    """), params)
+    session.execute(text("UPDATE users SET balance = balance + :amount WHERE id = :user_id"), params)
+    session.execute(text("""
+        INSERT INTO user_monthly_spend (user_id, month, amount, payments)
+        VALUES (:user_id, :month, :amount, 1)
+        ON DUPLICATE KEY UPDATE amount = amount + VALUES(amount), payments = payments + 1
+    """), params)
+
+
+def spend_summary(session, user_id, months=12):
+    """
+    Balance and the last `months` months of spend, read from the rollups
+    with two primary-key lookups. Returns None for an unknown user.
+    """
+    balance = session.execute(
+        text("SELECT balance FROM users WHERE id = :user_id"), {'user_id': user_id}
+    ).scalar()
+    if balance is None:
+        return None
+
+    # Months are cut from the UTC timestamps payments are stored with
+    today = datetime.datetime.utcnow().date()
+    first = month_of(today)
+    for _ in range(months - 1):
+        first = month_of(first - datetime.timedelta(days=1))
+    rows = session.execute(text("""
+        SELECT month, amount, payments
+        FROM user_monthly_spend
+        WHERE user_id = :user_id AND month >= :first
+        ORDER BY month DESC
+    """), {'user_id': user_id, 'first': first}).all()
+
+    return {
+        'balance': float(balance),
+        'currentMonthSpend': float(next((r.amount for r in rows if r.month == month_of(today)), 0)),
+        'monthlySpend': [
+            {'month': r.month.strftime('%Y-%m'), 'amount': float(r.amount), 'payments': r.payments}
+            for r in rows
+        ],
+    }
+
+
+def check_ledger(db, repair=False, sample_size=20):
+    """
+    Verifies the ledger and its rollups against the raw entries:
+
+      - unbalanced: transactions whose entries do not sum to zero
+      - unposted: payments with no ledger entries
+      - balances: users.balance differing from the sum of their entries
+      - monthly: user_monthly_spend rows differing from the grouped entries
+
+    With repair=True the rollups of drifting users are recomputed from the
+    ledger, each in a single statement that locks the entries it reads, so
+    a payment committing meanwhile is not lost. Ledger rows themselves are
+    never rewritten.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute("""
+            SELECT payment_id, SUM(amount)
+            FROM ledger_entries
+            GROUP BY payment_id
+            HAVING SUM(amount) <> 0
+        """)
+        unbalanced = [payment_id for payment_id, _ in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT p.id
+            FROM payments p
+            LEFT JOIN ledger_entries l ON l.payment_id = p.id AND l.account = 'user'
+            WHERE l.id IS NULL
+        """)
+        unposted = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(f"""
+            SELECT u.id
+            FROM users u
+            LEFT JOIN ({_DERIVED_BALANCES}) d ON d.user_id = u.id
+            WHERE u.balance <> COALESCE(d.total, 0)
+        """)
+        balance_drift = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(f"""
+            SELECT d.user_id, d.month
+            FROM ({_DERIVED_MONTHLY}) d
+            LEFT JOIN user_monthly_spend s ON s.user_id = d.user_id AND s.month = d.month
+            WHERE s.user_id IS NULL OR s.amount <> d.amount OR s.payments <> d.payments
+            UNION ALL
+            SELECT s.user_id, s.month
+            FROM user_monthly_spend s
+            LEFT JOIN ({_DERIVED_MONTHLY}) d ON d.user_id = s.user_id AND d.month = s.month
+            WHERE d.user_id IS NULL
+        """)
+        monthly_drift = cursor.fetchall()
+
+        report = {
+            'unbalanced': len(unbalanced),
+            'unposted': len(unposted),
+            'balances': len(balance_drift),
+            'monthly': len(monthly_drift),
+            'consistent': not (unbalanced or unposted or balance_drift or monthly_drift),
+            'samples': {
+                'unbalanced': unbalanced[:sample_size],
+                'unposted': unposted[:sample_size],
+                'balances': balance_drift[:sample_size],
+                'monthly': [{'user_id': u, 'month': str(m)} for u, m in monthly_drift[:sample_size]],
+            },
+        }
+
+        if repair:
+            report['repaired'] = _repair(cursor, balance_drift, sorted({u for u, _ in monthly_drift}))
+            db.commit()
+            for user_id in balance_drift:
+                invalidate_user(user_id)
+        return report
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _repair(cursor, balance_users, monthly_users):
+    """
+    Recomputes the rollups of the given users from the ledger. Returns the
+    affected row count; drift that was only a payment in flight during the
+    check recomputes to the same values and counts as zero.
+    """
+    repaired = 0
+    for user_id in balance_users:
+        cursor.execute("""
+            UPDATE users u
+            SET u.balance = (SELECT COALESCE(SUM(amount), 0) FROM ledger_entries
+                             WHERE user_id = u.id AND account = 'user')
+            WHERE u.id = %s
+        """, (user_id,))
+        repaired += cursor.rowcount
+    for user_id in monthly_users:
+        cursor.execute("""
+            INSERT INTO user_monthly_spend (user_id, month, amount, payments)
+            SELECT user_id, DATE_FORMAT(created_at, '%%Y-%%m-01') AS month, SUM(amount), COUNT(*)
+            FROM ledger_entries
+            WHERE user_id = %s AND account = 'user' AND entry_type = 'payment'
+            GROUP BY user_id, month
+            ON DUPLICATE KEY UPDATE amount = VALUES(amount), payments = VALUES(payments)
+        """, (user_id,))
+        repaired += cursor.rowcount
+        cursor.execute("""
+            DELETE s FROM user_monthly_spend s
+            WHERE s.user_id = %s AND NOT EXISTS (
+                SELECT 1 FROM ledger_entries l
+                WHERE l.user_id = s.user_id AND l.account = 'user' AND l.entry_type = 'payment'
+                  AND l.created_at >= s.month AND l.created_at < s.month + INTERVAL 1 MONTH
+            )
+        """, (user_id,))
+        repaired += cursor.rowcount
+    return repaired
+
+
+def reconcile_ledger():
+    """
+    Nightly job: checks the ledger and repairs drifting rollups.
+    Returns the number of repaired rows.
+    """
+    db = get_db_connection()
+    try:
+        report = check_ledger(db, repair=True)
+    finally:
+        db.close()
+
+    if not report['consistent']:
+        print(f"[WARN] Ledger drift: {report['unbalanced']} unbalanced, {report['unposted']} unposted, "
+              f"{report['balances']} balances, {report['monthly']} monthly rows; repaired {report['repaired']}")
+    return report['repaired']
@@ -1,7 +1,24 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from datetime import date, datetime, time, timedelta
 from functools import wraps
 from auth.token_utils import get_user_id_from_token, require_user_auth, generate_token
-from db.connection import get_db_connection
+from db.connection import get_db_connection, pool_stats
+from auth.user_cache import user_cache
+from auth.hashing import hashing_service
+from courses.catalog import catalog_response
+from courses.enrollment import bulk_enroll, fill_open_seats
+from courses.capacity import set_capacity
+from courses.catalog import bump_catalog_version, catalog_snapshot
+from courses.recurrence import materialize_course_sessions
+from schedule import user_calendar, ical_feed
+from schedule.live_sessions import live_session_index
+from feedback.reminder_scheduler import reminder_lag
+from notifications.course_messages import create_message_job, start_job, job_status, job_recipients
+from notifications.push import publish_event, event_hub
+from payments.ledger import check_ledger
+from payments.export import iter_payments_csv
+from stats.dashboard import dashboard_snapshot, recent_actions
+from jobs.scheduler import cluster_scheduler, current_leader, job_run_history, job_run_summary
 import mysql.connector
 import json
 import os
@@ -87,7 +104,17 @@ def add_zoom_session(course_id):
             INSERT INTO zoom_sessions (course_id, zoom_link, session_datetime, duration_minutes)
             VALUES (%s, %s, %s, %s)
         """, (course_id, zoom_link, session_datetime, duration_minutes))
+        session_id = cursor.lastrowid
+        ical_feed.touch_course(cursor, course_id)
+        publish_event(cursor, course_id, 'zoom_session', {
+            'id': session_id,
+            'course_id': course_id,
+            'session_datetime': session_datetime,
+            'zoom_link': zoom_link,
+            'duration_minutes': duration_minutes,
+        })
         db.commit()
+        event_hub.notify()
 
         return jsonify({'message': 'Zoom session added successfully'}), 201
 
@@ -108,47 +135,140 @@ def add_zoom_session(course_id):
 @require_admin_auth
 def get_courses():
     try:
-        db = get_db_connection()
-        db.set_charset_collation('utf8mb4')
-        cursor = db.cursor(dictionary=True)
-        cursor.execute("SET NAMES utf8mb4")
-        cursor.execute("SELECT * FROM courses ORDER BY id")
-        courses = cursor.fetchall()
-
-        for course in courses:
-            if course.get('schedule'):
-                try:
-                    course['schedule'] = json.loads(course['schedule'])
-                except Exception:
-                    pass
-
-        # Manually create response with UTF-8 encoding
-        return Response(
-            json.dumps(courses, ensure_ascii=False),
-            content_type='application/json; charset=utf-8'
-        )
+        # Served from the versioned catalog snapshot; 304 on a matching ETag
+        return catalog_response()
     except Exception as e:
         return jsonify({'error': f'Failed to fetch courses: {str(e)}'}), 500
-    finally:
-        cursor.close()
-        db.close()
 
 
-# --- Admin Dashboard (Static Example) ---
+# --- Admin Dashboard ---
 @admin_bp.route('/dashboard', methods=['GET'])
 @require_admin_auth
 def admin_dashboard():
-    data = {
-        "activeUsers": 1542,
-        "activeCourses": 32,
-        "monthlyRevenue": 14800,
-        "recentActions": [
-            {"id": 1, "text": "New user registered: Sarah Cohen", "timestamp": "5 minutes ago"},
-            {"id": 2, "text": "Course \"Knitting Basics\" updated", "timestamp": "20 minutes ago"},
-            {"id": 3, "text": "User feedback received", "timestamp": "1 hour ago"},
-        ]
-    }
-    return jsonify(data), 200
+    """
+    Reads the pre-aggregated stats tables (refreshed by the scheduler every
+    few minutes) and the newest rows of a few created_at indexes; nothing
+    here scans users, enrollments or payments.
+    """
+    db = None
+    cursor = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
+        data = dashboard_snapshot(cursor)
+        data['recentActions'] = recent_actions(cursor)
+        return jsonify(data), 200
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if db:
+            db.close()
+
+
+# --- Database Pool Stats ---
+@admin_bp.route('/db/pool', methods=['GET'])
+@require_admin_auth
+def get_db_pool_stats():
+    return jsonify(pool_stats()), 200
+
+
+# --- User Cache Stats ---
+@admin_bp.route('/cache/users', methods=['GET'])
+@require_admin_auth
+def get_user_cache_stats():
+    return jsonify(user_cache.stats()), 200
+
+
+# --- Password Hashing Stats ---
+@admin_bp.route('/hashing', methods=['GET'])
+@require_admin_auth
+def get_hashing_stats():
+    return jsonify(hashing_service.stats()), 200
+
+
+# --- Live Session Index Stats ---
+@admin_bp.route('/live-sessions', methods=['GET'])
+@require_admin_auth
+def get_live_session_stats():
+    return jsonify(live_session_index.stats()), 200
+
+
+@admin_bp.route('/push-events', methods=['GET'])
+@require_admin_auth
+def get_push_stats():
+    # This worker's SSE connections and event hub counters
+    return jsonify(event_hub.stats()), 200
+
+
+# --- Background Jobs ---
+@admin_bp.route('/jobs', methods=['GET'])
+@require_admin_auth
+def get_jobs():
+    """
+    Scheduler leader, this process's view of the jobs, and per-job run
+    stats over the last ?hours= (default 24).
+    """
+    hours = request.args.get('hours', 24, type=int)
+    db = None
+    cursor = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
+        leader = current_leader(cursor)
+        summary = job_run_summary(cursor, hours)
+        return jsonify({
+            'leader': leader,
+            'process': cluster_scheduler.status(),
+            'summary': summary,
+        }), 200
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if db:
+            db.close()
+
+
+@admin_bp.route('/jobs/runs', methods=['GET'])
+@require_admin_auth
+def get_job_runs():
+    job_name = request.args.get('job')
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    db = None
+    cursor = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
+        return jsonify(job_run_history(cursor, job_name, limit)), 200
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if db:
+            db.close()
+
+
+# --- Feedback Reminder Lag ---
+@admin_bp.route('/reminders/lag', methods=['GET'])
+@require_admin_auth
+def get_reminder_lag():
+    """
+    How far the reminder watermarks trail now, and how many sessions /
+    finished enrollments are waiting to be processed.
+    """
+    db = None
+    try:
+        db = get_db_connection()
+        return jsonify(reminder_lag(db)), 200
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if db:
+            db.close()
 
 
 # --- Get All Users ---
@@ -164,6 +284,8 @@ def get_all_users():
             ORDER BY full_name
         """)
         users = cursor.fetchall()
+        for user in users:
+            user['balance'] = float(user['balance'] or 0)
         return jsonify(users), 200
     except mysql.connector.Error as err:
         return jsonify({'error': f'Database error: {err}'}), 500
@@ -176,6 +298,292 @@ def get_all_users():
             db.close()
 
 
+# --- Course Schedule ---
+@admin_bp.route('/courses/<int:course_id>/schedule', methods=['PUT'])
+@require_admin_auth
+def update_course_schedule(course_id):
+    """
+    Replaces a course's schedule definition and materializes it into
+    course_sessions in the same transaction.
+    """
+    data = request.get_json() or {}
+    if 'schedule' not in data:
+        return jsonify({'error': 'schedule is required'}), 400
+    schedule = data['schedule']
+
+    db = None
+    cursor = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor()
+        cursor.execute(
+            "UPDATE courses SET schedule = %s WHERE id = %s",
+            (json.dumps(schedule, ensure_ascii=False), course_id)
+        )
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT 1 FROM courses WHERE id = %s", (course_id,))
+            if not cursor.fetchone():
+                return jsonify({'error': 'Course not found'}), 404
+
+        inserted, deleted = materialize_course_sessions(cursor, course_id, schedule)
+        bump_catalog_version(cursor)
+        db.commit()
+        catalog_snapshot.invalidate()
+
+        return jsonify({
+            'message': 'Schedule updated',
+            'sessions_added': inserted,
+            'sessions_removed': deleted
+        }), 200
+    except (ValueError, KeyError, TypeError) as e:
+        # Unparseable rule, unknown time zone or missing day/time keys
+        db.rollback()
+        return jsonify({'error': f'Invalid schedule: {e}'}), 400
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if db:
+            db.close()
+
+
+# --- Course Capacity ---
+@admin_bp.route('/courses/<int:course_id>/capacity', methods=['PUT'])
+@require_admin_auth
+def update_course_capacity(course_id):
+    """
+    Sets the seat limit for a course (null for unlimited). Seats opened by
+    a higher limit are filled from the waitlist right away.
+    """
+    data = request.get_json() or {}
+    capacity = data.get('capacity')
+    if capacity is not None:
+        try:
+            capacity = int(capacity)
+            if capacity < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            return jsonify({'error': 'capacity must be a non-negative integer or null'}), 400
+
+    db = None
+    cursor = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor()
+        if not set_capacity(cursor, course_id, capacity):
+            return jsonify({'error': 'Course not found'}), 404
+        promoted = fill_open_seats(cursor, course_id)
+        bump_catalog_version(cursor)
+        db.commit()
+        catalog_snapshot.invalidate()
+
+        return jsonify({'message': 'Capacity updated', 'capacity': capacity, 'promoted': promoted}), 200
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if db:
+            db.close()
+
+
+# --- Instructors ---
+@admin_bp.route('/courses/<int:course_id>/instructor', methods=['PUT'])
+@require_admin_auth
+def assign_course_instructor(course_id):
+    """
+    Assigns (or clears, with null) a course's instructor and refreshes the
+    participants' calendar rows.
+    """
+    data = request.get_json() or {}
+    instructor_id = data.get('instructor_id')
+
+    db = None
+    cursor = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor()
+        if instructor_id is not None:
+            cursor.execute("SELECT 1 FROM instructors WHERE id = %s", (instructor_id,))
+            if not cursor.fetchone():
+                return jsonify({'error': 'Instructor not found'}), 404
+        cursor.execute("UPDATE courses SET instructor_id = %s WHERE id = %s", (instructor_id, course_id))
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT 1 FROM courses WHERE id = %s", (course_id,))
+            if not cursor.fetchone():
+                return jsonify({'error': 'Course not found'}), 404
+
+        user_calendar.sync_course(cursor, course_id)
+        bump_catalog_version(cursor)
+        db.commit()
+        catalog_snapshot.invalidate()
+
+        return jsonify({'message': 'Instructor updated', 'instructor_id': instructor_id}), 200
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if db:
+            db.close()
+
+
+@admin_bp.route('/instructors/<int:instructor_id>', methods=['PUT'])
+@require_admin_auth
+def update_instructor(instructor_id):
+    data = request.get_json() or {}
+    full_name = (data.get('full_name') or '').strip()
+    if not full_name:
+        return jsonify({'error': 'full_name is required'}), 400
+
+    db = None
+    cursor = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor()
+        cursor.execute(
+            "UPDATE instructors SET full_name = %s, email = COALESCE(%s, email) WHERE id = %s",
+            (full_name, data.get('email'), instructor_id)
+        )
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT 1 FROM instructors WHERE id = %s", (instructor_id,))
+            if not cursor.fetchone():
+                return jsonify({'error': 'Instructor not found'}), 404
+
+        user_calendar.sync_instructor(cursor, instructor_id)
+        db.commit()
+
+        return jsonify({'message': 'Instructor updated'}), 200
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if db:
+            db.close()
+
+
+# --- Calendar Read Model ---
+@admin_bp.route('/calendar/consistency', methods=['GET'])
+@require_admin_auth
+def check_calendar_consistency():
+    """
+    Diffs user_calendar against the join it is derived from.
+    Optional: ?user_ids=1,2,3 to sample users, ?repair=1 to rebuild
+    the read model when drift is found.
+    """
+    try:
+        user_ids = [int(u) for u in request.args.get('user_ids', '').split(',') if u.strip()]
+    except ValueError:
+        return jsonify({'error': 'user_ids must be a comma-separated list of integers'}), 400
+
+    db = None
+    try:
+        db = get_db_connection()
+        report = user_calendar.check_consistency(db, user_ids=user_ids or None)
+        if not report['consistent'] and request.args.get('repair') == '1':
+            report['rebuilt_rows'] = user_calendar.rebuild(db)
+        return jsonify(report), 200
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if db:
+            db.close()
+
+
+# --- Payment Ledger ---
+@admin_bp.route('/ledger/consistency', methods=['GET'])
+@require_admin_auth
+def check_ledger_consistency():
+    """
+    Verifies balances and monthly spend against the ledger entries.
+    Optional: ?repair=1 to recompute drifting rollups.
+    """
+    db = None
+    try:
+        db = get_db_connection()
+        report = check_ledger(db, repair=request.args.get('repair') == '1')
+        return jsonify(report), 200
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if db:
+            db.close()
+
+
+@admin_bp.route('/payments/export', methods=['GET'])
+@require_admin_auth
+def export_payments():
+    """
+    Streams payments as CSV in constant memory. Optional filters:
+    ?from= / ?to= (YYYY-MM-DD, inclusive) and ?user_id=.
+    """
+    try:
+        start = datetime.combine(date.fromisoformat(request.args['from']), time.min) \
+            if request.args.get('from') else None
+        end = datetime.combine(date.fromisoformat(request.args['to']) + timedelta(days=1), time.min) \
+            if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Expected YYYY-MM-DD'}), 400
+    user_id = request.args.get('user_id', type=int)
+
+    db = get_db_connection()
+    filename = '-'.join(['payments'] + [request.args[k] for k in ('from', 'to') if request.args.get(k)])
+    if user_id:
+        filename += f'-user{user_id}'
+
+    def generate():
+        try:
+            yield from iter_payments_csv(db, start=start, end=end, user_id=user_id)
+        finally:
+            db.close()
+
+    return Response(
+        stream_with_context(generate()),
+        content_type='text/csv; charset=utf-8',
+        headers={'Content-Disposition': f'attachment; filename="{filename}.csv"'}
+    )
+
+
+# --- Bulk Enrollment ---
+MAX_BULK_ENROLLMENTS = int(os.getenv('MAX_BULK_ENROLLMENTS', 50000))
+
+
+@admin_bp.route('/enrollments', methods=['POST'])
+@require_admin_auth
+def bulk_enroll_users():
+    """
+    Enrolls every user in user_ids into every course in course_ids.
+    Returns one outcome per (course, user) pair.
+    """
+    data = request.get_json() or {}
+    course_ids = data.get('course_ids') or []
+    user_ids = data.get('user_ids') or []
+
+    if not course_ids or not user_ids:
+        return jsonify({'error': 'course_ids and user_ids are required'}), 400
+    try:
+        course_ids = [int(c) for c in course_ids]
+        user_ids = [int(u) for u in user_ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'course_ids and user_ids must be integers'}), 400
+    if len(course_ids) * len(user_ids) > MAX_BULK_ENROLLMENTS:
+        return jsonify({'error': f'At most {MAX_BULK_ENROLLMENTS} enrollments per request'}), 400
+
+    try:
+        db = get_db_connection()
+        outcomes = bulk_enroll(db, course_ids, user_ids)
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+
+    summary = {}
+    for outcome in outcomes:
+        summary[outcome['status']] = summary.get(outcome['status'], 0) + 1
+
+    return jsonify({'summary': summary, 'results': outcomes}), 200
+
+
 # --- Get Courses for a Specific User ---
 @admin_bp.route('/users/<int:user_id>/courses', methods=['GET'])
 @require_admin_auth
@@ -206,45 +614,46 @@ def get_user_courses(user_id):
 @admin_bp.route('/courses/<int:course_id>/message', methods=['POST'])
 @require_admin_auth
 def send_course_message(course_id):
+    """
+    Stores the message and queues an email fan-out job to the course's
+    active participants. Returns immediately with a job id to poll.
+    """
     db = None
     cursor = None
     try:
-        data = request.get_json()
-        message = data.get('message', '').strip()
+        data = request.get_json() or {}
+        message = (data.get('message') or '').strip()
 
         if not message:
             return jsonify({'error': 'Message is required'}), 400
 
         db = get_db_connection()
-        cursor = db.cursor(dictionary=True)
-
-        # Insert the message into course_messages table
-        cursor.execute("""
-            INSERT INTO course_messages (course_id, message)
-            VALUES (%s, %s)
-        """, (course_id, message))
+        cursor = db.cursor()
+        created = create_message_job(cursor, course_id, message)
+        if created is None:
+            return jsonify({'error': 'Course not found'}), 404
+        message_id, job_id, recipients = created
+        # Last in the transaction, so the event id commits right after it is taken
+        publish_event(cursor, course_id, 'course_message', {
+            'id': message_id,
+            'course_id': course_id,
+            'message': message,
+        })
         db.commit()
+        event_hub.notify()
 
-        # Fetch email addresses of course participants
-        cursor.execute("""
-            SELECT u.email
-            FROM courses_participants cp
-            JOIN users u ON cp.participant_id = u.id
-            WHERE cp.course_id = %s
-        """, (course_id,))
-        recipients = cursor.fetchall()
-
-        # Log recipients
-        print(f"[INFO] Message stored for course {course_id}: {message}")
-        for recipient in recipients:
-            print(f"  - Email: {recipient['email']}")
+        start_job(job_id)
 
         return jsonify({
-            'message': f'Message stored and sent to {len(recipients)} participants'
-        }), 200
+            'message': f'Message stored and queued for {recipients} participants',
+            'message_id': message_id,
+            'job_id': job_id,
+            'recipients': recipients,
+            'status_url': f'/api/admin/message-jobs/{job_id}'
+        }), 202
 
     except Exception as e:
-        print(f"[ERROR] Failed to send course message: {e}")
+        print(f"[ERROR] Failed to queue course message: {e}")
         return jsonify({'error': str(e)}), 500
 
     finally:
@@ -252,3 +661,56 @@ def send_course_message(course_id):
             cursor.close()
         if db:
             db.close()
+
+
+@admin_bp.route('/message-jobs/<int:job_id>', methods=['GET'])
+@require_admin_auth
+def get_message_job(job_id):
+    db = None
+    cursor = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
+        job = job_status(cursor, job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job), 200
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if db:
+            db.close()
+
+
+@admin_bp.route('/message-jobs/<int:job_id>/recipients', methods=['GET'])
+@require_admin_auth
+def get_message_job_recipients(job_id):
+    """
+    Per-recipient delivery status. Optional ?status=pending|sent|failed,
+    paged with ?after=<last user_id>&limit=.
+    """
+    status = request.args.get('status')
+    if status and status not in ('pending', 'sent', 'failed'):
+        return jsonify({'error': 'status must be pending, sent or failed'}), 400
+    after = request.args.get('after', 0, type=int)
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+
+    db = None
+    cursor = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
+        rows = job_recipients(cursor, job_id, status, after, limit)
+        return jsonify({
+            'recipients': rows,
+            'next_after': rows[-1]['user_id'] if len(rows) == limit else None
+        }), 200
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if db:
+            db.close()
@@ -1,7 +1,8 @@
-from auth.token_utils import get_user_id_from_token, require_user_auth, generate_token
+from auth.token_utils import get_user_id_from_token, require_user_auth, generate_token, revoke_token
 from flask import Blueprint, request, jsonify, g
-from werkzeug.security import generate_password_hash, check_password_hash
+from auth.hashing import hashing_service, HashingBusy
 from db.connection import get_db_connection  # Make sure you have this utility
+from auth.user_cache import invalidate_user
 import mysql.connector
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -24,24 +25,24 @@ def login():
         cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
         user = cursor.fetchone()
 
-        if not user or not check_password_hash(user['password'], password):
+        # PBKDF2 runs in the hashing process pool, not on the request thread
+        if not user or not hashing_service.check_password(
+            user['password'], password, ip=request.remote_addr, email=email
+        ):
             return jsonify({'error': 'Invalid credentials'}), 401
 
-        # Generate and store token
+        # Tokens are stateless; only revocations are stored
         token = generate_token(user['id'])
 
-        cursor.execute(
-            "UPDATE users SET token = %s, is_active = 1 WHERE id = %s",
-            (token, user['id'])
-        )
-        db.commit()
-
         return jsonify({
             'message': 'Login successful',
             'role': user.get('role', 'user'),
             'token': token
         }), 200
 
+    except HashingBusy as busy:
+        return jsonify({'error': str(busy)}), 429, {'Retry-After': '2'}
+
     except mysql.connector.Error as err:
         return jsonify({'error': f'Database error: {err}'}), 500
 
@@ -86,7 +87,7 @@ def register():
             return jsonify({'error': 'User already exists'}), 400
 
         # Hash the password
-        hashed_pw = generate_password_hash(password)
+        hashed_pw = hashing_service.hash_password(password, ip=request.remote_addr, email=email)
 
         # Insert new user
         cursor.execute(
@@ -110,6 +111,9 @@ def register():
             'role': 'user'
         }), 201
 
+    except HashingBusy as busy:
+        return jsonify({'error': str(busy)}), 429, {'Retry-After': '2'}
+
     except mysql.connector.Error as err:
         return jsonify({'error': f'Database error: {err}'}), 500
 
@@ -131,30 +135,16 @@ def logout():
 
     token = auth_header.split(' ')[1]
 
-    db = None
-    cursor = None
     try:
-        db = get_db_connection()
-        cursor = db.cursor()
-
-        # Set is_active = 0 and clear token
-        cursor.execute(
-            "UPDATE users SET is_active = 0, token = NULL WHERE token = %s",
-            (token,)
-        )
-        db.commit()
+        # Revoke this token's jti instead of rewriting the users row
+        revoke_token(token)
+        invalidate_user(g.user['id'])
 
         return jsonify({'message': 'Logout successful'}), 200
 
     except mysql.connector.Error as err:
         return jsonify({'error': f'Database error: {err}'}), 500
 
-    finally:
-        if cursor:
-            cursor.close()
-        if db:
-            db.close()
-
 @auth_bp.route('/my-courses', methods=['GET'])
 @require_user_auth
 def get_my_courses():
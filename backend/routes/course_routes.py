@@ -1,11 +1,77 @@
 from flask import Blueprint, request, jsonify, g, Response
 from auth.token_utils import decode_token, require_user_auth
 from db.connection import get_db_connection
+from courses.catalog import catalog_response
+from courses.likes import toggle_like, like_counter, like_counts
+from courses.search import search_index
+from courses.recommendations import queue_user_refresh
+from courses.enrollment import (
+    register_user, cancel_registration, waitlist_position,
+    REGISTERED, REACTIVATED, ALREADY_REGISTERED, WAITLISTED, ALREADY_WAITLISTED,
+    COURSE_NOT_FOUND, USER_NOT_FOUND, CANCELLED, NOT_REGISTERED
+)
+from courses.capacity import get_availability
+from db.idempotency import idempotent
 import json
 
 course_bp = Blueprint('course', __name__, url_prefix='/api/courses')
 
 
+@course_bp.route('/catalog', methods=['GET'])
+def get_course_catalog():
+    """
+    Public course catalog, served from the shared snapshot with ETag support.
+    """
+    try:
+        return catalog_response()
+    except Exception as e:
+        return jsonify({'error': f'Failed to fetch courses: {str(e)}'}), 500
+
+
+@course_bp.route('/like-counts', methods=['GET'])
+def get_course_like_counts():
+    """
+    Like counts per course id, kept out of the catalog snapshot so the
+    catalog ETag only changes on catalog edits. Courses without likes
+    are omitted.
+    """
+    try:
+        counts = like_counts.get()
+    except Exception as e:
+        return jsonify({'error': f'Failed to fetch like counts: {str(e)}'}), 500
+    return jsonify({'likeCounts': {str(cid): n for cid, n in counts.items()}}), 200
+
+
+@course_bp.route('/search', methods=['GET'])
+def search_courses():
+    """
+    Full-text course search over name, category, suitableFor and medicalNote.
+    The last query word is matched as a prefix (search-as-you-type).
+    """
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    if not query:
+        return jsonify({'results': []}), 200
+
+    try:
+        return jsonify({'results': search_index.search(query, limit=limit)}), 200
+    except Exception as e:
+        return jsonify({'error': f'Search failed: {str(e)}'}), 500
+
+
+@course_bp.route('/search/autocomplete', methods=['GET'])
+def autocomplete_courses():
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    if not query:
+        return jsonify({'suggestions': []}), 200
+
+    try:
+        return jsonify({'suggestions': search_index.autocomplete(query, limit=limit)}), 200
+    except Exception as e:
+        return jsonify({'error': f'Autocomplete failed: {str(e)}'}), 500
+
+
 @course_bp.route('/my-courses', methods=['GET'])
 @require_user_auth
 def get_user_courses_with_progress():
@@ -42,9 +108,11 @@ def get_user_courses_with_progress():
 
 @course_bp.route('/<int:course_id>/register', methods=['POST'])
 @require_user_auth
+@idempotent('courses.register')
 def register_course(course_id):
     """
     Register the authenticated user to the specified course.
+    Retries carrying the same Idempotency-Key get the first response back.
     """
     user_id = g.user['id']
 
@@ -52,49 +120,30 @@ def register_course(course_id):
         db = get_db_connection()
         cursor = db.cursor()
 
-        # ✅ Debug print
-        print(f"Trying to register user {user_id} to course {course_id}")
+        # ✅ Seat claimed on the course_seats counter row, then one upsert on
+        # uq_course_participant; a full course puts the user on the waitlist
+        status = register_user(cursor, course_id, user_id)
 
-        # ✅ Ensure course exists
-        cursor.execute("SELECT id FROM courses WHERE id = %s", (course_id,))
-        course = cursor.fetchone()
-        if not course:
-            print(f"Course {course_id} not found in DB.")
+        if status == COURSE_NOT_FOUND:
             return jsonify({'error': 'Course not found'}), 404
-
-        # ✅ Ensure user exists
-        cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
-        if not user:
-            print(f"User {user_id} not found in DB.")
+        if status == USER_NOT_FOUND:
             return jsonify({'error': 'User not found'}), 404
 
-        # ✅ Check if user is already registered to the course
-        cursor.execute(
-            "SELECT id, is_active FROM courses_participants WHERE course_id = %s AND participant_id = %s",
-            (course_id, user_id)
-        )
-        existing = cursor.fetchone()
-
-        if existing:
-            if existing[1]:  # already active
-                return jsonify({'message': 'Already registered'}), 200
-            else:
-                cursor.execute(
-                    "UPDATE courses_participants SET is_active = TRUE WHERE id = %s",
-                    (existing[0],)
-                )
-                db.commit()
-                return jsonify({'message': 'Re-activated registration'}), 200
-
-        # ✅ New registration
-        cursor.execute(
-            "INSERT INTO courses_participants (course_id, participant_id, is_active) VALUES (%s, %s, TRUE)",
-            (course_id, user_id)
-        )
         db.commit()
 
-        return jsonify({'message': 'Registered successfully'}), 200
+        if status in (WAITLISTED, ALREADY_WAITLISTED):
+            return jsonify({
+                'message': 'Course is full, added to waitlist' if status == WAITLISTED else 'Already on waitlist',
+                'waitlisted': True,
+                'position': waitlist_position(cursor, course_id, user_id)
+            }), 202
+
+        messages = {
+            REGISTERED: 'Registered successfully',
+            REACTIVATED: 'Re-activated registration',
+            ALREADY_REGISTERED: 'Already registered',
+        }
+        return jsonify({'message': messages[status]}), 200
 
     except Exception as e:
         print(f"Registration error: {e}")
@@ -105,6 +154,62 @@ def register_course(course_id):
         db.close()
 
 
+@course_bp.route('/<int:course_id>/register', methods=['DELETE'])
+@require_user_auth
+def cancel_course_registration(course_id):
+    """
+    Cancel the authenticated user's registration (or waitlist entry).
+    A freed seat goes to the next user on the waitlist.
+    """
+    user_id = g.user['id']
+
+    try:
+        db = get_db_connection()
+        cursor = db.cursor()
+
+        status, promoted = cancel_registration(cursor, course_id, user_id)
+        if status == COURSE_NOT_FOUND:
+            return jsonify({'error': 'Course not found'}), 404
+        if status == NOT_REGISTERED:
+            return jsonify({'error': 'Not registered to this course'}), 404
+
+        db.commit()
+
+        message = 'Registration cancelled' if status == CANCELLED else 'Removed from waitlist'
+        return jsonify({'message': message, 'promoted': len(promoted)}), 200
+
+    except Exception as e:
+        print(f"Cancellation error: {e}")
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+    finally:
+        cursor.close()
+        db.close()
+
+
+@course_bp.route('/<int:course_id>/availability', methods=['GET'])
+def get_course_availability(course_id):
+    try:
+        db = get_db_connection()
+        cursor = db.cursor()
+        availability = get_availability(cursor, course_id)
+        exists = True
+        if availability is None:
+            # No counter row yet: an uncapped course, or no course at all
+            cursor.execute("SELECT 1 FROM courses WHERE id = %s", (course_id,))
+            exists = cursor.fetchone() is not None
+        cursor.close()
+        db.close()
+    except Exception as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+    if not exists:
+        return jsonify({'error': 'Course not found'}), 404
+    if availability is None:
+        return jsonify({'capacity': None, 'seats_left': None, 'waitlisted': 0}), 200
+    return jsonify(availability), 200
+
+
 @course_bp.route('/like', methods=['POST'])
 @require_user_auth
 def like_course():
@@ -122,26 +227,12 @@ def like_course():
         db = get_db_connection()
         cursor = db.cursor()
 
-        # Check if already liked
-        cursor.execute(
-            "SELECT 1 FROM course_likes WHERE user_id = %s AND course_id = %s",
-            (user_id, course_id)
-        )
-
-        if cursor.fetchone():
-            cursor.execute(
-                "DELETE FROM course_likes WHERE user_id = %s AND course_id = %s",
-                (user_id, course_id)
-            )
-            liked = False
-        else:
-            cursor.execute(
-                "INSERT INTO course_likes (user_id, course_id) VALUES (%s, %s)",
-                (user_id, course_id)
-            )
-            liked = True
+        # One atomic upsert on UNIQUE (user_id, course_id)
+        liked = toggle_like(cursor, user_id, course_id)
+        queue_user_refresh(cursor, user_id)
 
         db.commit()
+        like_counter.record(course_id, 1 if liked else -1)
         return jsonify({'liked': liked}), 200
 
     except Exception as err:
@@ -1,10 +1,21 @@
+from decimal import Decimal, InvalidOperation
+from datetime import datetime
 from flask import Blueprint, request, jsonify
+from sqlalchemy import and_, or_
 from models import db, Payment
+from db.keyset import encode_cursor, decode_cursor
 from auth.token_utils import get_user_id_from_token
+from auth.user_cache import invalidate_user
+from payments.ledger import record_payment, spend_summary
+from db.idempotency import idempotent
 
 payment_bp = Blueprint('payment', __name__, url_prefix='/api/payments')
 
+PAYMENTS_PAGE_SIZE = 50
+PAYMENTS_MAX_PAGE_SIZE = 200
+
 @payment_bp.route('', methods=['POST'])
+@idempotent('payments.create')
 def create_payment():
     user_id = get_user_id_from_token(request)
     if not user_id:
@@ -15,9 +26,11 @@ def create_payment():
         return jsonify({"error": "Missing payment amount"}), 400
 
     try:
-        amount = float(data['amount'])
-    except (ValueError, TypeError):
+        amount = Decimal(str(data['amount'])).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError, TypeError):
         return jsonify({"error": "Invalid amount value"}), 400
+    if amount <= 0:
+        return jsonify({"error": "Amount must be positive"}), 400
 
     payment_method = data.get('payment_method', 'manual')
     description = data.get('description', '')
@@ -26,26 +39,52 @@ def create_payment():
         user_id=user_id,
         amount=amount,
         payment_method=payment_method,
-        description=description
+        description=description,
+        # Whole seconds, as the columns store it, so record_payment files it
+        # under the same month the ledger row ends up in
+        created_at=datetime.utcnow().replace(microsecond=0)
     )
 
     try:
+        # Payment, ledger entries, balance and monthly spend commit together
         db.session.add(new_payment)
+        db.session.flush()
+        record_payment(db.session, new_payment)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
+    invalidate_user(user_id)
     return jsonify({"message": "Payment recorded", "payment_id": new_payment.id}), 201
 
 
 @payment_bp.route('', methods=['GET'])
 def get_user_payments():
+    """
+    The user's payments, newest first, one ?limit= page at a time. Pass
+    next_cursor back as ?before= for the next page; each page is a range
+    scan on (user_id, created_at, id).
+    """
     user_id = get_user_id_from_token(request)
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
 
-    payments = Payment.query.filter_by(user_id=user_id).order_by(Payment.created_at.desc()).all()
+    limit = max(1, min(request.args.get('limit', PAYMENTS_PAGE_SIZE, type=int), PAYMENTS_MAX_PAGE_SIZE))
+    query = Payment.query.filter_by(user_id=user_id)
+    if request.args.get('before'):
+        try:
+            created_at, payment_id = decode_cursor(request.args['before'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        query = query.filter(or_(
+            Payment.created_at < created_at,
+            and_(Payment.created_at == created_at, Payment.id < payment_id)
+        ))
+
+    payments = query.order_by(Payment.created_at.desc(), Payment.id.desc()).limit(limit + 1).all()
+    has_more = len(payments) > limit
+    payments = payments[:limit]
 
     result = [{
         'id': p.id,
@@ -55,4 +94,28 @@ def get_user_payments():
         'created_at': p.created_at.isoformat()
     } for p in payments]
 
-    return jsonify(result)
+    return jsonify({
+        'payments': result,
+        'next_cursor': encode_cursor((payments[-1].created_at, payments[-1].id)) if has_more else None,
+        'has_more': has_more,
+    })
+
+
+@payment_bp.route('/summary', methods=['GET'])
+def get_payment_summary():
+    """
+    Balance and monthly spend (?months=, default 12) from the ledger
+    rollups, without scanning the user's payments.
+    """
+    user_id = get_user_id_from_token(request)
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    months = max(1, min(request.args.get('months', 12, type=int), 120))
+    try:
+        summary = spend_summary(db.session, user_id, months)
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    if summary is None:
+        return jsonify({"error": "User not found"}), 404
+    return jsonify(summary)
@@ -1,15 +1,22 @@
-from flask import Blueprint, jsonify, request, g
+from flask import Blueprint, Response, jsonify, request, g, stream_with_context, url_for
 from auth.token_utils import require_user_auth
-from datetime import datetime, timedelta
+from datetime import timedelta
 from db.connection import get_db_connection
+from schedule.clock import today_local
+from schedule import ical_feed
+from schedule.user_calendar import RETENTION_DAYS
 
 schedule_bp = Blueprint('schedule', __name__, url_prefix='/api/schedule')
 
 @schedule_bp.route('/upcoming', methods=['GET'])
 @require_user_auth
 def get_upcoming_schedule():
+    """
+    Reads the user's next three weeks from the user_calendar read model:
+    one range scan on its (user_id, session_date, session_time) key.
+    """
     user_id = g.user['id']
-    today = datetime.now().date()
+    today = today_local()
     three_weeks_from_now = today + timedelta(weeks=3)
 
     try:
@@ -17,21 +24,17 @@ def get_upcoming_schedule():
         cursor = db.cursor(dictionary=True)
 
         query = """
-            SELECT cs.id AS session_id,
-                   cs.course_id,
-                   c.name AS course_name,
-                   cs.session_time,
-                   cs.session_date,
-                   cs.description,
-                   i.full_name AS instructor_name
-            FROM courses_participants cp
-            JOIN course_sessions cs ON cs.course_id = cp.course_id
-            JOIN courses c ON c.id = cp.course_id
-            JOIN instructors i ON c.instructor_id = i.id
-            WHERE cp.participant_id = %s
-              AND cs.session_date BETWEEN %s AND %s
-              AND cp.is_active = TRUE
-            ORDER BY cs.session_date ASC, cs.session_time ASC
+            SELECT session_id,
+                   course_id,
+                   course_name,
+                   session_time,
+                   session_date,
+                   description,
+                   instructor_name
+            FROM user_calendar
+            WHERE user_id = %s
+              AND session_date BETWEEN %s AND %s
+            ORDER BY session_date ASC, session_time ASC
         """
 
         cursor.execute(query, (user_id, today, three_weeks_from_now))
@@ -40,7 +43,75 @@ def get_upcoming_schedule():
         cursor.close()
         db.close()
 
+        for session in sessions:
+            # TIME columns come back as timedelta, which jsonify cannot encode
+            session['session_time'] = str(session['session_time']).zfill(8)[:5]
+            session['session_date'] = session['session_date'].isoformat()
+
         return jsonify(sessions), 200
 
     except Exception as e:
-        return jsonify({'error': f'Database error: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+
+@schedule_bp.route('/feed-url', methods=['GET'])
+@require_user_auth
+def get_calendar_feed_url():
+    """
+    Returns the user's signed calendar subscription URL.
+    """
+    user_id = g.user['id']
+    url = url_for('schedule.get_calendar_feed', user_id=user_id,
+                  signature=ical_feed.feed_signature(user_id), _external=True)
+    return jsonify({'url': url}), 200
+
+
+@schedule_bp.route('/feed/<int:user_id>/<signature>.ics', methods=['GET'])
+def get_calendar_feed(user_id, signature):
+    """
+    iCalendar subscription feed. Calendar apps poll this every few minutes,
+    so the version stamp is checked first and unchanged feeds get a 304
+    without touching the schedule tables.
+    """
+    if not ical_feed.verify_signature(user_id, signature):
+        return jsonify({'error': 'Invalid feed link'}), 404
+
+    db = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor()
+        try:
+            etag, last_modified = ical_feed.feed_stamp(cursor, user_id)
+        finally:
+            cursor.close()
+    except Exception as e:
+        if db:
+            db.close()
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+    if last_modified:
+        headers['Last-Modified'] = ical_feed.http_date(last_modified)
+
+    not_modified = request.if_none_match.contains(etag) if request.if_none_match else (
+        last_modified is not None
+        and request.if_modified_since is not None
+        and last_modified <= request.if_modified_since
+    )
+    if not_modified:
+        db.close()
+        return Response(status=304, headers=headers)
+
+    since = today_local() - timedelta(days=RETENTION_DAYS)
+
+    def generate():
+        try:
+            yield from ical_feed.iter_feed(db, user_id, since)
+        finally:
+            db.close()
+
+    return Response(
+        stream_with_context(generate()),
+        content_type='text/calendar; charset=utf-8',
+        headers=headers
+    )
@@ -1,9 +1,23 @@
-from flask import Blueprint, jsonify, request, g
+import os
+import mysql.connector
+from flask import Blueprint, Response, jsonify, request, g
 from db.connection import get_db_connection
-from auth.token_utils import decode_token, require_user_auth
+from auth.token_utils import decode_token, verify_token, require_user_auth
+from auth.user_cache import invalidate_user
+from courses.catalog import catalog_snapshot
+from courses.likes import like_counts
+from courses.recommendations import get_user_recommendations
+from courses.recurrence import today_local, SESSION_HORIZON_DAYS
+from schedule.live_sessions import live_session_index
+from notifications.push import event_hub, backlog, stream_events
+from db.keyset import ORIGIN, encode_cursor, decode_cursor, partitioned_page
+from datetime import date, timedelta
 
 user_bp = Blueprint('user_bp', __name__, url_prefix='/api/user')
 
+MESSAGES_PAGE_SIZE = int(os.getenv('MESSAGES_PAGE_SIZE', 50))
+MESSAGES_MAX_PAGE_SIZE = 200
+
 @user_bp.route('/available-courses', methods=['GET'])
 @require_user_auth
 def get_available_courses():
@@ -13,9 +27,10 @@ def get_available_courses():
 
     # Fetch only courses that the user liked and are still marked as liked = TRUE
     cursor.execute("""
-        SELECT c.id, c.name, c.category
+        SELECT c.id, c.name, c.category, COALESCE(lc.like_count, 0) AS like_count
         FROM courses c
         JOIN course_likes cl ON c.id = cl.course_id
+        LEFT JOIN course_like_counts lc ON lc.course_id = c.id
         WHERE cl.user_id = %s AND cl.liked = TRUE
     """, (user_id,))
     
@@ -29,51 +44,83 @@ def get_available_courses():
 
 
 
+@user_bp.route('/recommendations', methods=['GET'])
+@require_user_auth
+def get_recommended_courses():
+    """
+    Returns the user's precomputed recommendations. Users with no likes or
+    enrollments yet get the most-liked courses instead.
+    """
+    user_id = g.user['id']
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+
+    try:
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
+        recommendations = get_user_recommendations(cursor, user_id, limit)
+        cursor.close()
+        db.close()
+    except Exception as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+    source = 'personalized'
+    if not recommendations:
+        source = 'popular'
+        counts = like_counts.get()
+        popular = sorted(catalog_snapshot.courses(), key=lambda c: -counts.get(c['id'], 0))[:limit]
+        recommendations = [
+            {'id': c['id'], 'name': c['name'], 'category': c.get('category'), 'score': None}
+            for c in popular
+        ]
+
+    return jsonify({'recommendations': recommendations, 'source': source}), 200
+
+
+
 @user_bp.route('/schedule', methods=['GET'])
 @require_user_auth
 def get_user_schedule():
+    """
+    Returns the user's session times as ISO 'YYYY-MM-DDTHH:MM' strings,
+    read from course_sessions with one indexed range query. Optional
+    ?from= / ?to= (YYYY-MM-DD) bound the range; it defaults to today
+    through the materialized horizon.
+    """
     user_id = g.user.get('id')  # Provided by @require_user_auth
 
+    try:
+        date_from = date.fromisoformat(request.args['from']) if request.args.get('from') else today_local()
+        date_to = date.fromisoformat(request.args['to']) if request.args.get('to') \
+            else date_from + timedelta(days=SESSION_HORIZON_DAYS)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Expected YYYY-MM-DD'}), 400
+
     try:
         db = get_db_connection()
-        cursor = db.cursor(dictionary=True)
+        cursor = db.cursor()
 
         cursor.execute("""
-            SELECT c.schedule
+            SELECT cs.session_date, cs.session_time
             FROM courses_participants cp
-            JOIN courses c ON cp.course_id = c.id
+            JOIN course_sessions cs ON cs.course_id = cp.course_id
             WHERE cp.participant_id = %s AND cp.is_active = TRUE
-        """, (user_id,))
+              AND cs.session_date BETWEEN %s AND %s
+            ORDER BY cs.session_date, cs.session_time
+        """, (user_id, date_from, date_to))
 
-        results = cursor.fetchall()
-        all_schedule = []
-
-        for row in results:
-            schedule_data = row.get('schedule')
-            if not schedule_data:
-                continue
-
-            try:
-                # Try parsing JSON format (e.g. '["2025-08-01T10:00", "2025-08-03T13:30"]')
-                import json
-                parsed = json.loads(schedule_data)
-                if isinstance(parsed, list):
-                    all_schedule.extend(parsed)
-                else:
-                    all_schedule.append(str(parsed))
-            except Exception:
-                # Fallback: comma-separated format
-                all_schedule.extend([s.strip() for s in schedule_data.split(',')])
+        all_schedule = [
+            f"{session_date.isoformat()}T{str(session_time)[:-3].zfill(5)}"
+            for session_date, session_time in cursor.fetchall()
+        ]
+
+        cursor.close()
+        db.close()
 
         return jsonify({'schedule': all_schedule})
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-    finally:
-        cursor.close()
-        db.close()
-
 
 
 @user_bp.route('/profile', methods=['GET'])
@@ -208,6 +255,7 @@ def update_user_profile():
     sql = f"UPDATE users SET {key} = %s WHERE id = %s"
     cursor.execute(sql, (value, user_id))
     db.commit()
+    invalidate_user(user_id)
 
     return jsonify({'message': 'User updated successfully'})
 
@@ -216,50 +264,181 @@ def update_user_profile():
 @user_bp.route('/messages', methods=['GET'])
 @require_user_auth
 def get_user_messages_and_zoom_sessions():
+    """
+    Course messages and Zoom sessions of the user's active courses, paged
+    by keyset instead of returning the whole history.
+
+    - First page: the newest ?limit= messages (by sent_at) and sessions
+      (by session_datetime). cursors.messages / cursors.zoom_sessions page
+      further back via ?messages_before= / ?sessions_before=.
+    - ?since=<cursors.since>: only what was posted after that cursor,
+      oldest first, with an advanced cursors.since. Repeat while has_more.
+    """
     user_id = g.user['id']
+    limit = max(1, min(request.args.get('limit', MESSAGES_PAGE_SIZE, type=int), MESSAGES_MAX_PAGE_SIZE))
 
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    try:
+        since = request.args.get('since')
+        if since:
+            messages_after, sessions_after = (decode_cursor(token) for token in since.split('.', 1))
+        messages_before = request.args.get('messages_before')
+        messages_before = decode_cursor(messages_before) if messages_before else None
+        sessions_before = request.args.get('sessions_before')
+        sessions_before = decode_cursor(sessions_before) if sessions_before else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    db = None
+    cursor = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
 
-    # Get active course IDs
-    cursor.execute("""
-        SELECT course_id
-        FROM courses_participants
-        WHERE participant_id = %s AND is_active = TRUE
-    """, (user_id,))
-    courses = cursor.fetchall()
-    course_ids = [c['course_id'] for c in courses]
+        # Get active course IDs
+        cursor.execute("""
+            SELECT course_id
+            FROM courses_participants
+            WHERE participant_id = %s AND is_active = TRUE
+        """, (user_id,))
+        course_ids = [c['course_id'] for c in cursor.fetchall()]
+
+        if since:
+            # New sessions are found by when they were added, not when they take place
+            messages, more_messages = partitioned_page(
+                cursor, 'course_messages', 'id, course_id, message, sent_at',
+                'course_id', course_ids, 'sent_at', limit, after=messages_after
+            )
+            zoom_sessions, more_sessions = partitioned_page(
+                cursor, 'zoom_sessions', 'id, course_id, session_datetime, zoom_link, duration_minutes, created_at',
+                'course_id', course_ids, 'created_at', limit, after=sessions_after
+            )
+            since_positions = (
+                (messages[-1]['sent_at'], messages[-1]['id']) if messages else messages_after,
+                (zoom_sessions[-1]['created_at'], zoom_sessions[-1]['id']) if zoom_sessions else sessions_after,
+            )
+            cursors = {'messages': None, 'zoom_sessions': None}
+        else:
+            messages, more_messages = partitioned_page(
+                cursor, 'course_messages', 'id, course_id, message, sent_at',
+                'course_id', course_ids, 'sent_at', limit, before=messages_before
+            )
+            zoom_sessions, more_sessions = partitioned_page(
+                cursor, 'zoom_sessions', 'id, course_id, session_datetime, zoom_link, duration_minutes',
+                'course_id', course_ids, 'session_datetime', limit, before=sessions_before
+            )
+            cursors = {
+                'messages': encode_cursor((messages[-1]['sent_at'], messages[-1]['id']))
+                if more_messages else None,
+                'zoom_sessions': encode_cursor((zoom_sessions[-1]['session_datetime'], zoom_sessions[-1]['id']))
+                if more_sessions else None,
+            }
+            since_positions = None
+            if not messages_before and not sessions_before:
+                # The sync point is the newest message and the most recently added session
+                since_positions = (
+                    (messages[0]['sent_at'], messages[0]['id']) if messages else ORIGIN,
+                    _latest_session_position(cursor, course_ids),
+                )
+
+        cursors['since'] = '.'.join(encode_cursor(p) for p in since_positions) if since_positions else None
+        for session in zoom_sessions:
+            session.pop('created_at', None)
+
+        return jsonify({
+            "messages": messages,
+            "zoom_sessions": zoom_sessions,
+            "cursors": cursors,
+            "has_more": {'messages': more_messages, 'zoom_sessions': more_sessions},
+        }), 200
 
+    except mysql.connector.Error as err:
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if db:
+            db.close()
+
+
+def _latest_session_position(cursor, course_ids):
+    """
+    (created_at, id) of the most recently added Zoom session of the given
+    courses, one index lookup per course.
+    """
     if not course_ids:
-        return jsonify({"messages": [], "zoom_sessions": []}), 200
-
-    format_strings = ','.join(['%s'] * len(course_ids))
-
-    # Fetch messages
-    cursor.execute(f"""
-        SELECT id, course_id, message, sent_at
-        FROM course_messages
-        WHERE course_id IN ({format_strings})
-        ORDER BY sent_at DESC
-    """, tuple(course_ids))
-    messages = cursor.fetchall()
-
-    # Fetch zoom sessions
-    cursor.execute(f"""
-        SELECT id, course_id, session_datetime, zoom_link, duration_minutes
-        FROM zoom_sessions
-        WHERE course_id IN ({format_strings})
-        ORDER BY session_datetime DESC
-    """, tuple(course_ids))
-    zoom_sessions = cursor.fetchall()
-
-    cursor.close()
-    db.close()
-
-    return jsonify({
-        "messages": messages,
-        "zoom_sessions": zoom_sessions
-    }), 200
+        return ORIGIN
+    latest, _ = partitioned_page(cursor, 'zoom_sessions', 'id, created_at', 'course_id', course_ids, 'created_at', 1)
+    return (latest[0]['created_at'], latest[0]['id']) if latest else ORIGIN
+
+
+@user_bp.route('/events', methods=['GET'])
+def stream_user_events():
+    """
+    Server-Sent Events stream of the user's course messages, new Zoom
+    sessions and session starts. EventSource cannot send headers, so the
+    token may also be given as ?token=. On reconnect the browser sends
+    Last-Event-ID and the missed events are replayed from push_events; if
+    too many were missed a `resync` event asks the client to refetch
+    /api/user/messages?since= instead.
+    """
+    token = request.headers.get('Authorization', '').replace('Bearer ', '') or request.args.get('token', '')
+    user = verify_token(token) if token else None
+    if not user:
+        return jsonify({'error': 'Invalid or expired token'}), 401
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    db = None
+    cursor = None
+    subscription = None
+    try:
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT course_id
+            FROM courses_participants
+            WHERE participant_id = %s AND is_active = TRUE
+        """, (user['id'],))
+        course_ids = [row['course_id'] for row in cursor.fetchall()]
+
+        # Subscribe before reading the backlog so nothing falls between them
+        subscription = event_hub.subscribe(user['id'], course_ids)
+        replay, complete = [], True
+        if last_event_id is not None:
+            replay, complete = backlog(cursor, course_ids, last_event_id)
+    except mysql.connector.Error as err:
+        if subscription:
+            event_hub.unsubscribe(subscription)
+        return jsonify({'error': f'Database error: {err}'}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if db:
+            db.close()
+
+    if complete:
+        body = stream_events(subscription, replay, last_id=last_event_id or 0)
+    else:
+        body = stream_events(subscription, [], resync=True, last_id=subscription.baseline_id)
+
+    # Not wrapped in stream_with_context: the request's pooled connection
+    # goes back to the pool as soon as this view returns
+    return Response(body, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@user_bp.route('/live-session', methods=['GET'])
+@require_user_auth
+def get_live_session():
+    """
+    "Join now": the user's Zoom sessions that are live or start within the
+    next few minutes, answered from the in-memory live session index.
+    """
+    sessions = live_session_index.lookup(g.user['id'])
+    return jsonify({'live': sessions[0] if sessions else None, 'sessions': sessions}), 200
 
 
 @user_bp.route('/liked-course-ids', methods=['GET'])
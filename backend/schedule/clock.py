@@ -0,0 +1,18 @@
+import os
+import datetime
+from zoneinfo import ZoneInfo
+
+# Zone that course_sessions.session_date / session_time are stored in
+APP_TIMEZONE = ZoneInfo(os.getenv('APP_TIMEZONE', 'Asia/Jerusalem'))
+
+
+def today_local():
+    return datetime.datetime.now(APP_TIMEZONE).date()
+
+
+def now_local():
+    """
+    Current wall-clock time in APP_TIMEZONE, as a naive datetime comparable
+    with session_date / session_time columns.
+    """
+    return datetime.datetime.now(APP_TIMEZONE).replace(tzinfo=None)
@@ -0,0 +1,208 @@
+import os
+import hmac
+import hashlib
+import datetime
+from email.utils import format_datetime
+from schedule.clock import APP_TIMEZONE
+
+FEED_SECRET = os.getenv('CALENDAR_FEED_SECRET', os.getenv('JWT_SECRET', 'mysecretkey'))
+DEFAULT_DURATION_MINUTES = int(os.getenv('CALENDAR_DEFAULT_DURATION_MINUTES', 60))
+FEED_DOMAIN = os.getenv('CALENDAR_FEED_DOMAIN', 'timetoweave')
+# Bump when the rendered format changes so clients refetch
+FEED_FORMAT = 1
+
+_TOUCH_SQL = """
+    INSERT INTO calendar_feed_versions (user_id, version, updated_at)
+    {source}
+    ON DUPLICATE KEY UPDATE version = version + 1, updated_at = VALUES(updated_at)
+"""
+
+
+# --- Signing ---
+
+def feed_signature(user_id: int) -> str:
+    digest = hmac.new(FEED_SECRET.encode('utf-8'), f'ics:{user_id}'.encode('utf-8'), hashlib.sha256)
+    return digest.hexdigest()[:32]
+
+
+def verify_signature(user_id: int, signature: str) -> bool:
+    return hmac.compare_digest(feed_signature(user_id), signature or '')
+
+
+# --- Version stamps ---
+
+def touch_users(cursor, user_ids):
+    """
+    Marks users' feeds as changed. Call inside the transaction that changes
+    what their feed renders.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    cursor.executemany(
+        _TOUCH_SQL.format(source="VALUES (%s, 1, UTC_TIMESTAMP())"),
+        [(user_id,) for user_id in user_ids]
+    )
+
+
+def touch_course(cursor, course_id):
+    """
+    Marks the feeds of every active participant of a course as changed.
+    """
+    cursor.execute(_TOUCH_SQL.format(source="""
+        SELECT participant_id, 1, UTC_TIMESTAMP()
+        FROM courses_participants
+        WHERE course_id = %s AND is_active = TRUE
+    """), (course_id,))
+
+
+def touch_instructor(cursor, instructor_id):
+    cursor.execute(_TOUCH_SQL.format(source="""
+        SELECT cp.participant_id, 1, UTC_TIMESTAMP()
+        FROM courses c
+        JOIN courses_participants cp ON cp.course_id = c.id AND cp.is_active = TRUE
+        WHERE c.instructor_id = %s
+    """), (instructor_id,))
+
+
+def touch_all(cursor):
+    cursor.execute(
+        "UPDATE calendar_feed_versions SET version = version + 1, updated_at = UTC_TIMESTAMP()"
+    )
+
+
+def feed_stamp(cursor, user_id):
+    """
+    Returns (etag, last_modified) for a user's feed from its version row;
+    one primary key lookup, no schedule joins.
+    """
+    cursor.execute(
+        "SELECT version, updated_at FROM calendar_feed_versions WHERE user_id = %s",
+        (user_id,)
+    )
+    row = cursor.fetchone()
+    version, updated_at = row if row else (0, None)
+    etag = f'ics-{FEED_FORMAT}-{user_id}-{version}'
+    last_modified = updated_at.replace(tzinfo=datetime.timezone.utc, microsecond=0) if updated_at else None
+    return etag, last_modified
+
+
+# --- Rendering ---
+
+def _escape(value) -> str:
+    text = '' if value is None else str(value)
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+                .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line: str) -> str:
+    """
+    Folds a content line at 75 octets (RFC 5545 3.1) without splitting
+    a UTF-8 sequence.
+    """
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74  # continuation lines start with a space
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(value: datetime.datetime) -> str:
+    return value.replace(tzinfo=APP_TIMEZONE).astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event(uid, starts_at, minutes, summary, description, instructor, zoom_link, stamp):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}@{FEED_DOMAIN}',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{_utc(starts_at)}',
+        f'DTEND:{_utc(starts_at + datetime.timedelta(minutes=minutes or DEFAULT_DURATION_MINUTES))}',
+        f'SUMMARY:{_escape(summary)}',
+    ]
+    details = [part for part in (description, instructor and f'Instructor: {instructor}', zoom_link) if part]
+    if details:
+        lines.append(f'DESCRIPTION:{_escape(chr(10).join(details))}')
+    if zoom_link:
+        lines.append(f'LOCATION:{_escape(zoom_link)}')
+        lines.append(f'URL:{zoom_link}')
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+# Calendar rows with their Zoom link (matched on course + start time), then
+# Zoom sessions that have no course_sessions row
+_FEED_SQL = """
+    SELECT 's' AS kind, uc.session_id, uc.session_date, uc.session_time, uc.course_name,
+           uc.description, uc.instructor_name, z.zoom_link, z.duration_minutes
+    FROM user_calendar uc
+    LEFT JOIN zoom_sessions z
+           ON z.course_id = uc.course_id
+          AND z.session_datetime = TIMESTAMP(uc.session_date, uc.session_time)
+    WHERE uc.user_id = %s
+    UNION ALL
+    SELECT 'z', z.id, DATE(z.session_datetime), TIME(z.session_datetime), c.name,
+           NULL, i.full_name, z.zoom_link, z.duration_minutes
+    FROM courses_participants cp
+    JOIN zoom_sessions z ON z.course_id = cp.course_id
+    JOIN courses c ON c.id = cp.course_id
+    LEFT JOIN instructors i ON i.id = c.instructor_id
+    WHERE cp.participant_id = %s AND cp.is_active = TRUE
+      AND z.session_datetime >= %s
+      AND NOT EXISTS (
+          SELECT 1 FROM course_sessions cs
+          WHERE cs.course_id = z.course_id
+            AND cs.session_date = DATE(z.session_datetime)
+            AND cs.session_time = TIME(z.session_datetime)
+      )
+"""
+
+
+def iter_feed(db, user_id, since, batch_size=500):
+    """
+    Yields the VCALENDAR for one user chunk by chunk, reading rows through
+    an unbuffered cursor so the whole feed is never held in memory.
+    """
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield ''.join(_fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:-//{FEED_DOMAIN}//Course schedule//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:Time to Weave',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+    ))
+
+    cursor = db.cursor(buffered=False)
+    try:
+        cursor.execute(_FEED_SQL, (user_id, user_id, since))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            chunk = []
+            for kind, row_id, day, at, name, description, instructor, zoom_link, minutes in rows:
+                if isinstance(at, datetime.timedelta):
+                    at = (datetime.datetime.min + at).time()
+                chunk.append(_event(
+                    f'{kind}{row_id}-u{user_id}', datetime.datetime.combine(day, at),
+                    minutes, name, description, instructor, zoom_link, stamp
+                ))
+            yield ''.join(chunk)
+    finally:
+        cursor.close()
+
+    yield 'END:VCALENDAR\r\n'
+
+
+def http_date(value):
+    return format_datetime(value, usegmt=True)
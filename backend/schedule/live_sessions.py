@@ -0,0 +1,293 @@
+import os
+import time
+import bisect
+import datetime
+import threading
+from db.connection import get_db_connection
+from schedule.clock import now_local
+from schedule.ical_feed import DEFAULT_DURATION_MINUTES
+
+LIVE_HORIZON_HOURS = int(os.getenv('LIVE_HORIZON_HOURS', 24))
+LIVE_LEAD_MINUTES = int(os.getenv('LIVE_LEAD_MINUTES', 15))
+LIVE_REBUILD_INTERVAL = int(os.getenv('LIVE_REBUILD_INTERVAL', 3600))
+LIVE_REFRESH_INTERVAL = int(os.getenv('LIVE_REFRESH_INTERVAL', 30))
+
+_SESSION_SQL = """
+    SELECT z.id, z.course_id, z.session_datetime,
+           COALESCE(z.duration_minutes, %s), z.zoom_link, c.name
+    FROM zoom_sessions z
+    JOIN courses c ON c.id = z.course_id
+    WHERE DATE_ADD(z.session_datetime, INTERVAL COALESCE(z.duration_minutes, %s) MINUTE) >= %s
+      AND z.session_datetime <= %s
+"""
+
+
+def _in_clause(values):
+    return ','.join(['%s'] * len(values))
+
+
+class LiveSessionIndex:
+    """
+    In-memory index of Zoom sessions that are running or start within the
+    next LIVE_HORIZON_HOURS, for the "join now" lookup.
+
+    Each user maps to a start-sorted tuple of their sessions, so a lookup is
+    a bisect on that tuple and never touches MySQL. refresh() (run by the
+    scheduler) pulls changes incrementally:
+
+      - sessions inserted since the last refresh (zoom_sessions.id watermark)
+        and sessions that slid into the horizon since the last window end;
+      - users whose enrollments changed, found through the updated_at of
+        their calendar_feed_versions row, which every enrollment write bumps.
+
+    A full rebuild runs every LIVE_REBUILD_INTERVAL seconds to pick up
+    deletions and anything else the watermarks cannot see.
+    """
+
+    def __init__(self, horizon_hours=LIVE_HORIZON_HOURS, lead_minutes=LIVE_LEAD_MINUTES,
+                 rebuild_interval=LIVE_REBUILD_INTERVAL):
+        self.horizon = datetime.timedelta(hours=horizon_hours)
+        self.lead = datetime.timedelta(minutes=lead_minutes)
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._by_user = {}  # user_id -> (starts, entries), both start-sorted tuples
+        self._max_duration = datetime.timedelta(minutes=DEFAULT_DURATION_MINUTES)
+        self._built_at = None
+        self._reset()
+        self.rebuilds = 0
+        self.refreshes = 0
+
+    def _reset(self):
+        # Maintenance state; lookups only read _by_user and _max_duration
+        self._sessions = {}         # session_id -> (start, end, session_id, course_id, zoom_link, course_name)
+        self._course_sessions = {}  # course_id -> {session_id}
+        self._course_members = {}   # course_id -> {user_id}
+        self._user_courses = {}     # user_id -> {course_id}
+        self._last_id = 0
+        self._window_end = None
+        self._members_seen = None
+
+    # --- Hot path ---
+
+    def lookup(self, user_id, now=None):
+        """
+        Returns the user's sessions that are live now or start within the
+        lead time, earliest first.
+        """
+        if self._built_at is None:
+            self.refresh()
+
+        now = now or now_local()
+        starts, entries = self._by_user.get(user_id, ((), ()))
+        # Nothing starting after now + lead qualifies, and nothing that
+        # started more than the longest duration ago can still be running
+        hi = bisect.bisect_right(starts, now + self.lead)
+        lo = bisect.bisect_left(starts, now - self._max_duration, 0, hi)
+
+        live = []
+        for start, end, session_id, course_id, zoom_link, course_name in entries[lo:hi]:
+            if end < now:
+                continue
+            live.append({
+                'session_id': session_id,
+                'course_id': course_id,
+                'course_name': course_name,
+                'zoom_link': zoom_link,
+                'starts_at': start.isoformat(timespec='minutes'),
+                'ends_at': end.isoformat(timespec='minutes'),
+                'status': 'live' if start <= now else 'starting_soon',
+                'starts_in_minutes': max(0, int((start - now).total_seconds() // 60)),
+            })
+        return live
+
+    # --- Maintenance ---
+
+    def refresh(self):
+        with self._refresh_lock:
+            due = self._built_at is None or time.monotonic() - self._built_at >= self.rebuild_interval
+            db = get_db_connection()
+            cursor = db.cursor()
+            try:
+                if due:
+                    self._rebuild(cursor)
+                else:
+                    self._refresh(cursor)
+            finally:
+                cursor.close()
+                db.close()
+
+    def _load_members(self, cursor, course_ids):
+        if not course_ids:
+            return {}
+        course_ids = sorted(course_ids)
+        cursor.execute(f"""
+            SELECT course_id, participant_id
+            FROM courses_participants
+            WHERE course_id IN ({_in_clause(course_ids)}) AND is_active = TRUE
+        """, tuple(course_ids))
+        members = {course_id: set() for course_id in course_ids}
+        for course_id, user_id in cursor.fetchall():
+            members[course_id].add(user_id)
+        return members
+
+    def _add_sessions(self, rows):
+        for session_id, course_id, start, minutes, zoom_link, course_name in rows:
+            duration = datetime.timedelta(minutes=minutes)
+            self._sessions[session_id] = (start, start + duration, session_id, course_id, zoom_link, course_name)
+            self._course_sessions.setdefault(course_id, set()).add(session_id)
+            self._max_duration = max(self._max_duration, duration)
+            self._last_id = max(self._last_id, session_id)
+
+    def _set_members(self, course_id, user_ids):
+        for user_id in self._course_members.get(course_id, ()):
+            self._user_courses.get(user_id, set()).discard(course_id)
+        self._course_members[course_id] = set(user_ids)
+        for user_id in user_ids:
+            self._user_courses.setdefault(user_id, set()).add(course_id)
+
+    def _set_membership(self, course_id, user_id, active):
+        if active:
+            self._course_members[course_id].add(user_id)
+            self._user_courses.setdefault(user_id, set()).add(course_id)
+        else:
+            self._course_members[course_id].discard(user_id)
+            self._user_courses.get(user_id, set()).discard(course_id)
+
+    def _user_entries(self, user_id, now):
+        entries = sorted(
+            self._sessions[session_id]
+            for course_id in self._user_courses.get(user_id, ())
+            for session_id in self._course_sessions.get(course_id, ())
+            if self._sessions[session_id][1] >= now
+        )
+        return tuple(entry[0] for entry in entries), tuple(entries)
+
+    def _reindex_users(self, user_ids, now):
+        for user_id in user_ids:
+            starts, entries = self._user_entries(user_id, now)
+            if entries:
+                self._by_user[user_id] = (starts, entries)
+            else:
+                self._by_user.pop(user_id, None)
+                if not self._user_courses.get(user_id):
+                    self._user_courses.pop(user_id, None)
+
+    def _rebuild(self, cursor):
+        now = now_local()
+        window_end = now + self.horizon
+        cursor.execute("SELECT COALESCE(MAX(updated_at), UTC_TIMESTAMP()) FROM calendar_feed_versions")
+        members_seen = cursor.fetchone()[0]
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM zoom_sessions")
+        last_id = cursor.fetchone()[0]
+        cursor.execute(_SESSION_SQL, (DEFAULT_DURATION_MINUTES, DEFAULT_DURATION_MINUTES, now, window_end))
+        rows = cursor.fetchall()
+
+        with self._lock:
+            # Lookups keep reading the old _by_user until the swap below
+            self._reset()
+            self._add_sessions(rows)
+            self._last_id = max(self._last_id, last_id)
+            for course_id, members in self._load_members(cursor, self._course_sessions.keys()).items():
+                self._set_members(course_id, members)
+            by_user = {}
+            for user_id in self._user_courses:
+                starts, entries = self._user_entries(user_id, now)
+                if entries:
+                    by_user[user_id] = (starts, entries)
+            self._by_user = by_user
+            self._window_end = window_end
+            self._members_seen = members_seen
+            self._built_at = time.monotonic()
+            self.rebuilds += 1
+
+    def _refresh(self, cursor):
+        now = now_local()
+        window_end = now + self.horizon
+
+        # New rows anywhere in the window, plus older rows the window reached
+        cursor.execute(
+            _SESSION_SQL + " AND (z.id > %s OR z.session_datetime > %s)",
+            (DEFAULT_DURATION_MINUTES, DEFAULT_DURATION_MINUTES, now, window_end,
+             self._last_id, self._window_end)
+        )
+        rows = [row for row in cursor.fetchall() if row[0] not in self._sessions]
+
+        cursor.execute(
+            "SELECT user_id, updated_at FROM calendar_feed_versions WHERE updated_at >= %s",
+            (self._members_seen,)
+        )
+        changed = cursor.fetchall()
+        changed_users = {user_id for user_id, _ in changed}
+        members_seen = max([self._members_seen] + [updated_at for _, updated_at in changed])
+
+        with self._lock:
+            new_courses = {row[1] for row in rows} - set(self._course_members)
+            self._add_sessions(rows)
+            affected = set()
+            for course_id, members in self._load_members(cursor, new_courses).items():
+                self._set_members(course_id, members)
+                affected |= members
+            affected |= {
+                user_id
+                for course_id in {row[1] for row in rows}
+                for user_id in self._course_members.get(course_id, ())
+            }
+
+            if changed_users and self._course_members:
+                course_ids = sorted(self._course_members)
+                users = sorted(changed_users)
+                cursor.execute(f"""
+                    SELECT course_id, participant_id
+                    FROM courses_participants
+                    WHERE participant_id IN ({_in_clause(users)})
+                      AND course_id IN ({_in_clause(course_ids)})
+                      AND is_active = TRUE
+                """, tuple(users) + tuple(course_ids))
+                active = set(cursor.fetchall())
+                for course_id in course_ids:
+                    for user_id in changed_users:
+                        self._set_membership(course_id, user_id, (course_id, user_id) in active)
+                affected |= changed_users
+
+            # Drop sessions that are over
+            ended = [sid for sid, entry in self._sessions.items() if entry[1] < now]
+            for session_id in ended:
+                _, _, _, course_id, _, _ = self._sessions.pop(session_id)
+                course = self._course_sessions.get(course_id)
+                if course:
+                    course.discard(session_id)
+                    if not course:
+                        del self._course_sessions[course_id]
+                        members = self._course_members.get(course_id, set())
+                        affected |= members
+                        self._set_members(course_id, ())
+                        del self._course_members[course_id]
+                        continue
+                affected |= self._course_members.get(course_id, set())
+
+            self._reindex_users(affected, now)
+            self._window_end = window_end
+            self._members_seen = members_seen
+            self.refreshes += 1
+
+    def stats(self):
+        return {
+            'sessions': len(self._sessions),
+            'courses': len(self._course_sessions),
+            'users': len(self._by_user),
+            'window_end': self._window_end.isoformat() if self._window_end else None,
+            'last_session_id': self._last_id,
+            'rebuilds': self.rebuilds,
+            'refreshes': self.refreshes,
+        }
+
+
+live_session_index = LiveSessionIndex()
+
+
+def refresh_live_sessions():
+    """
+    Scheduler job: pulls new sessions and enrollment changes into the index.
+    """
+    live_session_index.refresh()
@@ -0,0 +1,190 @@
+import datetime
+from db.connection import get_db_connection
+from schedule.clock import today_local
+from schedule import ical_feed
+
+# Rows older than this many days are trimmed by the daily job
+RETENTION_DAYS = 1
+
+_SELECT_SOURCE = """
+    SELECT cp.participant_id, cs.session_date, cs.session_time, cs.id,
+           cs.course_id, c.name, cs.description, i.full_name
+    FROM courses_participants cp
+    JOIN course_sessions cs ON cs.course_id = cp.course_id
+    JOIN courses c ON c.id = cp.course_id
+    LEFT JOIN instructors i ON i.id = c.instructor_id
+    WHERE cp.is_active = TRUE
+      AND cs.session_date >= %s
+"""
+
+_INSERT = """
+    INSERT IGNORE INTO user_calendar (
+        user_id, session_date, session_time, session_id,
+        course_id, course_name, description, instructor_name
+    )
+"""
+
+
+def _start():
+    return today_local() - datetime.timedelta(days=RETENTION_DAYS)
+
+
+def add_enrollment(cursor, user_id, course_id):
+    """
+    Adds a course's current and future sessions to one user's calendar.
+    Call in the transaction that activates the registration.
+    """
+    cursor.execute(
+        _INSERT + _SELECT_SOURCE + " AND cp.participant_id = %s AND cp.course_id = %s",
+        (_start(), user_id, course_id)
+    )
+    ical_feed.touch_users(cursor, [user_id])
+
+
+def add_enrollments(cursor, pairs):
+    """
+    Bulk variant of add_enrollment for [(course_id, user_id)] pairs.
+    """
+    by_course = {}
+    for course_id, user_id in pairs:
+        by_course.setdefault(course_id, []).append(user_id)
+    for course_id, user_ids in by_course.items():
+        placeholders = ','.join(['%s'] * len(user_ids))
+        cursor.execute(
+            _INSERT + _SELECT_SOURCE
+            + f" AND cp.course_id = %s AND cp.participant_id IN ({placeholders})",
+            (_start(), course_id, *user_ids)
+        )
+    ical_feed.touch_users(cursor, [user_id for _, user_id in pairs])
+
+
+def remove_enrollment(cursor, user_id, course_id):
+    cursor.execute(
+        "DELETE FROM user_calendar WHERE user_id = %s AND course_id = %s",
+        (user_id, course_id)
+    )
+    ical_feed.touch_users(cursor, [user_id])
+
+
+def sync_course(cursor, course_id):
+    """
+    Re-derives every participant's rows for one course. Call after the
+    course's sessions, name or instructor change.
+    """
+    start = _start()
+    cursor.execute(
+        "DELETE FROM user_calendar WHERE course_id = %s AND session_date >= %s",
+        (course_id, start)
+    )
+    cursor.execute(_INSERT + _SELECT_SOURCE + " AND cp.course_id = %s", (start, course_id))
+    ical_feed.touch_course(cursor, course_id)
+
+
+def sync_instructor(cursor, instructor_id):
+    """
+    Propagates an instructor's name to the calendar rows of their courses.
+    """
+    cursor.execute("""
+        UPDATE user_calendar uc
+        JOIN courses c ON c.id = uc.course_id
+        JOIN instructors i ON i.id = c.instructor_id
+        SET uc.instructor_name = i.full_name
+        WHERE i.id = %s
+    """, (instructor_id,))
+    ical_feed.touch_instructor(cursor, instructor_id)
+
+
+def prune_past(cursor):
+    cursor.execute("DELETE FROM user_calendar WHERE session_date < %s", (_start(),))
+    return cursor.rowcount
+
+
+def rebuild(db):
+    """
+    Rebuilds the whole read model from the source join, one transaction.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute("DELETE FROM user_calendar")
+        cursor.execute(_INSERT + _SELECT_SOURCE, (_start(),))
+        rows = cursor.rowcount
+        ical_feed.touch_all(cursor)
+        db.commit()
+        return rows
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _normalize(row):
+    user_id, session_date, session_time, session_id, course_id, course_name, description, instructor = row
+    return (user_id, session_id), (session_date, str(session_time), course_id, course_name, description, instructor)
+
+
+def check_consistency(db, user_ids=None, start=None, end=None, sample_size=20):
+    """
+    Compares user_calendar with the four-way join it is derived from over
+    [start, end] (default: today through three weeks) and reports rows
+    that are missing, extra or carry stale fields.
+    """
+    start = start or today_local()
+    end = end or start + datetime.timedelta(weeks=3)
+    user_filter = ''
+    params = ()
+    if user_ids:
+        user_filter = f" AND {{col}} IN ({','.join(['%s'] * len(user_ids))})"
+        params = tuple(user_ids)
+
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            _SELECT_SOURCE + " AND cs.session_date <= %s" + user_filter.format(col='cp.participant_id'),
+            (start, end) + params
+        )
+        expected = dict(_normalize(row) for row in cursor.fetchall())
+
+        cursor.execute(f"""
+            SELECT user_id, session_date, session_time, session_id,
+                   course_id, course_name, description, instructor_name
+            FROM user_calendar
+            WHERE session_date BETWEEN %s AND %s {user_filter.format(col='user_id')}
+        """, (start, end) + params)
+        actual = dict(_normalize(row) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+    missing = [key for key in expected if key not in actual]
+    extra = [key for key in actual if key not in expected]
+    stale = [key for key in expected if key in actual and expected[key] != actual[key]]
+
+    def sample(keys):
+        return [{'user_id': u, 'session_id': s} for u, s in keys[:sample_size]]
+
+    return {
+        'range': [start.isoformat(), end.isoformat()],
+        'expected_rows': len(expected),
+        'actual_rows': len(actual),
+        'missing': len(missing),
+        'extra': len(extra),
+        'stale': len(stale),
+        'consistent': not (missing or extra or stale),
+        'samples': {'missing': sample(missing), 'extra': sample(extra), 'stale': sample(stale)},
+    }
+
+
+def trim_user_calendar():
+    """
+    Daily job: drops calendar rows for sessions that are over.
+    """
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        deleted = prune_past(cursor)
+        db.commit()
+    finally:
+        cursor.close()
+        db.close()
+    print(f"🧹 Trimmed {deleted} past calendar rows")
+    return deleted
@@ -0,0 +1,232 @@
+import os
+import datetime
+from db.connection import get_db_connection
+from db.watermarks import get_watermark, set_watermark
+
+# How far before the watermark every refresh recomputes, to pick up rows
+# whose transaction committed after the previous run
+STATS_LOOKBACK_HOURS = int(os.getenv('STATS_LOOKBACK_HOURS', 26))
+STATS_REFRESH_MINUTES = int(os.getenv('STATS_REFRESH_MINUTES', 10))
+
+WATERMARK = 'stats.daily'
+
+# Flow metrics per day as (columns, query), each one grouped range scan on
+# a created_at / updated_at index from the first day being recomputed
+_DAILY_FLOWS = [
+    (('new_users',), """
+        SELECT DATE(created_at), COUNT(*)
+        FROM users
+        WHERE created_at >= %s
+        GROUP BY DATE(created_at)
+    """),
+    (('enrollments',), """
+        SELECT DATE(created_at), COUNT(*)
+        FROM courses_participants
+        WHERE created_at >= %s
+        GROUP BY DATE(created_at)
+    """),
+    (('cancellations',), """
+        SELECT DATE(updated_at), COUNT(*)
+        FROM courses_participants
+        WHERE updated_at >= %s AND is_active = FALSE
+        GROUP BY DATE(updated_at)
+    """),
+    (('payments', 'revenue'), """
+        SELECT DATE(created_at), COUNT(*), SUM(amount)
+        FROM payments
+        WHERE created_at >= %s
+        GROUP BY DATE(created_at)
+    """),
+]
+
+
+def refresh_dashboard_stats():
+    """
+    Scheduler job: brings stats_daily and stats_monthly up to date.
+
+    Only days from the watermark (minus STATS_LOOKBACK_HOURS) onwards are
+    recomputed, from range scans over the rows created since then, and
+    only the months they fall in are re-rolled from stats_daily. Gauges
+    (active users, courses and enrollments) are snapshotted into today's
+    row. Everything commits in one transaction, so the dashboard never
+    reads a half-refreshed day. Returns the number of days refreshed.
+    """
+    db = get_db_connection()
+    cursor = db.cursor()
+    try:
+        # INSERT ... SELECT would otherwise take shared next-key locks on the
+        # scanned ranges and block new signups and payments until commit
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+        cursor.execute("SELECT NOW(), CURDATE()")
+        now, today = cursor.fetchone()
+        watermark = get_watermark(cursor, WATERMARK)
+        if watermark is None:
+            # First run: backfill from the oldest row
+            cursor.execute("""
+                SELECT LEAST(
+                    COALESCE((SELECT MIN(created_at) FROM users), NOW()),
+                    COALESCE((SELECT MIN(created_at) FROM payments), NOW())
+                )
+            """)
+            watermark = cursor.fetchone()[0]
+        start_day = (watermark - datetime.timedelta(hours=STATS_LOOKBACK_HOURS)).date()
+        start = datetime.datetime.combine(start_day, datetime.time.min)
+
+        cursor.execute("""
+            UPDATE stats_daily
+            SET new_users = 0, enrollments = 0, cancellations = 0, payments = 0, revenue = 0
+            WHERE day >= %s
+        """, (start_day,))
+        for columns, sql in _DAILY_FLOWS:
+            cursor.execute(f"""
+                INSERT INTO stats_daily (day, {', '.join(columns)})
+                {sql}
+                ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in columns)}
+            """, (start,))
+
+        cursor.execute("""
+            INSERT INTO stats_daily (day, active_users, active_courses, active_enrollments, snapshot_at)
+            SELECT %s,
+                   (SELECT COUNT(*) FROM users WHERE active = TRUE),
+                   (SELECT COUNT(*) FROM course_seats WHERE seats_taken > 0),
+                   (SELECT COALESCE(SUM(seats_taken), 0) FROM course_seats),
+                   NOW()
+            ON DUPLICATE KEY UPDATE active_users = VALUES(active_users),
+                                    active_courses = VALUES(active_courses),
+                                    active_enrollments = VALUES(active_enrollments),
+                                    snapshot_at = VALUES(snapshot_at)
+        """, (today,))
+
+        start_month = start_day.replace(day=1)
+        cursor.execute("""
+            INSERT INTO stats_monthly (month, new_users, enrollments, cancellations, payments, revenue)
+            SELECT DATE_FORMAT(day, '%%Y-%%m-01') AS month,
+                   SUM(new_users), SUM(enrollments), SUM(cancellations), SUM(payments), SUM(revenue)
+            FROM stats_daily
+            WHERE day >= %s
+            GROUP BY month
+            ON DUPLICATE KEY UPDATE new_users = VALUES(new_users), enrollments = VALUES(enrollments),
+                                    cancellations = VALUES(cancellations), payments = VALUES(payments),
+                                    revenue = VALUES(revenue)
+        """, (start_month,))
+        # A month's gauges are its latest snapshot
+        cursor.execute("""
+            UPDATE stats_monthly m
+            JOIN stats_daily d ON d.day = (
+                SELECT MAX(day) FROM stats_daily
+                WHERE day >= m.month AND day < m.month + INTERVAL 1 MONTH AND active_users IS NOT NULL
+            )
+            SET m.active_users = d.active_users,
+                m.active_courses = d.active_courses,
+                m.active_enrollments = d.active_enrollments
+            WHERE m.month >= %s
+        """, (start_month,))
+
+        set_watermark(cursor, WATERMARK, now)
+        db.commit()
+        return (today - start_day).days + 1
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+        db.close()
+
+
+def _float(value):
+    return float(value) if value is not None else 0.0
+
+
+def dashboard_snapshot(cursor, days=30):
+    """
+    Dashboard figures from the aggregate tables: primary-key reads of the
+    latest day and of this and last month, plus a `days`-long series.
+    Expects a dictionary cursor.
+    """
+    cursor.execute("""
+        SELECT day, active_users, active_courses, active_enrollments, snapshot_at
+        FROM stats_daily
+        WHERE active_users IS NOT NULL
+        ORDER BY day DESC
+        LIMIT 1
+    """)
+    gauges = cursor.fetchone() or {}
+
+    this_month = datetime.date.today().replace(day=1)
+    last_month = (this_month - datetime.timedelta(days=1)).replace(day=1)
+    cursor.execute("""
+        SELECT month, new_users, enrollments, cancellations, payments, revenue
+        FROM stats_monthly
+        WHERE month IN (%s, %s)
+    """, (this_month, last_month))
+    months = {row['month']: row for row in cursor.fetchall()}
+    current = months.get(this_month, {})
+    previous = months.get(last_month, {})
+
+    cursor.execute("""
+        SELECT day, new_users, enrollments, cancellations, payments, revenue
+        FROM stats_daily
+        WHERE day > CURDATE() - INTERVAL %s DAY
+        ORDER BY day
+    """, (days,))
+    series = [
+        {
+            'day': row['day'].isoformat(),
+            'newUsers': row['new_users'],
+            'enrollments': row['enrollments'],
+            'cancellations': row['cancellations'],
+            'payments': row['payments'],
+            'revenue': _float(row['revenue']),
+        }
+        for row in cursor.fetchall()
+    ]
+
+    return {
+        'activeUsers': gauges.get('active_users', 0),
+        'activeCourses': gauges.get('active_courses', 0),
+        'activeEnrollments': gauges.get('active_enrollments', 0),
+        'monthlyRevenue': _float(current.get('revenue')),
+        'previousMonthRevenue': _float(previous.get('revenue')),
+        'monthlyNewUsers': current.get('new_users', 0),
+        'monthlyEnrollments': current.get('enrollments', 0),
+        'daily': series,
+        'statsUpdatedAt': gauges['snapshot_at'].isoformat() if gauges.get('snapshot_at') else None,
+    }
+
+
+def recent_actions(cursor, limit=5):
+    """
+    The latest registrations, enrollments and payments, merged newest
+    first. Each is a LIMIT read from the top of a created_at index.
+    """
+    cursor.execute("""
+        (SELECT 'user' AS kind, u.id, u.full_name AS name, NULL AS detail, u.created_at AS at
+         FROM users u ORDER BY u.created_at DESC LIMIT %s)
+        UNION ALL
+        (SELECT 'enrollment', cp.id, u.full_name, c.name, cp.created_at
+         FROM courses_participants cp
+         JOIN users u ON u.id = cp.participant_id
+         JOIN courses c ON c.id = cp.course_id
+         ORDER BY cp.created_at DESC LIMIT %s)
+        UNION ALL
+        (SELECT 'payment', p.id, u.full_name, p.amount, p.created_at
+         FROM payments p
+         JOIN users u ON u.id = p.user_id
+         ORDER BY p.created_at DESC LIMIT %s)
+        ORDER BY at DESC
+        LIMIT %s
+    """, (limit, limit, limit, limit))
+
+    texts = {
+        'user': lambda row: f"New user registered: {row['name']}",
+        'enrollment': lambda row: f"{row['name']} enrolled in \"{row['detail']}\"",
+        'payment': lambda row: f"Payment received from {row['name']}: {_float(row['detail']):.2f}",
+    }
+    return [
+        {
+            'id': f"{row['kind']}-{row['id']}",
+            'text': texts[row['kind']](row),
+            'timestamp': row['at'].isoformat() if row['at'] else None,
+        }
+        for row in cursor.fetchall()
+    ]
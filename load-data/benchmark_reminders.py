@@ -0,0 +1,201 @@
+# benchmark_reminders.py
+#
+# Times one feedback reminder tick at scale, before and after the move from
+# the per-row loop to set-based INSERT ... SELECT anti-joins.
+#
+# Seeds a scratch database (<MYSQL_DATABASE>_bench by default) with
+# --enrollments enrollments spread over --courses courses, one session per
+# course today and --inactive of the enrollments finished, then runs each
+# implementation twice: a cold tick (every reminder is new) and a steady
+# tick (nothing to do, which is what almost every 10-minute tick looks like).
+#
+# Usage (same .env as the backend):
+#   python benchmark_reminders.py --enrollments 100000
+import os
+import sys
+import time
+import argparse
+import datetime
+import mysql.connector
+from create_db import TABLES, MIGRATIONS, config, DB_NAME
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from feedback.reminder_scheduler import generate_lesson_reminders, generate_course_reminders  # noqa: E402
+
+BENCH_DB = os.getenv('BENCH_DATABASE', f'{DB_NAME}_bench')
+BATCH = 5000
+
+
+def legacy_tick(db, today, current_time):
+    """
+    The reminder loop as it was: one SELECT and maybe one INSERT per
+    (session, participant) pair, then per inactive enrollment.
+    """
+    cursor = db.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT cs.course_id, cs.session_date, cs.session_time, cp.participant_id
+        FROM course_sessions cs
+        JOIN courses_participants cp ON cs.course_id = cp.course_id
+        WHERE cs.session_date = %s AND cs.session_time <= %s AND cp.is_active = 1
+    """, (today, current_time))
+
+    for session in cursor.fetchall():
+        cursor.execute("""
+            SELECT 1 FROM feedback_reminders
+            WHERE participant_id = %s AND course_id = %s AND session_date = %s AND type = 'lesson'
+        """, (session['participant_id'], session['course_id'], session['session_date']))
+        if not cursor.fetchone():
+            cursor.execute("""
+                INSERT INTO feedback_reminders (participant_id, course_id, session_date, type)
+                VALUES (%s, %s, %s, 'lesson')
+            """, (session['participant_id'], session['course_id'], session['session_date']))
+
+    cursor.execute("""
+        SELECT cp.participant_id, cp.course_id
+        FROM courses_participants cp
+        WHERE cp.is_active = 0
+    """)
+    for row in cursor.fetchall():
+        cursor.execute("""
+            SELECT 1 FROM feedback_reminders
+            WHERE participant_id = %s AND course_id = %s AND type = 'course'
+        """, (row['participant_id'], row['course_id']))
+        if not cursor.fetchone():
+            cursor.execute("""
+                INSERT INTO feedback_reminders (participant_id, course_id, type)
+                VALUES (%s, %s, 'course')
+            """, (row['participant_id'], row['course_id']))
+
+    db.commit()
+    cursor.close()
+
+
+def set_based_tick(db, today, current_time):
+    cursor = db.cursor()
+    day_start = datetime.datetime.combine(today, datetime.time.min) - datetime.timedelta(microseconds=1)
+    generate_lesson_reminders(cursor, day_start, datetime.datetime.combine(today, current_time))
+    generate_course_reminders(cursor)
+    db.commit()
+    cursor.close()
+
+
+def setup(args):
+    db = mysql.connector.connect(**config)
+    cursor = db.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{BENCH_DB}`")
+    cursor.execute(f"CREATE DATABASE `{BENCH_DB}` DEFAULT CHARACTER SET 'utf8mb4'")
+    db.database = BENCH_DB
+    for ddl in TABLES.values():
+        cursor.execute(ddl)
+    for _, ddl in MIGRATIONS:
+        try:
+            cursor.execute(ddl)
+        except mysql.connector.Error:
+            pass  # already part of the fresh DDL
+
+    n_users = max(1, args.enrollments // args.per_user)
+    print(f"Seeding {n_users} users, {args.courses} courses, {args.enrollments} enrollments...")
+    for start in range(0, n_users, BATCH):
+        cursor.executemany(
+            """
+            INSERT INTO users (email, password, full_name, age, location, preferred_language)
+            VALUES (%s, 'x', %s, 70, 'bench', 'en')
+            """,
+            [(f'bench-{i}@example.com', f'Bench {i}') for i in range(start, min(n_users, start + BATCH))]
+        )
+    cursor.executemany(
+        "INSERT INTO courses (name, category, suitableFor, medicalNote, schedule) VALUES (%s, 'bench', '', '', '[]')",
+        [(f'Bench course {i}',) for i in range(args.courses)]
+    )
+    cursor.execute("SELECT MIN(id) FROM users")
+    first_user = cursor.fetchone()[0]
+    cursor.execute("SELECT MIN(id) FROM courses")
+    first_course = cursor.fetchone()[0]
+
+    today = datetime.date.today()
+    cursor.executemany(
+        "INSERT INTO course_sessions (course_id, session_date, session_time) VALUES (%s, %s, '08:00:00')",
+        [(first_course + c, today) for c in range(args.courses)]
+    )
+
+    # Each user takes `per_user` consecutive courses; every Nth enrollment is finished
+    inactive_every = max(1, round(1 / args.inactive)) if args.inactive else 0
+    rows = []
+    for n in range(args.enrollments):
+        user = first_user + n // args.per_user
+        course = first_course + (n // args.per_user + n % args.per_user) % args.courses
+        active = not (inactive_every and n % inactive_every == 0)
+        rows.append((course, user, active))
+        if len(rows) == BATCH:
+            cursor.executemany(
+                "INSERT INTO courses_participants (course_id, participant_id, is_active) VALUES (%s, %s, %s)", rows
+            )
+            rows = []
+    if rows:
+        cursor.executemany(
+            "INSERT INTO courses_participants (course_id, participant_id, is_active) VALUES (%s, %s, %s)", rows
+        )
+    db.commit()
+    cursor.close()
+    return db
+
+
+def run(db, name, tick, with_unique_key):
+    cursor = db.cursor()
+    cursor.execute("TRUNCATE TABLE feedback_reminders")
+    cursor.execute("SHOW INDEX FROM feedback_reminders WHERE Key_name = 'uq_feedback_reminder'")
+    has_key = bool(cursor.fetchall())
+    if has_key and not with_unique_key:
+        cursor.execute("ALTER TABLE feedback_reminders DROP INDEX uq_feedback_reminder")
+    elif with_unique_key and not has_key:
+        cursor.execute(
+            "ALTER TABLE feedback_reminders ADD UNIQUE KEY uq_feedback_reminder "
+            "(participant_id, course_id, session_date, type)"
+        )
+    cursor.close()
+
+    today = datetime.date.today()
+    until = datetime.time(23, 59, 59)
+    timings = []
+    for label in ('cold', 'steady'):
+        started = time.perf_counter()
+        tick(db, today, until)
+        timings.append((label, time.perf_counter() - started))
+
+    cursor = db.cursor()
+    cursor.execute("SELECT type, COUNT(*) FROM feedback_reminders GROUP BY type ORDER BY type")
+    counts = dict(cursor.fetchall())
+    cursor.close()
+    for label, seconds in timings:
+        print(f"{name:<10} {label:<7} tick: {seconds:8.2f}s")
+    return timings, counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--enrollments', type=int, default=100000)
+    parser.add_argument('--courses', type=int, default=2000)
+    parser.add_argument('--per-user', type=int, default=5)
+    parser.add_argument('--inactive', type=float, default=0.1, help='Share of finished enrollments')
+    parser.add_argument('--keep', action='store_true', help=f'Keep the {BENCH_DB} database afterwards')
+    args = parser.parse_args()
+
+    db = setup(args)
+    try:
+        before, before_counts = run(db, 'per-row', legacy_tick, with_unique_key=False)
+        after, after_counts = run(db, 'set-based', set_based_tick, with_unique_key=True)
+        print(f"reminders: per-row {before_counts}, set-based {after_counts}")
+        assert before_counts == after_counts, 'implementations disagree'
+        for (label, old), (_, new) in zip(before, after):
+            print(f"{label:<7} speed-up: {old / new if new else float('inf'):6.1f}x")
+    finally:
+        if not args.keep:
+            cursor = db.cursor()
+            cursor.execute(f"DROP DATABASE IF EXISTS `{BENCH_DB}`")
+            cursor.close()
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# check_reminder_delivery.py
+#
+# End-to-end check of the feedback reminder outbox against a local SMTP
+# sink (aiosmtpd, started in-process):
+#   - every due reminder is delivered exactly once and marked sent
+#   - messages are rendered in each user's preferred_language
+#   - a refused recipient is given up on, not retried forever
+#   - a second run sends nothing new
+#
+# Usage (same .env as the backend; needs `pip install aiosmtpd`):
+#   python check_reminder_delivery.py --reminders 500
+import os
+import sys
+import uuid
+import argparse
+import datetime
+from email import message_from_bytes, policy
+from dotenv import load_dotenv
+from aiosmtpd.controller import Controller
+
+load_dotenv(dotenv_path='../backend/.env')
+
+SINK_PORT = int(os.getenv('SINK_PORT', 8025))
+os.environ['SMTP_HOST'] = '127.0.0.1'
+os.environ['SMTP_PORT'] = str(SINK_PORT)
+os.environ['SMTP_STARTTLS'] = 'false'
+os.environ.pop('SMTP_USER', None)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from feedback.delivery import deliver_reminders  # noqa: E402
+from db.connection import get_db_connection  # noqa: E402
+
+REFUSED_DOMAIN = 'refused.example.com'
+
+
+class SinkHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.endswith('@' + REFUSED_DOMAIN):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(message_from_bytes(envelope.content, policy=policy.default))
+        return '250 OK'
+
+
+def setup(n_reminders):
+    db = get_db_connection()
+    cursor = db.cursor()
+    run = uuid.uuid4().hex[:8]
+    languages = ['he', 'en', 'es']
+
+    cursor.execute(
+        "INSERT INTO courses (name, category, suitableFor, medicalNote, schedule) VALUES (%s, %s, %s, %s, %s)",
+        (f'Delivery check {run}', 'load-test', '', '', '[]')
+    )
+    course_id = cursor.lastrowid
+    users = [(f'delivery-{run}-{i}@example.com', f'Delivery {i}', languages[i % 3]) for i in range(n_reminders)]
+    users.append((f'delivery-{run}@{REFUSED_DOMAIN}', 'Refused', 'en'))
+    cursor.executemany(
+        """
+        INSERT INTO users (email, password, full_name, age, location, preferred_language)
+        VALUES (%s, 'x', %s, 70, 'load-test', %s)
+        """,
+        users
+    )
+    cursor.execute("SELECT id, preferred_language FROM users WHERE email LIKE %s", (f'delivery-{run}%',))
+    user_rows = cursor.fetchall()
+    today = datetime.date.today()
+    cursor.executemany(
+        "INSERT INTO feedback_reminders (participant_id, course_id, session_date, type) VALUES (%s, %s, %s, 'lesson')",
+        [(user_id, course_id, today) for user_id, _ in user_rows]
+    )
+    db.commit()
+    cursor.close()
+    db.close()
+    return course_id
+
+
+def check(course_id, handler, n_reminders):
+    db = get_db_connection()
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT SUM(is_sent = 1), SUM(is_sent = 0), MAX(attempts), SUM(last_error IS NOT NULL)
+        FROM feedback_reminders
+        WHERE course_id = %s
+    """, (course_id,))
+    sent, unsent, max_attempts, errors = cursor.fetchone()
+    cursor.close()
+    db.close()
+
+    mine = [m for m in handler.messages if f'courseId={course_id}' in m.get_content()]
+    recipients = [m['To'] for m in mine]
+    hebrew = [m for m in mine if m['Subject'].startswith('איך')]
+    print(f"sent={sent} unsent={unsent} errors={errors} max_attempts={max_attempts} messages={len(mine)}")
+
+    assert sent == n_reminders, 'not every reminder was marked sent'
+    assert unsent == 1 and errors == 1, 'refused recipient should stay unsent with an error'
+    assert len(mine) == n_reminders, 'sink did not receive one message per reminder'
+    assert len(set(recipients)) == len(recipients), 'a reminder was delivered twice'
+    assert len(hebrew) == (n_reminders + 2) // 3, 'Hebrew users did not get the Hebrew template'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reminders', type=int, default=500)
+    args = parser.parse_args()
+
+    handler = SinkHandler()
+    sink = Controller(handler, hostname='127.0.0.1', port=SINK_PORT)
+    sink.start()
+    try:
+        course_id = setup(args.reminders)
+        delivered = deliver_reminders(max_batches=1000)
+        print(f"first run delivered {delivered}")
+        check(course_id, handler, args.reminders)
+
+        # Nothing of ours is due any more; counts and messages must not move
+        deliver_reminders(max_batches=1000)
+        check(course_id, handler, args.reminders)
+    finally:
+        sink.stop()
+
+    print("✅ Reminder delivery verified against the SMTP sink")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -33,8 +33,14 @@ def import_courses():
             "INSERT INTO courses (name, category, suitableFor, medicalNote, schedule) VALUES (%s, %s, %s, %s, %s)",
             (course['name'], course['category'], course['suitableFor'], course['medicalNote'], json.dumps(course['schedule']))
         )
+       # Seat counter row (capacity NULL = unlimited until an admin sets one)
+       cursor.execute("INSERT INTO course_seats (course_id) VALUES (%s)", (cursor.lastrowid,))
 
-
+    # Bump the catalog version so running backends rebuild their snapshot
+    cursor.execute(
+        "INSERT INTO cache_versions (name, version) VALUES ('catalog', 1) "
+        "ON DUPLICATE KEY UPDATE version = version + 1"
+    )
 
     db.commit()
     cursor.close()
@@ -51,6 +57,10 @@ def add_participant_to_course(course_id: int, participant_id: int, paid: bool =
             "INSERT INTO courses_participants (course_id, participant_id, paid) VALUES (%s, %s, %s)",
             (course_id, participant_id, paid)
         )
+        cursor.execute(
+            "UPDATE course_seats SET seats_taken = seats_taken + 1 WHERE course_id = %s",
+            (course_id,)
+        )
         db.commit()
     except mysql.connector.Error as err:
         print(f"Database error: {err}")
@@ -25,7 +25,7 @@ TABLES = {
             age INT NOT NULL,
             location VARCHAR(255) NOT NULL,
             preferred_language VARCHAR(10) NOT NULL,
-            balance INT DEFAULT 0,
+            balance DECIMAL(12, 2) NOT NULL DEFAULT 0,   -- materialized from ledger_entries
 
             role ENUM('user', 'admin') DEFAULT 'user',
 
@@ -34,7 +34,19 @@ TABLES = {
             token TEXT,                         -- Active session token (JWT)
 
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_users_created (created_at),
+            INDEX idx_users_active (active)
+        );
+        """
+    ),
+    "instructors": (
+        """
+        CREATE TABLE IF NOT EXISTS instructors (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            full_name VARCHAR(255) NOT NULL,
+            email VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
         """
     ),
@@ -46,7 +58,10 @@ TABLES = {
             category VARCHAR(255),
             suitableFor VARCHAR(255),
             medicalNote TEXT,
-            schedule JSON
+            schedule JSON,
+            instructor_id INT NULL,
+            INDEX idx_courses_instructor (instructor_id),
+            CONSTRAINT fk_courses_instructor FOREIGN KEY (instructor_id) REFERENCES instructors(id) ON DELETE SET NULL
         );
 
         """
@@ -74,11 +89,15 @@ TABLES = {
             paid BOOLEAN NOT NULL DEFAULT FALSE,
             is_active BOOLEAN NOT NULL DEFAULT TRUE,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            
+            updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+
             CONSTRAINT fk_course FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE,
             CONSTRAINT fk_participant FOREIGN KEY (participant_id) REFERENCES users(id) ON DELETE CASCADE,
 
-            UNIQUE KEY uq_course_participant (course_id, participant_id)
+            UNIQUE KEY uq_course_participant (course_id, participant_id),
+            INDEX idx_participant_active_course (participant_id, is_active, course_id),
+            INDEX idx_participant_updated (updated_at),      -- reminder watermark scans
+            INDEX idx_participant_created (created_at)       -- dashboard stats
         );
 
         """
@@ -122,6 +141,9 @@ TABLES = {
         session_date DATE NOT NULL,
         session_time TIME NOT NULL,
         description VARCHAR(255) DEFAULT NULL,
+        source ENUM('schedule', 'manual') NOT NULL DEFAULT 'manual',  -- 'schedule' rows are generated from courses.schedule
+        UNIQUE KEY uq_course_session_slot (course_id, session_date, session_time),
+        INDEX idx_course_sessions_start (session_date, session_time),
         FOREIGN KEY (course_id) REFERENCES courses(id)
     );
 
@@ -136,7 +158,13 @@ TABLES = {
         session_date DATE,
         type ENUM('lesson', 'course') NOT NULL,
         is_sent BOOLEAN DEFAULT FALSE,
+        attempts INT NOT NULL DEFAULT 0,          -- delivery attempts so far
+        next_attempt_at DATETIME NULL,            -- claim lease / retry backoff
+        sent_at DATETIME NULL,
+        last_error VARCHAR(255),
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE KEY uq_feedback_reminder (participant_id, course_id, session_date, type),
+        INDEX idx_feedback_reminder_outbox (is_sent, next_attempt_at),
         FOREIGN KEY (participant_id) REFERENCES users(id),
         FOREIGN KEY (course_id) REFERENCES courses(id)
     );
@@ -151,6 +179,8 @@ TABLES = {
             payment_method VARCHAR(50),
             description TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_payments_user_created (user_id, created_at, id),
+            INDEX idx_payments_created (created_at, id),
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
         );
 
@@ -177,6 +207,8 @@ TABLES = {
             zoom_link TEXT,
             duration_minutes INT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_zoom_sessions_course_time (course_id, session_datetime, id),
+            INDEX idx_zoom_sessions_course_created (course_id, created_at, id),
             FOREIGN KEY (course_id) REFERENCES courses(id)
         );
         """
@@ -187,9 +219,270 @@ TABLES = {
             course_id INT NOT NULL,
             message TEXT NOT NULL,
             sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_course_messages_course_sent (course_id, sent_at, id),
+            FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
+        );
+        """
+    ), "revoked_tokens": (
+        """
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            jti CHAR(32) PRIMARY KEY,
+            user_id INT NOT NULL,
+            expires_at DATETIME NOT NULL,   -- UTC expiry of the revoked JWT
+            revoked_at DATETIME NOT NULL,   -- UTC, watermark for worker sync
+            INDEX idx_revoked_tokens_expires (expires_at),
+            INDEX idx_revoked_tokens_revoked (revoked_at)
+        );
+        """
+    ), "cache_versions": (
+        """
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name VARCHAR(64) PRIMARY KEY,   -- e.g. 'catalog'
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        );
+        """
+    ), "course_like_counts": (
+        """
+        CREATE TABLE IF NOT EXISTS course_like_counts (
+            course_id INT PRIMARY KEY,
+            like_count INT NOT NULL DEFAULT 0,   -- maintained from course_likes in batches
+            FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
+        );
+        """
+    ), "course_recommendations": (
+        """
+        CREATE TABLE IF NOT EXISTS course_recommendations (
+            course_id INT NOT NULL,
+            `rank` INT NOT NULL,
+            recommended_course_id INT NOT NULL,
+            score DOUBLE NOT NULL,              -- item-item cosine similarity
+            PRIMARY KEY (course_id, `rank`)
+        );
+        """
+    ), "user_recommendations": (
+        """
+        CREATE TABLE IF NOT EXISTS user_recommendations (
+            user_id INT NOT NULL,
+            `rank` INT NOT NULL,
+            course_id INT NOT NULL,
+            score DOUBLE NOT NULL,
+            PRIMARY KEY (user_id, `rank`)
+        );
+        """
+    ), "recommendation_refresh_queue": (
+        """
+        CREATE TABLE IF NOT EXISTS recommendation_refresh_queue (
+            user_id INT PRIMARY KEY,            -- users whose likes/enrollments changed
+            queued_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+            INDEX idx_refresh_queue_queued (queued_at)
+        );
+        """
+    ), "course_seats": (
+        """
+        CREATE TABLE IF NOT EXISTS course_seats (
+            course_id INT PRIMARY KEY,
+            capacity INT NULL,                   -- NULL = unlimited
+            seats_taken INT NOT NULL DEFAULT 0,  -- active participants, updated conditionally
+            FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
+        );
+        """
+    ), "course_waitlist": (
+        """
+        CREATE TABLE IF NOT EXISTS course_waitlist (
+            id INT AUTO_INCREMENT PRIMARY KEY,   -- FIFO order
+            course_id INT NOT NULL,
+            user_id INT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uq_waitlist_course_user (course_id, user_id),
+            INDEX idx_waitlist_course_order (course_id, id),
+            FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+        """
+    ), "user_calendar": (
+        """
+        CREATE TABLE IF NOT EXISTS user_calendar (
+            -- Read model of courses_participants x course_sessions x courses x
+            -- instructors, kept in sync on enrollment / schedule changes
+            user_id INT NOT NULL,
+            session_date DATE NOT NULL,
+            session_time TIME NOT NULL,
+            session_id INT NOT NULL,
+            course_id INT NOT NULL,
+            course_name VARCHAR(255) NOT NULL,
+            description VARCHAR(255),
+            instructor_name VARCHAR(255),
+            PRIMARY KEY (user_id, session_date, session_time, session_id),
+            INDEX idx_user_calendar_course (course_id, session_date),
+            INDEX idx_user_calendar_session (session_id)
+        );
+        """
+    ), "calendar_feed_versions": (
+        """
+        CREATE TABLE IF NOT EXISTS calendar_feed_versions (
+            user_id INT PRIMARY KEY,
+            version INT NOT NULL DEFAULT 1,      -- bumped whenever the user's .ics feed changes
+            updated_at DATETIME NOT NULL         -- UTC, served as Last-Modified
+        );
+        """
+    ), "job_watermarks": (
+        """
+        CREATE TABLE IF NOT EXISTS job_watermarks (
+            name VARCHAR(64) PRIMARY KEY,        -- e.g. 'reminders.lesson_session_end'
+            position DATETIME(6) NOT NULL,       -- everything up to here has been processed
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        );
+        """
+    ), "scheduler_leases": (
+        """
+        CREATE TABLE IF NOT EXISTS scheduler_leases (
+            name VARCHAR(64) PRIMARY KEY,        -- 'scheduler.leader'
+            owner VARCHAR(128) NOT NULL,         -- host:pid:nonce of the holder
+            acquired_at DATETIME(6) NOT NULL,
+            heartbeat_at DATETIME(6) NOT NULL,
+            expires_at DATETIME(6) NOT NULL
+        );
+        """
+    ), "job_runs": (
+        """
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            job_name VARCHAR(64) NOT NULL,
+            owner VARCHAR(128) NOT NULL,
+            started_at DATETIME(6) NOT NULL,     -- UTC
+            duration_ms INT NOT NULL,
+            rows_affected INT NULL,
+            status ENUM('ok', 'error') NOT NULL,
+            error TEXT,
+            INDEX idx_job_runs_job_started (job_name, started_at),
+            INDEX idx_job_runs_started (started_at)
+        );
+        """
+    ), "message_jobs": (
+        """
+        CREATE TABLE IF NOT EXISTS message_jobs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            message_id INT NOT NULL,
+            course_id INT NOT NULL,
+            status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+            total INT NOT NULL DEFAULT 0,
+            sent INT NOT NULL DEFAULT 0,
+            failed INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at DATETIME NULL,
+            finished_at DATETIME NULL,
+            INDEX idx_message_jobs_status (status),
+            FOREIGN KEY (message_id) REFERENCES course_messages(id) ON DELETE CASCADE,
             FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
         );
         """
+    ), "message_deliveries": (
+        """
+        CREATE TABLE IF NOT EXISTS message_deliveries (
+            job_id INT NOT NULL,
+            user_id INT NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            status ENUM('pending', 'sent', 'failed') NOT NULL DEFAULT 'pending',
+            attempts INT NOT NULL DEFAULT 0,
+            next_attempt_at DATETIME NULL,       -- claim lease / retry backoff
+            last_error VARCHAR(255),
+            sent_at DATETIME NULL,
+            PRIMARY KEY (job_id, user_id),
+            INDEX idx_message_deliveries_due (job_id, status, next_attempt_at),
+            FOREIGN KEY (job_id) REFERENCES message_jobs(id) ON DELETE CASCADE
+        );
+        """
+    ), "push_events": (
+        """
+        CREATE TABLE IF NOT EXISTS push_events (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,    -- SSE event id / Last-Event-ID
+            course_id INT NOT NULL,
+            type VARCHAR(32) NOT NULL,               -- course_message, zoom_session, session_starting
+            payload JSON NOT NULL,
+            created_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+            INDEX idx_push_events_course (course_id, id),
+            INDEX idx_push_events_created (created_at)
+        );
+        """
+    ), "ledger_entries": (
+        """
+        CREATE TABLE IF NOT EXISTS ledger_entries (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            payment_id INT NOT NULL,                 -- the transaction the entry belongs to
+            entry_type VARCHAR(32) NOT NULL,         -- 'payment'
+            account ENUM('user', 'payments') NOT NULL,
+            user_id INT NOT NULL,
+            amount DECIMAL(12, 2) NOT NULL,          -- signed; a transaction's entries sum to zero
+            created_at DATETIME NOT NULL,            -- the payment's created_at
+            UNIQUE KEY uq_ledger_entry (payment_id, account),
+            INDEX idx_ledger_user (user_id, account, created_at)
+        );
+        """
+    ), "user_monthly_spend": (
+        """
+        CREATE TABLE IF NOT EXISTS user_monthly_spend (
+            user_id INT NOT NULL,
+            month DATE NOT NULL,                     -- first day of the month
+            amount DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            payments INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, month)
+        );
+        """
+    ), "idempotency_keys": (
+        """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key_hash CHAR(64) PRIMARY KEY,           -- sha256(user_id, endpoint, Idempotency-Key)
+            user_id INT NOT NULL,
+            endpoint VARCHAR(64) NOT NULL,
+            request_hash CHAR(64) NOT NULL,          -- sha256(method, path, body)
+            status ENUM('in_flight', 'completed') NOT NULL DEFAULT 'in_flight',
+            response_code SMALLINT NULL,
+            response_type VARCHAR(100) NULL,
+            response_body MEDIUMTEXT NULL,
+            locked_until DATETIME NOT NULL,          -- in-flight owner's lease
+            expires_at DATETIME NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_idempotency_expires (expires_at)
+        );
+        """
+    ), "stats_daily": (
+        """
+        CREATE TABLE IF NOT EXISTS stats_daily (
+            day DATE PRIMARY KEY,
+            new_users INT NOT NULL DEFAULT 0,
+            enrollments INT NOT NULL DEFAULT 0,
+            cancellations INT NOT NULL DEFAULT 0,
+            payments INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            active_users INT NULL,                   -- gauges, snapshotted by the refresh job
+            active_courses INT NULL,
+            active_enrollments INT NULL,
+            snapshot_at DATETIME NULL
+        );
+        """
+    ), "stats_monthly": (
+        """
+        CREATE TABLE IF NOT EXISTS stats_monthly (
+            month DATE PRIMARY KEY,                  -- first day of the month
+            new_users INT NOT NULL DEFAULT 0,
+            enrollments INT NOT NULL DEFAULT 0,
+            cancellations INT NOT NULL DEFAULT 0,
+            payments INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            active_users INT NULL,                   -- latest snapshot of the month
+            active_courses INT NULL,
+            active_enrollments INT NULL
+        );
+        """
+    ), "schema_migrations": (
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name VARCHAR(191) PRIMARY KEY,           -- MIGRATIONS entry name
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
     )
     
 
@@ -202,6 +495,110 @@ TABLES = {
 
 
 
+# Changes to tables that already exist in deployed databases. Each entry is
+# applied once and recorded by name in schema_migrations; an "already
+# exists" error counts as applied, since fresh installs get the final
+# schema from TABLES. Never rename an entry that has shipped.
+MIGRATIONS = [
+    ("course_sessions.source",
+     "ALTER TABLE course_sessions ADD COLUMN source ENUM('schedule', 'manual') NOT NULL DEFAULT 'manual'"),
+    ("course_sessions.uq_course_session_slot",
+     "ALTER TABLE course_sessions ADD UNIQUE KEY uq_course_session_slot (course_id, session_date, session_time)"),
+    ("courses_participants.idx_participant_active_course",
+     "ALTER TABLE courses_participants ADD INDEX idx_participant_active_course (participant_id, is_active, course_id)"),
+    ("courses.instructor_id",
+     "ALTER TABLE courses ADD COLUMN instructor_id INT NULL, ADD INDEX idx_courses_instructor (instructor_id)"),
+    # Ids of instructors deleted before the key existed would block it
+    ("courses.instructor_id.orphans",
+     """
+     UPDATE courses c
+     LEFT JOIN instructors i ON i.id = c.instructor_id
+     SET c.instructor_id = NULL
+     WHERE c.instructor_id IS NOT NULL AND i.id IS NULL
+     """),
+    ("courses.fk_courses_instructor",
+     """
+     ALTER TABLE courses ADD CONSTRAINT fk_courses_instructor
+         FOREIGN KEY (instructor_id) REFERENCES instructors(id) ON DELETE SET NULL
+     """),
+    # Duplicates left by the old per-row reminder loop would block the unique key
+    ("feedback_reminders.dedupe",
+     """
+     DELETE dup FROM feedback_reminders dup
+     JOIN feedback_reminders keep
+       ON keep.participant_id = dup.participant_id
+      AND keep.course_id = dup.course_id
+      AND keep.type = dup.type
+      AND keep.session_date <=> dup.session_date
+      AND keep.id < dup.id
+     """),
+    ("feedback_reminders.uq_feedback_reminder",
+     "ALTER TABLE feedback_reminders ADD UNIQUE KEY uq_feedback_reminder (participant_id, course_id, session_date, type)"),
+    ("courses_participants.updated_at",
+     "ALTER TABLE courses_participants ADD COLUMN updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)"),
+    ("courses_participants.idx_participant_updated",
+     "ALTER TABLE courses_participants ADD INDEX idx_participant_updated (updated_at)"),
+    ("course_sessions.idx_course_sessions_start",
+     "ALTER TABLE course_sessions ADD INDEX idx_course_sessions_start (session_date, session_time)"),
+    ("feedback_reminders.outbox",
+     """
+     ALTER TABLE feedback_reminders
+         ADD COLUMN attempts INT NOT NULL DEFAULT 0,
+         ADD COLUMN next_attempt_at DATETIME NULL,
+         ADD COLUMN sent_at DATETIME NULL,
+         ADD COLUMN last_error VARCHAR(255)
+     """),
+    ("feedback_reminders.idx_feedback_reminder_outbox",
+     "ALTER TABLE feedback_reminders ADD INDEX idx_feedback_reminder_outbox (is_sent, next_attempt_at)"),
+    # Keyset pagination and incremental sync of /api/user/messages
+    ("course_messages.idx_course_messages_course_sent",
+     "ALTER TABLE course_messages ADD INDEX idx_course_messages_course_sent (course_id, sent_at, id)"),
+    ("zoom_sessions.idx_zoom_sessions_course_time",
+     "ALTER TABLE zoom_sessions ADD INDEX idx_zoom_sessions_course_time (course_id, session_datetime, id)"),
+    ("zoom_sessions.idx_zoom_sessions_course_created",
+     "ALTER TABLE zoom_sessions ADD INDEX idx_zoom_sessions_course_created (course_id, created_at, id)"),
+    # Payment ledger: post existing payments once, then derive the rollups from it
+    ("users.balance_decimal",
+     "ALTER TABLE users MODIFY COLUMN balance DECIMAL(12, 2) NOT NULL DEFAULT 0"),
+    ("ledger_entries.backfill",
+     """
+     INSERT IGNORE INTO ledger_entries (payment_id, entry_type, account, user_id, amount, created_at)
+     SELECT id, 'payment', 'user', user_id, amount, created_at FROM payments
+     UNION ALL
+     SELECT id, 'payment', 'payments', user_id, -amount, created_at FROM payments
+     """),
+    ("users.balance_from_ledger",
+     """
+     UPDATE users u
+     LEFT JOIN (
+         SELECT user_id, SUM(amount) AS total FROM ledger_entries WHERE account = 'user' GROUP BY user_id
+     ) l ON l.user_id = u.id
+     SET u.balance = COALESCE(l.total, 0)
+     """),
+    ("user_monthly_spend.backfill",
+     """
+     INSERT INTO user_monthly_spend (user_id, month, amount, payments)
+     SELECT user_id, DATE_FORMAT(created_at, '%Y-%m-01') AS month, SUM(amount), COUNT(*)
+     FROM ledger_entries
+     WHERE account = 'user' AND entry_type = 'payment'
+     GROUP BY user_id, month
+     ON DUPLICATE KEY UPDATE amount = VALUES(amount), payments = VALUES(payments)
+     """),
+    # Keyset payment history and date-range export
+    ("payments.idx_payments_user_created",
+     "ALTER TABLE payments ADD INDEX idx_payments_user_created (user_id, created_at, id)"),
+    ("payments.idx_payments_created",
+     "ALTER TABLE payments ADD INDEX idx_payments_created (created_at, id)"),
+    # Dashboard stats refresh and recent actions
+    ("users.idx_users_created",
+     "ALTER TABLE users ADD INDEX idx_users_created (created_at)"),
+    ("users.idx_users_active",
+     "ALTER TABLE users ADD INDEX idx_users_active (active)"),
+    ("courses_participants.idx_participant_created",
+     "ALTER TABLE courses_participants ADD INDEX idx_participant_created (created_at)"),
+]
+
+
 def create_database(cursor):
     try:
         cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME} DEFAULT CHARACTER SET 'utf8mb4'")
@@ -221,6 +618,25 @@ def create_tables(cursor):
             print(f"❌ Failed to create table {table_name}: {err}")
 
 
+def run_migrations(cursor):
+    cursor.execute("SELECT name FROM schema_migrations")
+    applied = {name for (name,) in cursor.fetchall()}
+    for name, ddl in MIGRATIONS:
+        if name in applied:
+            continue
+        try:
+            cursor.execute(ddl)
+            print(f"✅ Migration '{name}' applied.")
+        except mysql.connector.Error as err:
+            if err.errno in (errorcode.ER_DUP_FIELDNAME, errorcode.ER_DUP_KEYNAME, errorcode.ER_FK_DUP_NAME):
+                print(f"↪️  Migration '{name}' already applied.")
+            else:
+                # Not recorded, so the next run tries again
+                print(f"❌ Failed to apply migration {name}: {err}")
+                continue
+        cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+
+
 def main():
     try:
         connection = mysql.connector.connect(**config)
@@ -231,6 +647,8 @@ def main():
         connection.database = DB_NAME
 
         create_tables(cursor)
+        run_migrations(cursor)
+        connection.commit()
 
         cursor.close()
         connection.close()
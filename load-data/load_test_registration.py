@@ -0,0 +1,172 @@
+# load_test_registration.py
+#
+# Fires hundreds of simultaneous registrations at one course with a small
+# capacity and checks that it was never oversold:
+#   - active participants == course_seats.seats_taken <= capacity
+#   - everybody else ended up on the waitlist, none twice
+#   - cancelling a seat promotes the head of the waitlist
+#
+# Usage (backend running on BASE_URL, same .env as the backend):
+#   python load_test_registration.py --users 300 --capacity 12
+import os
+import sys
+import json
+import uuid
+import argparse
+import datetime
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+import jwt
+import mysql.connector
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path='../backend/.env')
+
+BASE_URL = os.getenv('BASE_URL', 'http://localhost:3000')
+JWT_SECRET = os.getenv('JWT_SECRET', 'mysecretkey')
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+
+def get_db_connection():
+    return mysql.connector.connect(
+        host=os.getenv('MYSQL_HOST', 'localhost'),
+        user=os.getenv('MYSQL_USER', 'root'),
+        password=os.getenv('MYSQL_PASSWORD', ''),
+        database=os.getenv('MYSQL_DATABASE', 'time_to_weave')
+    )
+
+
+def make_token(user_id):
+    payload = {
+        'user_id': user_id,
+        'jti': uuid.uuid4().hex,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm='HS256')
+
+
+def call(method, path, token, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(BASE_URL + path, data=data, method=method)
+    req.add_header('Authorization', f'Bearer {token}')
+    req.add_header('Content-Type', 'application/json')
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return resp.status, json.loads(resp.read() or b'{}')
+    except urllib.error.HTTPError as err:
+        return err.code, json.loads(err.read() or b'{}')
+
+
+def setup(n_users):
+    db = get_db_connection()
+    cursor = db.cursor()
+    run = uuid.uuid4().hex[:8]
+
+    cursor.execute(
+        "INSERT INTO courses (name, category, suitableFor, medicalNote, schedule) VALUES (%s, %s, %s, %s, %s)",
+        (f'Load test {run}', 'load-test', '', '', json.dumps([]))
+    )
+    course_id = cursor.lastrowid
+    cursor.execute("INSERT INTO course_seats (course_id) VALUES (%s)", (course_id,))
+
+    cursor.executemany(
+        """
+        INSERT INTO users (email, password, full_name, age, location, preferred_language)
+        VALUES (%s, 'x', %s, 70, 'load-test', 'en')
+        """,
+        [(f'load-{run}-{i}@example.com', f'Load {i}') for i in range(n_users)]
+    )
+    cursor.execute("SELECT id FROM users WHERE email LIKE %s ORDER BY id", (f'load-{run}-%',))
+    user_ids = [row[0] for row in cursor.fetchall()]
+    db.commit()
+    cursor.close()
+    db.close()
+    return course_id, user_ids
+
+
+def check(course_id, capacity):
+    db = get_db_connection()
+    cursor = db.cursor()
+    cursor.execute(
+        "SELECT COUNT(*) FROM courses_participants WHERE course_id = %s AND is_active = TRUE",
+        (course_id,)
+    )
+    active = cursor.fetchone()[0]
+    cursor.execute("SELECT seats_taken FROM course_seats WHERE course_id = %s", (course_id,))
+    seats_taken = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT user_id) FROM course_waitlist WHERE course_id = %s",
+        (course_id,)
+    )
+    waitlisted, distinct_waitlisted = cursor.fetchone()
+    cursor.close()
+    db.close()
+
+    print(f"active={active} seats_taken={seats_taken} capacity={capacity} waitlisted={waitlisted}")
+    assert active <= capacity, 'course oversold'
+    assert active == seats_taken, 'seat counter drifted from participants'
+    assert waitlisted == distinct_waitlisted, 'duplicate waitlist entries'
+    return active, waitlisted
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--capacity', type=int, default=12)
+    parser.add_argument('--concurrency', type=int, default=200)
+    args = parser.parse_args()
+
+    course_id, user_ids = setup(args.users)
+    tokens = {user_id: make_token(user_id) for user_id in user_ids}
+
+    status, body = call('PUT', f'/api/admin/courses/{course_id}/capacity', ADMIN_TOKEN,
+                        {'capacity': args.capacity})
+    assert status == 200, body
+
+    # Every user registers twice, concurrently, to also exercise double taps
+    attempts = user_ids * 2
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(
+            lambda uid: call('POST', f'/api/courses/{course_id}/register', tokens[uid]),
+            attempts
+        ))
+
+    codes = {}
+    for status, _ in results:
+        codes[status] = codes.get(status, 0) + 1
+    print(f"responses: {codes}")
+    assert set(codes) <= {200, 202}, 'unexpected response codes'
+
+    active, waitlisted = check(course_id, args.capacity)
+    assert active == min(args.capacity, args.users)
+    assert active + waitlisted == args.users
+
+    # Cancel one seat: the first waitlisted user must be promoted
+    db = get_db_connection()
+    cursor = db.cursor()
+    cursor.execute(
+        "SELECT participant_id FROM courses_participants WHERE course_id = %s AND is_active = TRUE LIMIT 1",
+        (course_id,)
+    )
+    leaving = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT user_id FROM course_waitlist WHERE course_id = %s ORDER BY id LIMIT 1",
+        (course_id,)
+    )
+    head = cursor.fetchone()
+    cursor.close()
+    db.close()
+
+    status, body = call('DELETE', f'/api/courses/{course_id}/register', tokens[leaving])
+    assert status == 200, body
+    if head:
+        assert body['promoted'] == 1, body
+    check(course_id, args.capacity)
+
+    print("✅ No overselling detected")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())